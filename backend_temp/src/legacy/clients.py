@@ -0,0 +1,191 @@
+import os
+import queue
+import asyncio
+import threading
+import weakref
+import aiohttp
+import arxiv
+import httpx
+from contextlib import contextmanager
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from typing import Iterator, Optional
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents.aio import SearchClient as AsyncAzureAISearchClient
+from duckduckgo_search import DDGS
+from exa_py import Exa
+from langchain.embeddings import init_embeddings
+from langchain_core.embeddings import Embeddings
+
+##########################
+# Shared Search Clients
+##########################
+# Search SDK clients and the thread pool for blocking SDK calls are created once per process and
+# reused, instead of per search call. Async HTTP clients hold connections bound to an event loop,
+# so they are pooled per loop instead.
+SEARCH_EXECUTOR_MAX_WORKERS = int(os.environ.get("SEARCH_EXECUTOR_MAX_WORKERS", "16"))
+# "thread" or "process". HTML conversion is pure Python, so a process pool also spreads it over cores,
+# at the cost of pickling each page to a worker.
+HTML_CONVERSION_EXECUTOR = os.environ.get("HTML_CONVERSION_EXECUTOR", "thread")
+# Idle DuckDuckGo sessions kept for reuse. A DDGS session is not thread safe, so each search borrows one.
+DDGS_POOL_SIZE = int(os.environ.get("DDGS_POOL_SIZE", "4"))
+# Worker processes that parse downloaded PDFs
+PDF_PARSER_MAX_WORKERS = int(os.environ.get("PDF_PARSER_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+HTTP_CLIENT_SETTINGS = {
+    # Completions can take a while to generate, but connecting should not
+    "perplexity": {
+        "base_url": "https://api.perplexity.ai",
+        "timeout": httpx.Timeout(60.0, connect=10.0),
+        "limits": httpx.Limits(max_connections=10, max_keepalive_connections=10),
+    },
+    "pubmed": {
+        "base_url": "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/",
+        "timeout": httpx.Timeout(30.0, connect=10.0),
+        "limits": httpx.Limits(max_connections=10, max_keepalive_connections=10),
+    },
+    # arXiv asks for few concurrent connections, and PDFs can be large
+    "arxiv": {
+        "follow_redirects": True,
+        "timeout": httpx.Timeout(60.0, connect=10.0),
+        "limits": httpx.Limits(max_connections=4, max_keepalive_connections=4),
+    },
+    "scrape": {
+        "follow_redirects": True,
+        "timeout": httpx.Timeout(30.0, connect=10.0),
+        "limits": httpx.Limits(max_connections=20, max_keepalive_connections=10),
+    },
+}
+
+_lock = threading.Lock()
+_search_executor: Optional[ThreadPoolExecutor] = None
+_conversion_executor: Optional[ProcessPoolExecutor] = None
+_pdf_executor: Optional[ProcessPoolExecutor] = None
+_arxiv_client: Optional[arxiv.Client] = None
+_exa_clients: dict[Optional[str], Exa] = {}
+_http_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_aiohttp_sessions: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_azure_search_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_embeddings: dict[str, Embeddings] = {}
+_ddgs_sessions: queue.LifoQueue = queue.LifoQueue(maxsize=DDGS_POOL_SIZE)
+
+
+def get_search_executor() -> ThreadPoolExecutor:
+    """Thread pool for search SDKs that only have blocking clients."""
+    global _search_executor
+    with _lock:
+        if _search_executor is None:
+            _search_executor = ThreadPoolExecutor(max_workers=SEARCH_EXECUTOR_MAX_WORKERS, thread_name_prefix="search")
+        return _search_executor
+
+
+def get_conversion_executor() -> Executor:
+    """Pool for CPU-bound conversion of fetched pages, off the event loop thread."""
+    global _conversion_executor
+    if HTML_CONVERSION_EXECUTOR != "process":
+        return get_search_executor()
+    with _lock:
+        if _conversion_executor is None:
+            # Spawn the workers like the PDF pool does, since forking a process with running threads is unsafe
+            _conversion_executor = ProcessPoolExecutor(max_workers=min(4, os.cpu_count() or 1), mp_context=get_context("spawn"))
+        return _conversion_executor
+
+
+def get_pdf_executor() -> ProcessPoolExecutor:
+    """Process pool for parsing PDFs. Workers are spawned, since forking a process with running threads is unsafe."""
+    global _pdf_executor
+    with _lock:
+        if _pdf_executor is None:
+            _pdf_executor = ProcessPoolExecutor(max_workers=PDF_PARSER_MAX_WORKERS, mp_context=get_context("spawn"))
+        return _pdf_executor
+
+
+def get_arxiv_client() -> arxiv.Client:
+    """arXiv API client. Requests are spaced by the shared arXiv rate limiter, not by the client."""
+    global _arxiv_client
+    with _lock:
+        if _arxiv_client is None:
+            _arxiv_client = arxiv.Client(page_size=100, delay_seconds=0, num_retries=3)
+        return _arxiv_client
+
+
+def get_exa_client(api_key: Optional[str]) -> Exa:
+    with _lock:
+        if api_key not in _exa_clients:
+            _exa_clients[api_key] = Exa(api_key=f"{api_key}")
+        return _exa_clients[api_key]
+
+
+@contextmanager
+def ddgs_session() -> Iterator[DDGS]:
+    """Borrow a DuckDuckGo session (with its cookies and connections) from the pool.
+
+    Sessions that raise are dropped rather than returned, in case they are in a bad state.
+    """
+    try:
+        ddgs = _ddgs_sessions.get_nowait()
+    except queue.Empty:
+        ddgs = DDGS()
+    yield ddgs
+    try:
+        _ddgs_sessions.put_nowait(ddgs)
+    except queue.Full:
+        pass
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    """Keep-alive HTTP client for the named backend on the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _http_clients.setdefault(loop, {})
+        client = clients.get(name)
+        if client is None or client.is_closed:
+            client = clients[name] = httpx.AsyncClient(**HTTP_CLIENT_SETTINGS.get(name, {}))
+        return client
+
+
+def get_aiohttp_session() -> aiohttp.ClientSession:
+    """Keep-alive aiohttp session on the running event loop, for the Google search and page fetches."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        session = _aiohttp_sessions.get(loop)
+        if session is None or session.closed:
+            session = _aiohttp_sessions[loop] = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=20, limit_per_host=4, keepalive_timeout=30),
+                timeout=aiohttp.ClientTimeout(total=30, connect=10),
+            )
+        return session
+
+
+def get_azure_search_client() -> AsyncAzureAISearchClient:
+    """Azure AI Search client for the index configured in the environment, kept open on the running event loop."""
+    if not all(var in os.environ for var in ["AZURE_AI_SEARCH_ENDPOINT", "AZURE_AI_SEARCH_INDEX_NAME", "AZURE_AI_SEARCH_API_KEY"]):
+        raise ValueError("Missing required environment variables for Azure Search API which are: AZURE_AI_SEARCH_ENDPOINT, AZURE_AI_SEARCH_INDEX_NAME, AZURE_AI_SEARCH_API_KEY")
+    settings = (os.environ["AZURE_AI_SEARCH_ENDPOINT"], os.environ["AZURE_AI_SEARCH_INDEX_NAME"], os.environ["AZURE_AI_SEARCH_API_KEY"])
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _azure_search_clients.setdefault(loop, {})
+        if settings not in clients:
+            endpoint, index_name, api_key = settings
+            clients[settings] = AsyncAzureAISearchClient(endpoint, index_name, AzureKeyCredential(api_key))
+        return clients[settings]
+
+
+def get_embeddings(model: str) -> Embeddings:
+    with _lock:
+        if model not in _embeddings:
+            _embeddings[model] = init_embeddings(model)
+        return _embeddings[model]
+
+
+def reset_clients():
+    """Drop all cached clients, e.g. after API keys change or between tests."""
+    global _arxiv_client
+    with _lock:
+        _exa_clients.clear()
+        _arxiv_client = None
+        _http_clients.clear()
+        _aiohttp_sessions.clear()
+        _azure_search_clients.clear()
+        _embeddings.clear()
+    while not _ddgs_sessions.empty():
+        _ddgs_sessions.get_nowait()
@@ -1,9 +1,9 @@
-import os
 from enum import Enum
 from dataclasses import dataclass, fields
 from typing import Any, Optional, Dict, Literal
 
 from langchain_core.runnables import RunnableConfig
+from research_common.configuration import cached_configuration
 
 DEFAULT_REPORT_STRUCTURE = """Use this structure to create a report on the user-provided topic:
 
@@ -56,15 +56,12 @@ class Configuration:
         cls, config: Optional[RunnableConfig] = None
     ) -> "Configuration":
         """Create a Configuration instance from a RunnableConfig."""
-        configurable = (
-            config["configurable"] if config and "configurable" in config else {}
+        return cached_configuration(
+            cls,
+            config,
+            [f.name for f in fields(cls) if f.init],
+            lambda values: cls(**{k: v for k, v in values.items() if v})
         )
-        values: dict[str, Any] = {
-            f.name: os.environ.get(f.name.upper(), configurable.get(f.name))
-            for f in fields(cls)
-            if f.init
-        }
-        return cls(**{k: v for k, v in values.items() if v})
 
 @dataclass(kw_only=True)
 class MultiAgentConfiguration:
@@ -92,15 +89,12 @@ class MultiAgentConfiguration:
         cls, config: Optional[RunnableConfig] = None
     ) -> "MultiAgentConfiguration":
         """Create a MultiAgentConfiguration instance from a RunnableConfig."""
-        configurable = (
-            config["configurable"] if config and "configurable" in config else {}
+        return cached_configuration(
+            cls,
+            config,
+            [f.name for f in fields(cls) if f.init],
+            lambda values: cls(**{k: v for k, v in values.items() if v})
         )
-        values: dict[str, Any] = {
-            f.name: os.environ.get(f.name.upper(), configurable.get(f.name))
-            for f in fields(cls)
-            if f.init
-        }
-        return cls(**{k: v for k, v in values.items() if v})
 
 # Keep the old Configuration class for backward compatibility
 Configuration = Configuration
@@ -21,6 +21,7 @@ from legacy.utils import (
 )
 
 from legacy.prompts import SUPERVISOR_INSTRUCTIONS, RESEARCH_INSTRUCTIONS
+from research_common.llm_cache import get_llm_cache
 
 ## Tools factory - will be initialized based on configuration
 def get_search_tool(config: RunnableConfig):
@@ -196,7 +197,7 @@ async def supervisor(state: ReportState, config: RunnableConfig):
     supervisor_model = get_config_value(configurable.supervisor_model)
 
     # Initialize the model
-    llm = init_chat_model(model=supervisor_model)
+    llm = init_chat_model(model=supervisor_model, cache=get_llm_cache())
     
     # If sections have been completed, but we don't yet have the final report, then we need to initiate writing the introduction and conclusion
     if state.get("completed_sections") and not state.get("final_report"):
@@ -355,7 +356,7 @@ async def research_agent(state: SectionState, config: RunnableConfig):
     researcher_model = get_config_value(configurable.researcher_model)
     
     # Initialize the model
-    llm = init_chat_model(model=researcher_model)
+    llm = init_chat_model(model=researcher_model, cache=get_llm_cache())
 
     # Get tools based on configuration
     research_tool_list = await get_research_tools(config)
@@ -0,0 +1,13 @@
+##########################
+# PDF Text Extraction
+##########################
+# Kept apart from legacy.utils so that process pool workers only import PyMuPDF, not the search stack.
+
+def extract_pdf_text(pdf_bytes: bytes) -> str:
+    """Extract the text of every page of a PDF with PyMuPDF."""
+    try:
+        import pymupdf
+    except ImportError:
+        raise ImportError("PyMuPDF package not found, please install it with `pip install pymupdf`")
+    with pymupdf.open(stream=pdf_bytes, filetype="pdf") as document:
+        return "".join(page.get_text() for page in document)
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+##########################
+# Rate Limiting
+##########################
+# Search providers enforce per-key request rates. Limiters are process-wide and looked up by backend
+# name, so concurrent sections and runs draw from the same budget instead of each pacing itself.
+class TokenBucket:
+    """Token bucket that lets `rate` requests per second through, with bursts of up to `capacity`.
+
+    Callers reserve a token and sleep until it is due, so waiting requests are admitted in
+    arrival order without polling. The lock is a threading lock because the server runs graphs
+    on more than one event loop and some backends call in from worker threads. clock and sleep
+    can be replaced, e.g. by a fake clock in tests.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep
+    ):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _reserve(self) -> float:
+        """Take a token and return how long to wait before using it."""
+        with self._lock:
+            self._refill(self.clock())
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            # Settle the tokens earned at the old rate before switching
+            self._refill(self.clock())
+            self.rate = rate
+
+    async def acquire(self):
+        delay = self._reserve()
+        if delay > 0:
+            await self.sleep(delay)
+
+    def acquire_blocking(self):
+        """Acquire from synchronous code running in a worker thread."""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter, so retries from parallel callers spread out."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def get_status_code(error: BaseException) -> Optional[int]:
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) or getattr(error, "status_code", None) or getattr(error, "status", None)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    message = str(error).lower()
+    return get_status_code(error) == 429 or "429" in message or "rate limit" in message or "ratelimit" in message or "too many requests" in message
+
+
+def get_retry_after(error: BaseException) -> Optional[float]:
+    """Seconds from a Retry-After header on the error's response, if it has one."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or getattr(error, "headers", None)
+    try:
+        return float(headers.get("Retry-After")) if headers and headers.get("Retry-After") else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Request rate and concurrency limits for one search backend, shared by every caller in the process.
+
+    Each request waits for a concurrency slot and then a token. A rate limit error halves the
+    request rate (down to min_rate) and the request is retried after the server's Retry-After or
+    a jittered backoff. Each success restores a tenth of the configured rate.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        max_concurrency: int,
+        burst: Optional[float] = None,
+        min_rate: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep
+    ):
+        self.name = name
+        self.base_rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 8
+        self.max_concurrency = max_concurrency
+        self.sleep = sleep
+        self.bucket = TokenBucket(rate, burst, clock, sleep)
+        self._lock = threading.Lock()
+        # asyncio semaphores belong to one event loop, so the concurrency cap is kept per loop
+        self._semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+            return semaphore
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._semaphore():
+            await self.bucket.acquire()
+            yield
+
+    def acquire_blocking(self):
+        """Wait for a token from a worker thread. The concurrency cap only applies to async callers."""
+        self.bucket.acquire_blocking()
+
+    def record_success(self):
+        if self.bucket.rate < self.base_rate:
+            with self._lock:
+                self.bucket.set_rate(min(self.base_rate, self.bucket.rate + self.base_rate / 10))
+
+    def record_rate_limited(self):
+        with self._lock:
+            rate = max(self.min_rate, self.bucket.rate / 2)
+            self.bucket.set_rate(rate)
+        print(f"Rate limited by {self.name}, slowing to {rate:.2f} requests/s")
+
+    async def call(self, request: Callable[[], Awaitable[T]], max_retries: int = 3) -> T:
+        """Run request under the limits, retrying rate limit errors with backoff."""
+        attempt = 0
+        while True:
+            try:
+                async with self.slot():
+                    result = await request()
+            except Exception as e:
+                if attempt >= max_retries or not is_rate_limit_error(e):
+                    raise
+                self.record_rate_limited()
+                delay = get_retry_after(e) or backoff_delay(attempt)
+                attempt += 1
+                print(f"Retrying {self.name} request {attempt}/{max_retries} after {delay:.2f}s")
+                await self.sleep(delay)
+            else:
+                self.record_success()
+                return result
+
+
+class HostConcurrencyLimiter:
+    """Caps concurrent requests to each host, so fetching many pages from one site doesn't hammer it."""
+
+    def __init__(self, max_per_host: int):
+        self.max_per_host = max_per_host
+        self._lock = threading.Lock()
+        self._semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).hostname or ""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphores = self._semaphores.setdefault(loop, {})
+            if host not in semaphores:
+                semaphores[host] = asyncio.Semaphore(self.max_per_host)
+            return semaphores[host]
+
+
+# Requests per second and concurrent requests for each backend. Deployments with higher quotas can
+# override them with SEARCH_RATE_LIMITS, e.g. '{"pubmed": {"rate": 10}, "tavily": {"max_concurrency": 4}}'
+DEFAULT_RATE_LIMITS = {
+    "tavily": {"rate": 10, "max_concurrency": 10},
+    "exa": {"rate": 5, "max_concurrency": 5},
+    "perplexity": {"rate": 1, "max_concurrency": 4, "burst": 4},
+    "arxiv": {"rate": 1 / 3, "max_concurrency": 1},
+    "pubmed": {"rate": 3, "max_concurrency": 3},
+    "pubmed_api_key": {"rate": 10, "max_concurrency": 10},
+    "linkup": {"rate": 10, "max_concurrency": 10},
+    "googlesearch": {"rate": 5, "max_concurrency": 5},
+    "google_scrape": {"rate": 0.5, "max_concurrency": 2},
+    "duckduckgo": {"rate": 1, "max_concurrency": 3, "burst": 3},
+    "azureaisearch": {"rate": 10, "max_concurrency": 10},
+}
+DEFAULT_BACKEND_LIMITS = {"rate": 5, "max_concurrency": 5}
+
+_rate_limiters: dict[str, RateLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def get_rate_limit_settings(backend: str) -> dict:
+    settings = dict(DEFAULT_RATE_LIMITS.get(backend, DEFAULT_BACKEND_LIMITS))
+    overrides = json.loads(os.environ.get("SEARCH_RATE_LIMITS") or "{}")
+    settings.update(overrides.get(backend, {}))
+    return settings
+
+
+def get_rate_limiter(backend: str) -> RateLimiter:
+    with _registry_lock:
+        if backend not in _rate_limiters:
+            _rate_limiters[backend] = RateLimiter(backend, **get_rate_limit_settings(backend))
+        return _rate_limiters[backend]
+
+
+def reset_rate_limiters():
+    """Drop all limiters so they are rebuilt from the current settings, e.g. between tests."""
+    with _registry_lock:
+        _rate_limiters.clear()
@@ -0,0 +1,117 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+##########################
+# Search Result Caches
+##########################
+# In-process caches for search backends, so that repeated queries (e.g. the same query from several
+# sections, or a retried section) are answered without another request. Entries expire after
+# SEARCH_CACHE_TTL_SECONDS (default one hour); set it to 0 to disable caching.
+SEARCH_CACHE_TTL_SECONDS = float(os.environ.get("SEARCH_CACHE_TTL_SECONDS", "3600"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ttl seconds after they are set."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskTextCache:
+    """Text files in a directory, one per key, shared by every process that uses the directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        # Old style arXiv ids contain a slash (e.g. hep-th/9901001v1)
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9._-]", "_", key) + ".txt")
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key: str, text: str):
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            # Write then rename, so concurrent readers never see a partial file
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Could not cache text for {key} in {self.directory}: {e}")
+
+
+def get_paper_text_cache() -> DiskTextCache:
+    """Cache of the full text of arXiv papers, which doesn't change for a given versioned id.
+
+    ARXIV_CACHE_DIR sets the directory (default .arxiv_cache); set it to an empty string to disable it.
+    """
+    directory = os.environ.get("ARXIV_CACHE_DIR", ".arxiv_cache")
+    return DiskTextCache(os.path.abspath(directory) if directory else "")
+
+
+_lock = threading.Lock()
+_search_caches: dict[str, TTLCache] = {}
+
+
+def get_search_cache(name: str, maxsize: Optional[int] = None, ttl: Optional[float] = None) -> TTLCache:
+    """Return the process-wide cache for the named backend."""
+    with _lock:
+        if name not in _search_caches:
+            _search_caches[name] = TTLCache(
+                maxsize=maxsize if maxsize is not None else SEARCH_CACHE_MAX_ENTRIES,
+                ttl=ttl if ttl is not None else SEARCH_CACHE_TTL_SECONDS,
+            )
+        return _search_caches[name]
+
+
+def reset_search_caches():
+    """Drop all cached results, e.g. between tests."""
+    with _lock:
+        for cache in _search_caches.values():
+            cache.clear()
@@ -1,25 +1,22 @@
 import os
+import re
 import asyncio
 import json
 import datetime
-import requests
 import random 
-import concurrent
 import hashlib
 import aiohttp
+import arxiv
 import httpx
-import time
 from typing import List, Optional, Dict, Any, Union, Literal, Annotated, cast
 from urllib.parse import unquote
 from collections import defaultdict
 import itertools
+import xml.etree.ElementTree as ET
 
-from exa_py import Exa
 from linkup import LinkupClient
 from tavily import AsyncTavilyClient
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents.aio import SearchClient as AsyncAzureAISearchClient
-from duckduckgo_search import DDGS 
+from azure.search.documents.models import VectorizableTextQuery, VectorizedQuery
 from bs4 import BeautifulSoup
 from markdownify import markdownify
 from pydantic import BaseModel
@@ -32,15 +29,36 @@ from langchain_core.language_models import BaseChatModel
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import InjectedToolArg
 from langchain_core.vectorstores import InMemoryVectorStore
-from langchain_community.retrievers import ArxivRetriever
-from langchain_community.utilities.pubmed import PubMedAPIWrapper
 from langchain_core.tools import tool
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langsmith import traceable
 
 from legacy.configuration import Configuration
+from legacy.clients import (
+    ddgs_session,
+    get_aiohttp_session,
+    get_arxiv_client,
+    get_azure_search_client,
+    get_conversion_executor,
+    get_embeddings,
+    get_exa_client,
+    get_http_client,
+    get_pdf_executor,
+    get_search_executor,
+)
+from legacy.rate_limit import HostConcurrencyLimiter, get_rate_limiter, is_rate_limit_error
+from legacy.search_cache import get_paper_text_cache, get_search_cache
+from legacy.pdf_text import extract_pdf_text
 from legacy.state import Section
 from legacy.prompts import SUMMARIZATION_PROMPT
+from research_common.formatting import format_scraped_pages, format_search_results, format_sources
+from research_common.formatting import format_sections as format_report_sections
+from research_common.llm_cache import get_llm_cache
+
+try:
+    import lxml
+except ImportError:
+    lxml = None
 
 
 def get_config_value(value):
@@ -69,11 +87,12 @@ def get_search_params(search_api: str, search_api_config: Optional[Dict[str, Any
     SEARCH_API_PARAMS = {
         "exa": ["max_characters", "num_results", "include_domains", "exclude_domains", "subpages"],
         "tavily": ["max_results", "topic"],
-        "perplexity": [],  # Perplexity accepts no additional parameters
+        "perplexity": ["timeout"],
         "arxiv": ["load_max_docs", "get_full_documents", "load_all_available_meta"],
         "pubmed": ["top_k_results", "email", "api_key", "doc_content_chars_max"],
         "linkup": ["depth"],
         "googlesearch": ["max_results"],
+        "azureaisearch": ["max_results", "topic", "exhaustive", "k_nearest_neighbors", "embedding_model"],
     }
 
     # Get the list of accepted parameters for the given search API
@@ -128,46 +147,11 @@ def deduplicate_and_format_sources(
         raise ValueError(f"Invalid deduplication strategy: {deduplication_strategy}")
 
     # Format output
-    formatted_text = "Content from sources:\n"
-    for i, source in enumerate(unique_sources.values(), 1):
-        formatted_text += f"{'='*80}\n"  # Clear section separator
-        formatted_text += f"Source: {source['title']}\n"
-        formatted_text += f"{'-'*80}\n"  # Subsection separator
-        formatted_text += f"URL: {source['url']}\n===\n"
-        formatted_text += f"Most relevant content from source: {source['content']}\n===\n"
-        if include_raw_content:
-            # Using rough estimate of 4 characters per token
-            char_limit = max_tokens_per_source * 4
-            # Handle None raw_content
-            raw_content = source.get('raw_content', '')
-            if raw_content is None:
-                raw_content = ''
-                print(f"Warning: No raw_content found for source {source['url']}")
-            if len(raw_content) > char_limit:
-                raw_content = raw_content[:char_limit] + "... [truncated]"
-            formatted_text += f"Full source content limited to {max_tokens_per_source} tokens: {raw_content}\n\n"
-        formatted_text += f"{'='*80}\n\n" # End section separator
-                
-    return formatted_text.strip()
+    return format_sources(unique_sources.values(), max_tokens_per_source, include_raw_content)
 
 def format_sections(sections: list[Section]) -> str:
     """ Format a list of sections into a string """
-    formatted_str = ""
-    for idx, section in enumerate(sections, 1):
-        formatted_str += f"""
-{'='*60}
-Section {idx}: {section.name}
-{'='*60}
-Description:
-{section.description}
-Requires Research: 
-{section.research}
-
-Content:
-{section.content if section.content else '[Not yet written]'}
-
-"""
-    return formatted_str
+    return format_report_sections(sections)
 
 @traceable
 async def tavily_search_async(search_queries, max_results: int = 5, topic: Literal["general", "news", "finance"] = "general", include_raw_content: bool = True):
@@ -200,15 +184,16 @@ async def tavily_search_async(search_queries, max_results: int = 5, topic: Liter
                 }
     """
     tavily_async_client = AsyncTavilyClient()
+    limiter = get_rate_limiter("tavily")
     search_tasks = []
     for query in search_queries:
             search_tasks.append(
-                tavily_async_client.search(
+                limiter.call(lambda query=query: tavily_async_client.search(
                     query,
                     max_results=max_results,
                     include_raw_content=include_raw_content,
                     topic=topic
-                )
+                ))
             )
 
     # Execute all searches concurrently
@@ -216,7 +201,15 @@ async def tavily_search_async(search_queries, max_results: int = 5, topic: Liter
     return search_docs
 
 @traceable
-async def azureaisearch_search_async(search_queries: list[str], max_results: int = 5, topic: str = "general", include_raw_content: bool = True) -> list[dict]:
+async def azureaisearch_search_async(
+    search_queries: list[str],
+    max_results: int = 5,
+    topic: str = "general",
+    include_raw_content: bool = True,
+    exhaustive: bool = False,
+    k_nearest_neighbors: int = 50,
+    embedding_model: Optional[str] = None,
+) -> list[dict]:
     """
     Performs concurrent web searches using the Azure AI Search API.
 
@@ -225,62 +218,82 @@ async def azureaisearch_search_async(search_queries: list[str], max_results: int
         max_results (int): maximum number of results to return for each query
         topic (str): semantic topic filter for the search.
         include_raw_content (bool)
+        exhaustive (bool): scan every vector instead of searching the approximate (HNSW) index. Exact, but
+            much slower on large indexes.
+        k_nearest_neighbors (int): candidates taken from the vector index before semantic reranking. Higher
+            values trade latency for recall; 50 matches what the semantic reranker scores.
+        embedding_model (str, optional): embed the queries client side with this model (e.g.
+            "openai:text-embedding-3-small", the model the index was built with), so that embeddings of
+            repeated queries are cached. Defaults to AZURE_AI_SEARCH_EMBEDDING_MODEL; if neither is set,
+            the index's own vectorizer embeds each query.
 
     Returns:
         List[dict]: list of search responses from Azure AI Search API, one per query.
     """
-    # configure and create the Azure Search client
-    # ensure all environment variables are set
-    if not all(var in os.environ for var in ["AZURE_AI_SEARCH_ENDPOINT", "AZURE_AI_SEARCH_INDEX_NAME", "AZURE_AI_SEARCH_API_KEY"]):
-        raise ValueError("Missing required environment variables for Azure Search API which are: AZURE_AI_SEARCH_ENDPOINT, AZURE_AI_SEARCH_INDEX_NAME, AZURE_AI_SEARCH_API_KEY")
-    endpoint = os.getenv("AZURE_AI_SEARCH_ENDPOINT")
-    index_name = os.getenv("AZURE_AI_SEARCH_INDEX_NAME")
-    credential = AzureKeyCredential(os.getenv("AZURE_AI_SEARCH_API_KEY"))
+    # The client is created once per event loop and reused by every search
+    client = get_azure_search_client()
+    limiter = get_rate_limiter("azureaisearch")
+    embedding_model = embedding_model or os.environ.get("AZURE_AI_SEARCH_EMBEDDING_MODEL")
 
     reranker_key = '@search.reranker_score'
 
-    async with AsyncAzureAISearchClient(endpoint, index_name, credential) as client:
-        async def do_search(query: str) -> dict:
-            # search query 
-            paged = await client.search(
-                search_text=query,
-                vector_queries=[{
-                    "fields": "vector",
-                    "kind": "text",
-                    "text": query,
-                    "exhaustive": True
-                }],
-                semantic_configuration_name="fraunhofer-rag-semantic-config",
-                query_type="semantic",
-                select=["url", "title", "chunk", "creationTime", "lastModifiedTime"],
-                top=max_results,
-            )
-            # async iterator to get all results
-            items = [doc async for doc in paged]
-            # Umwandlung in einfaches Dict-Format
-            results = [
-                {
-                    "title": doc.get("title"),
-                    "url": doc.get("url"),
-                    "content": doc.get("chunk"),
-                    "score": doc.get(reranker_key),
-                    "raw_content": doc.get("chunk") if include_raw_content else None
-                }
-                for doc in items
-            ]
-            return {"query": query, "results": results}
+    # Embed all queries that aren't cached in one request
+    query_vectors = {}
+    if embedding_model:
+        embedding_cache = get_search_cache("azureaisearch_embeddings")
+        query_vectors = {query: embedding_cache.get((embedding_model, query)) for query in search_queries}
+        missing_queries = [query for query, vector in query_vectors.items() if vector is None]
+        if missing_queries:
+            vectors = await get_embeddings(embedding_model).aembed_documents(missing_queries)
+            for query, vector in zip(missing_queries, vectors):
+                embedding_cache.set((embedding_model, query), vector)
+                query_vectors[query] = vector
+
+    def vector_query(query: str):
+        if query in query_vectors:
+            return VectorizedQuery(vector=query_vectors[query], fields="vector", k_nearest_neighbors=k_nearest_neighbors, exhaustive=exhaustive)
+        return VectorizableTextQuery(text=query, fields="vector", k_nearest_neighbors=k_nearest_neighbors, exhaustive=exhaustive)
+
+    async def run_search(query: str) -> list:
+        # search query 
+        paged = await client.search(
+            search_text=query,
+            vector_queries=[vector_query(query)],
+            semantic_configuration_name="fraunhofer-rag-semantic-config",
+            query_type="semantic",
+            select=["url", "title", "chunk", "creationTime", "lastModifiedTime"],
+            top=max_results,
+        )
+        # async iterator to get all results
+        return [doc async for doc in paged]
 
-        # parallelize the search queries
-        tasks = [do_search(q) for q in search_queries]
-        return await asyncio.gather(*tasks)
+    async def do_search(query: str) -> dict:
+        items = await limiter.call(lambda: run_search(query))
+        # Umwandlung in einfaches Dict-Format
+        results = [
+            {
+                "title": doc.get("title"),
+                "url": doc.get("url"),
+                "content": doc.get("chunk"),
+                "score": doc.get(reranker_key),
+                "raw_content": doc.get("chunk") if include_raw_content else None
+            }
+            for doc in items
+        ]
+        return {"query": query, "results": results}
+
+    # parallelize the search queries
+    tasks = [do_search(q) for q in search_queries]
+    return await asyncio.gather(*tasks)
 
 
 @traceable
-def perplexity_search(search_queries):
+async def perplexity_search_async(search_queries, timeout: Optional[float] = None):
     """Search the web using the Perplexity API.
     
     Args:
         search_queries (List[SearchQuery]): List of search queries to process
+        timeout (float, optional): Seconds to wait for each completion. Defaults to the pooled client's 60s.
   
     Returns:
         List[dict]: List of search responses from Perplexity API, one per query. Each response has format:
@@ -307,10 +320,11 @@ def perplexity_search(search_queries):
         "content-type": "application/json",
         "Authorization": f"Bearer {os.getenv('PERPLEXITY_API_KEY')}"
     }
+    client = get_http_client("perplexity")
+    limiter = get_rate_limiter("perplexity")
+    request_kwargs = {"timeout": timeout} if timeout is not None else {}
     
-    search_docs = []
-    for query in search_queries:
-
+    async def request_completion(query):
         payload = {
             "model": "sonar-pro",
             "messages": [
@@ -324,16 +338,25 @@ def perplexity_search(search_queries):
                 }
             ]
         }
-        
-        response = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers=headers,
-            json=payload
-        )
+        response = await client.post("/chat/completions", headers=headers, json=payload, **request_kwargs)
         response.raise_for_status()  # Raise exception for bad status codes
+        return response.json()
+    
+    async def process_query(query):
+        try:
+            data = await limiter.call(lambda: request_completion(query))
+        except Exception as e:
+            print(f"Error processing Perplexity query '{query}': {str(e)}")
+            return {
+                "query": query,
+                "follow_up_questions": None,
+                "answer": None,
+                "images": [],
+                "results": [],
+                "error": str(e)
+            }
         
         # Parse the response
-        data = response.json()
         content = data["choices"][0]["message"]["content"]
         citations = data.get("citations", ["https://perplexity.ai"])
         
@@ -360,15 +383,21 @@ def perplexity_search(search_queries):
             })
         
         # Format response to match Tavily structure
-        search_docs.append({
+        return {
             "query": query,
             "follow_up_questions": None,
             "answer": None,
             "images": [],
             "results": results
-        })
+        }
     
-    return search_docs
+    # Run all queries concurrently on the pooled client, within Perplexity's rate limit
+    return await asyncio.gather(*(process_query(query) for query in search_queries))
+
+
+def perplexity_search(search_queries, timeout: Optional[float] = None):
+    """Synchronous wrapper around perplexity_search_async, for callers outside an event loop."""
+    return asyncio.run(perplexity_search_async(search_queries, timeout=timeout))
 
 @traceable
 async def exa_search(search_queries, max_characters: Optional[int] = None, num_results=5, 
@@ -411,13 +440,13 @@ async def exa_search(search_queries, max_characters: Optional[int] = None, num_r
     if include_domains and exclude_domains:
         raise ValueError("Cannot specify both include_domains and exclude_domains")
     
-    # Initialize Exa client (API key should be configured in your .env file)
-    exa = Exa(api_key = f"{os.getenv('EXA_API_KEY')}")
+    # Reuse the process-wide Exa client (API key should be configured in your .env file)
+    exa = get_exa_client(os.getenv('EXA_API_KEY'))
     
     # Define the function to process a single query
     async def process_query(query):
         # Use run_in_executor to make the synchronous exa call in a non-blocking way
-        loop = asyncio.get_event_loop()
+        loop = asyncio.get_running_loop()
         
         # Define the function for the executor with all parameters
         def exa_search_fn():
@@ -440,7 +469,9 @@ async def exa_search(search_queries, max_characters: Optional[int] = None, num_r
                 
             return exa.search_and_contents(query, **kwargs)
         
-        response = await loop.run_in_executor(None, exa_search_fn)
+        response = await get_rate_limiter("exa").call(
+            lambda: loop.run_in_executor(get_search_executor(), exa_search_fn)
+        )
         
         # Format the response to match the expected output structure
         formatted_results = []
@@ -543,40 +574,59 @@ async def exa_search(search_queries, max_characters: Optional[int] = None, num_r
             "results": formatted_results
         }
     
-    # Process all queries sequentially with delay to respect rate limit
-    search_docs = []
-    for i, query in enumerate(search_queries):
+    async def process_query_safely(query):
         try:
-            # Add delay between requests (0.25s = 4 requests per second, well within the 5/s limit)
-            if i > 0:  # Don't delay the first request
-                await asyncio.sleep(0.25)
-            
-            result = await process_query(query)
-            search_docs.append(result)
+            return await process_query(query)
         except Exception as e:
             # Handle exceptions gracefully
             print(f"Error processing query '{query}': {str(e)}")
             # Add a placeholder result for failed queries to maintain index alignment
-            search_docs.append({
+            return {
                 "query": query,
                 "follow_up_questions": None,
                 "answer": None,
                 "images": [],
                 "results": [],
                 "error": str(e)
-            })
-            
-            # Add additional delay if we hit a rate limit error
-            if "429" in str(e):
-                print("Rate limit exceeded. Adding additional delay...")
-                await asyncio.sleep(1.0)  # Add a longer delay if we hit a rate limit
+            }
     
-    return search_docs
+    # Run all queries concurrently; the shared rate limiter keeps them within Exa's request rate
+    return await asyncio.gather(*(process_query_safely(query) for query in search_queries))
+
+# Query length and full text returned per paper, as with the langchain ArxivRetriever
+ARXIV_MAX_QUERY_LENGTH = 300
+ARXIV_MAX_CONTENT_CHARS = 4000
+ARXIV_IDENTIFIER_PATTERN = re.compile(r"\d{2}(0[1-9]|1[0-2])\.\d{4,5}(v\d+|)|\d{7}.*")
+
+def is_arxiv_identifier(query: str) -> bool:
+    """Whether the query is a list of arXiv ids rather than search terms."""
+    return all(ARXIV_IDENTIFIER_PATTERN.fullmatch(item) for item in query[:ARXIV_MAX_QUERY_LENGTH].split())
+
+def get_arxiv_metadata(paper: arxiv.Result, load_all_available_meta: bool = True) -> dict:
+    """Metadata of an arXiv search result, with the same keys as the langchain ArxivRetriever."""
+    metadata = {
+        "Published": str(paper.updated.date()),
+        "Title": paper.title,
+        "Authors": ", ".join(author.name for author in paper.authors),
+        "Summary": paper.summary,
+    }
+    if load_all_available_meta:
+        metadata.update({
+            "entry_id": paper.entry_id,
+            "published_first_time": str(paper.published.date()),
+            "comment": paper.comment,
+            "journal_ref": paper.journal_ref,
+            "doi": paper.doi,
+            "primary_category": paper.primary_category,
+            "categories": paper.categories,
+            "links": [link.href for link in paper.links],
+        })
+    return metadata
 
 @traceable
 async def arxiv_search_async(search_queries, load_max_docs=5, get_full_documents=True, load_all_available_meta=True):
     """
-    Performs concurrent searches on arXiv using the ArxivRetriever.
+    Performs concurrent searches on arXiv, downloading and parsing the full text of the papers concurrently.
 
     Args:
         search_queries (List[str]): List of search queries or article IDs
@@ -604,18 +654,58 @@ async def arxiv_search_async(search_queries, load_max_docs=5, get_full_documents
             }
     """
     
+    limiter = get_rate_limiter("arxiv")
+    search_cache = get_search_cache("arxiv")
+    paper_cache = get_paper_text_cache()
+    loop = asyncio.get_running_loop()
+    # Papers found by several queries are downloaded once
+    paper_texts = {}
+    
+    def search_papers(query):
+        # Remove the ":" and "-" from the query, as they can cause search problems
+        query = query.replace(":", "").replace("-", "")
+        if is_arxiv_identifier(query):
+            search = arxiv.Search(id_list=query.split(), max_results=load_max_docs)
+        else:
+            search = arxiv.Search(query=query[:ARXIV_MAX_QUERY_LENGTH], max_results=load_max_docs)
+        return list(get_arxiv_client().results(search))
+    
+    async def fetch_paper_text(paper):
+        paper_id = paper.get_short_id()
+        text = await loop.run_in_executor(get_search_executor(), paper_cache.get, paper_id)
+        if text is None:
+            response = await get_http_client("arxiv").get(paper.pdf_url)
+            response.raise_for_status()
+            # Parsing is CPU bound, so it runs in worker processes to overlap with other downloads
+            text = await loop.run_in_executor(get_pdf_executor(), extract_pdf_text, response.content)
+            await loop.run_in_executor(get_search_executor(), paper_cache.set, paper_id, text)
+        return text
+    
+    async def get_paper_text(paper):
+        paper_id = paper.get_short_id()
+        if paper_id not in paper_texts:
+            paper_texts[paper_id] = asyncio.ensure_future(fetch_paper_text(paper))
+        try:
+            return (await paper_texts[paper_id])[:ARXIV_MAX_CONTENT_CHARS]
+        except Exception as e:
+            print(f"Warning: Failed to fetch full text for {paper.entry_id}: {str(e)}")
+            return None
+    
     async def process_single_query(query):
         try:
-            # Create retriever for each query
-            retriever = ArxivRetriever(
-                load_max_docs=load_max_docs,
-                get_full_documents=get_full_documents,
-                load_all_available_meta=load_all_available_meta
-            )
-            
-            # Run the synchronous retriever in a thread pool
-            loop = asyncio.get_event_loop()
-            docs = await loop.run_in_executor(None, lambda: retriever.invoke(query))
+            # Only the metadata search is held to arXiv's API rate limit; PDFs are downloaded as soon as it returns
+            papers = search_cache.get((query, load_max_docs))
+            if papers is None:
+                papers = await limiter.call(lambda: loop.run_in_executor(get_search_executor(), search_papers, query))
+                search_cache.set((query, load_max_docs), papers)
+            if get_full_documents:
+                texts = await asyncio.gather(*(get_paper_text(paper) for paper in papers))
+            else:
+                texts = [None] * len(papers)
+            docs = [
+                Document(page_content=text or "", metadata=get_arxiv_metadata(paper, load_all_available_meta))
+                for paper, text in zip(papers, texts)
+            ]
             
             results = []
             # Assign decreasing scores based on the order
@@ -678,7 +768,7 @@ async def arxiv_search_async(search_queries, load_max_docs=5, get_full_documents
                     'url': url,  # Using entry_id as the URL
                     'content': content,
                     'score': base_score - (i * score_decrement),
-                    'raw_content': doc.page_content if get_full_documents else None
+                    'raw_content': (doc.page_content or None) if get_full_documents else None
                 }
                 results.append(result)
                 
@@ -701,39 +791,62 @@ async def arxiv_search_async(search_queries, load_max_docs=5, get_full_documents
                 'error': str(e)
             }
     
-    # Process queries sequentially with delay to respect arXiv rate limit (1 request per 3 seconds)
-    search_docs = []
-    for i, query in enumerate(search_queries):
-        try:
-            # Add delay between requests (3 seconds per ArXiv's rate limit)
-            if i > 0:  # Don't delay the first request
-                await asyncio.sleep(3.0)
-            
-            result = await process_single_query(query)
-            search_docs.append(result)
-        except Exception as e:
-            # Handle exceptions gracefully
-            print(f"Error processing arXiv query '{query}': {str(e)}")
-            search_docs.append({
-                'query': query,
-                'follow_up_questions': None,
-                'answer': None,
-                'images': [],
-                'results': [],
-                'error': str(e)
-            })
-            
-            # Add additional delay if we hit a rate limit error
-            if "429" in str(e) or "Too Many Requests" in str(e):
-                print("ArXiv rate limit exceeded. Adding additional delay...")
-                await asyncio.sleep(5.0)  # Add a longer delay if we hit a rate limit
-    
-    return search_docs
+    # The shared arXiv limiter spaces the requests (1 request per 3 seconds) and backs off on 429s
+    return await asyncio.gather(*(process_single_query(query) for query in search_queries))
+
+# PubMed E-utilities: at most this many PMIDs are fetched per efetch request
+PUBMED_EFETCH_BATCH_SIZE = 200
+PUBMED_MAX_QUERY_LENGTH = 300
+
+def get_element_text(element: Optional[ET.Element]) -> str:
+    """Text of an XML element including its inline markup (e.g. <i>, <sup>), or "" if it is missing."""
+    return "".join(element.itertext()).strip() if element is not None else ""
+
+def parse_pubmed_articles(xml_text: str) -> Dict[str, dict]:
+    """Parse an efetch response into article records keyed by PMID, in the format of PubMedAPIWrapper."""
+    articles = {}
+    for node in ET.fromstring(xml_text):
+        # Journal articles and book chapters keep their details in different elements
+        if node.tag == "PubmedArticle":
+            uid = get_element_text(node.find("MedlineCitation/PMID"))
+            article = node.find("MedlineCitation/Article")
+        elif node.tag == "PubmedBookArticle":
+            uid = get_element_text(node.find("BookDocument/PMID"))
+            article = node.find("BookDocument")
+        else:
+            continue
+        if not uid or article is None:
+            continue
+        
+        summaries = []
+        for abstract_text in article.findall("Abstract/AbstractText"):
+            text = get_element_text(abstract_text)
+            label = abstract_text.get("Label")
+            summaries.append(f"{label}: {text}" if label else text)
+        
+        article_date = article.find("ArticleDate")
+        published = "-".join(
+            get_element_text(article_date.find(part)) if article_date is not None else ""
+            for part in ("Year", "Month", "Day")
+        )
+        
+        articles[uid] = {
+            "uid": uid,
+            "Title": get_element_text(article.find("ArticleTitle")),
+            "Published": published,
+            "Copyright Information": get_element_text(article.find("Abstract/CopyrightInformation")),
+            "Summary": "\n".join(summaries) if summaries else "No abstract available",
+        }
+    return articles
 
 @traceable
 async def pubmed_search_async(search_queries, top_k_results=5, email=None, api_key=None, doc_content_chars_max=4000):
     """
-    Performs concurrent searches on PubMed using the PubMedAPIWrapper.
+    Performs concurrent searches on PubMed with the NCBI E-utilities.
+
+    All esearch requests run concurrently within the NCBI rate limit (3 requests per second, or 10 with
+    an API key). The PMIDs found by all queries are then fetched together in batched efetch requests,
+    skipping articles that were already fetched by earlier searches.
 
     Args:
         search_queries (List[str]): List of search queries
@@ -762,119 +875,112 @@ async def pubmed_search_async(search_queries, top_k_results=5, email=None, api_k
             }
     """
     
-    async def process_single_query(query):
-        try:
-            # print(f"Processing PubMed query: '{query}'")
-            
-            # Create PubMed wrapper for the query
-            wrapper = PubMedAPIWrapper(
-                top_k_results=top_k_results,
-                doc_content_chars_max=doc_content_chars_max,
-                email=email if email else "your_email@example.com",
-                api_key=api_key if api_key else ""
-            )
-            
-            # Run the synchronous wrapper in a thread pool
-            loop = asyncio.get_event_loop()
-            
-            # Use wrapper.lazy_load instead of load to get better visibility
-            docs = await loop.run_in_executor(None, lambda: list(wrapper.lazy_load(query)))
-            
-            print(f"Query '{query}' returned {len(docs)} results")
-            
-            results = []
-            # Assign decreasing scores based on the order
-            base_score = 1.0
-            score_decrement = 1.0 / (len(docs) + 1) if docs else 0
-            
-            for i, doc in enumerate(docs):
-                # Format content with metadata
-                content_parts = []
-                
-                if doc.get('Published'):
-                    content_parts.append(f"Published: {doc['Published']}")
-                
-                if doc.get('Copyright Information'):
-                    content_parts.append(f"Copyright Information: {doc['Copyright Information']}")
-                
-                if doc.get('Summary'):
-                    content_parts.append(f"Summary: {doc['Summary']}")
-                
-                # Generate PubMed URL from the article UID
-                uid = doc.get('uid', '')
-                url = f"https://pubmed.ncbi.nlm.nih.gov/{uid}/" if uid else ""
-                
-                # Join all content parts with newlines
-                content = "\n".join(content_parts)
-                
-                result = {
-                    'title': doc.get('Title', ''),
-                    'url': url,
-                    'content': content,
-                    'score': base_score - (i * score_decrement),
-                    'raw_content': doc.get('Summary', '')
-                }
-                results.append(result)
-            
-            return {
-                'query': query,
-                'follow_up_questions': None,
-                'answer': None,
-                'images': [],
-                'results': results
-            }
-        except Exception as e:
-            # Handle exceptions with more detailed information
-            error_msg = f"Error processing PubMed query '{query}': {str(e)}"
-            print(error_msg)
-            import traceback
-            print(traceback.format_exc())  # Print full traceback for debugging
-            
-            return {
-                'query': query,
-                'follow_up_questions': None,
-                'answer': None,
-                'images': [],
-                'results': [],
-                'error': str(e)
-            }
+    client = get_http_client("pubmed")
+    # NCBI allows more requests per second with an API key
+    limiter = get_rate_limiter("pubmed_api_key" if api_key else "pubmed")
+    search_cache = get_search_cache("pubmed")
+    article_cache = get_search_cache("pubmed_articles")
+    loop = asyncio.get_running_loop()
+    common_params = {"db": "pubmed", "tool": "open_deep_research"}
+    if email:
+        common_params["email"] = email
+    if api_key:
+        common_params["api_key"] = api_key
     
-    # Process all queries with a reasonable delay between them
-    search_docs = []
+    async def esearch(query):
+        params = {**common_params, "term": query[:PUBMED_MAX_QUERY_LENGTH], "retmode": "json", "retmax": top_k_results}
+        response = await client.get("esearch.fcgi", params=params)
+        # Raise so that the limiter backs off and retries rate limit errors
+        response.raise_for_status()
+        return response.json()["esearchresult"]["idlist"]
     
-    # Start with a small delay that increases if we encounter rate limiting
-    delay = 1.0  # Start with a more conservative delay
+    async def efetch(uids):
+        # POST, since a long list of ids doesn't fit in a URL
+        response = await client.post("efetch.fcgi", data={**common_params, "retmode": "xml", "id": ",".join(uids)})
+        response.raise_for_status()
+        return await loop.run_in_executor(get_search_executor(), parse_pubmed_articles, response.text)
     
-    for i, query in enumerate(search_queries):
-        try:
-            # Add delay between requests
-            if i > 0:  # Don't delay the first request
-                # print(f"Waiting {delay} seconds before next query...")
-                await asyncio.sleep(delay)
-            
-            result = await process_single_query(query)
-            search_docs.append(result)
-            
-            # If query was successful with results, we can slightly reduce delay (but not below minimum)
-            if result.get('results') and len(result['results']) > 0:
-                delay = max(0.5, delay * 0.9)  # Don't go below 0.5 seconds
-            
-        except Exception as e:
-            # Handle exceptions gracefully
-            error_msg = f"Error in main loop processing PubMed query '{query}': {str(e)}"
-            print(error_msg)
-            
+    async def search_uids(query):
+        uids = search_cache.get((query, top_k_results))
+        if uids is None:
+            uids = await limiter.call(lambda: esearch(query))
+            search_cache.set((query, top_k_results), uids)
+        return uids
+    
+    # Search all queries at once, then fetch every article that isn't cached in as few requests as possible
+    query_uids = await asyncio.gather(*(search_uids(query) for query in search_queries), return_exceptions=True)
+    found_uids = [uid for uids in query_uids if not isinstance(uids, BaseException) for uid in uids]
+    missing_uids = [uid for uid in dict.fromkeys(found_uids) if article_cache.get(uid) is None]
+    batches = [missing_uids[i:i + PUBMED_EFETCH_BATCH_SIZE] for i in range(0, len(missing_uids), PUBMED_EFETCH_BATCH_SIZE)]
+    fetched = await asyncio.gather(*(limiter.call(lambda batch=batch: efetch(batch)) for batch in batches), return_exceptions=True)
+    
+    articles = {}
+    for batch_articles in fetched:
+        if isinstance(batch_articles, BaseException):
+            print(f"Error fetching PubMed articles: {str(batch_articles)}")
+            continue
+        for uid, article in batch_articles.items():
+            article_cache.set(uid, article)
+            articles[uid] = article
+    
+    search_docs = []
+    for query, uids in zip(search_queries, query_uids):
+        if isinstance(uids, BaseException):
+            print(f"Error processing PubMed query '{query}': {str(uids)}")
             search_docs.append({
                 'query': query,
                 'follow_up_questions': None,
                 'answer': None,
                 'images': [],
                 'results': [],
-                'error': str(e)
+                'error': str(uids)
             })
+            continue
+        
+        docs = [doc for doc in (articles.get(uid) or article_cache.get(uid) for uid in uids) if doc is not None]
+        print(f"Query '{query}' returned {len(docs)} results")
+        
+        results = []
+        # Assign decreasing scores based on the order
+        base_score = 1.0
+        score_decrement = 1.0 / (len(docs) + 1) if docs else 0
+        
+        for i, doc in enumerate(docs):
+            # Format content with metadata
+            content_parts = []
+            
+            if doc.get('Published'):
+                content_parts.append(f"Published: {doc['Published']}")
+            
+            if doc.get('Copyright Information'):
+                content_parts.append(f"Copyright Information: {doc['Copyright Information']}")
+            
+            if doc.get('Summary'):
+                content_parts.append(f"Summary: {doc['Summary']}")
             
-            # If we hit an exception, increase delay for next query
-            delay = min(5.0, delay * 1.5)  # Don't exceed 5 seconds
+            # Generate PubMed URL from the article UID
+            uid = doc.get('uid', '')
+            url = f"https://pubmed.ncbi.nlm.nih.gov/{uid}/" if uid else ""
+            
+            # Join all content parts with newlines
+            content = "\n".join(content_parts)
+            
+            result = {
+                'title': doc.get('Title', ''),
+                'url': url,
+                'content': content,
+                'score': base_score - (i * score_decrement),
+                'raw_content': doc.get('Summary', '')[:doc_content_chars_max]
+            }
+            results.append(result)
+        
+        search_docs.append({
+            'query': query,
+            'follow_up_questions': None,
+            'answer': None,
+            'images': [],
+            'results': results
+        })
     
     return search_docs
 
@@ -901,14 +1007,15 @@ async def linkup_search(search_queries, depth: Optional[str] = "standard"):
             }
     """
     client = LinkupClient()
+    limiter = get_rate_limiter("linkup")
     search_tasks = []
     for query in search_queries:
         search_tasks.append(
-                client.async_search(
+                limiter.call(lambda query=query: client.async_search(
                     query,
                     depth,
                     output_type="searchResults",
-                )
+                ))
             )
 
     search_results = []
@@ -924,6 +1031,23 @@ async def linkup_search(search_queries, depth: Optional[str] = "standard"):
 
     return search_results
 
+# Pages beyond this size are truncated rather than read in full
+SCRAPE_MAX_BYTES = 2_000_000
+scrape_host_limiter = HostConcurrencyLimiter(max_per_host=int(os.environ.get("SCRAPE_MAX_CONNECTIONS_PER_HOST", "2")))
+# lxml parses pages several times faster than the pure Python parser, when it is installed
+HTML_PARSER = "lxml" if lxml is not None else "html.parser"
+
+async def read_capped_text(response: aiohttp.ClientResponse, max_bytes: int = SCRAPE_MAX_BYTES) -> str:
+    """Read at most max_bytes of an aiohttp response body and decode it, replacing undecodable bytes."""
+    chunks = []
+    size = 0
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            break
+    return b"".join(chunks)[:max_bytes].decode(response.charset or "utf-8", errors="replace")
+
 @traceable
 async def google_search_async(search_queries: Union[str, List[str]], max_results: int = 5, include_raw_content: bool = True):
     """
@@ -958,291 +1082,264 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
         openssl_version = f"OpenSSL/{random.randint(1, 3)}.{random.randint(0, 4)}.{random.randint(0, 9)}"
         return f"{lynx_version} {libwww_version} {ssl_mm_version} {openssl_version}"
     
-    # Create executor for running synchronous operations
-    executor = None if use_api else concurrent.futures.ThreadPoolExecutor(max_workers=5)
+    # Requests are paced by the shared limiter for the API or for scraping
+    limiter = get_rate_limiter("googlesearch" if use_api else "google_scrape")
+    # All requests share one keep-alive session, and parsing runs on the shared worker threads
+    session = get_aiohttp_session()
+    loop = asyncio.get_running_loop()
+    executor = get_search_executor()
     
-    # Use a semaphore to limit concurrent requests
-    semaphore = asyncio.Semaphore(5 if use_api else 2)
+    async def fetch_api_page(params):
+        async with session.get('https://www.googleapis.com/customsearch/v1', params=params) as response:
+            if response.status == 429:
+                # Raise so that the limiter backs off and retries
+                response.raise_for_status()
+            if response.status != 200:
+                error_text = await response.text()
+                print(f"API error: {response.status}, {error_text}")
+                return None
+            return await response.json()
+    
+    async def fetch_results_page(query, start):
+        params = {
+            "q": query,
+            "num": max_results + 2,
+            "hl": "en",
+            "start": start,
+            "safe": "active",
+        }
+        headers = {
+            "User-Agent": get_useragent(),
+            "Accept": "*/*"
+        }
+        cookies = {
+            'CONSENT': 'PENDING+987',  # Bypasses the consent page
+            'SOCS': 'CAESHAgBEhIaAB',
+        }
+        async with session.get("https://www.google.com/search", params=params, headers=headers, cookies=cookies) as response:
+            response.raise_for_status()
+            return await read_capped_text(response)
+    
+    def parse_results_page(html):
+        soup = BeautifulSoup(html, HTML_PARSER)
+        page_results = []
+        for result in soup.find_all("div", class_="ezO2md"):
+            link_tag = result.find("a", href=True)
+            title_tag = link_tag.find("span", class_="CVA68e") if link_tag else None
+            description_tag = result.find("span", class_="FrIlee")
+            
+            if link_tag and title_tag and description_tag:
+                page_results.append({
+                    "title": title_tag.text,
+                    "url": unquote(link_tag["href"].split("&")[0].replace("/url?q=", "")),
+                    "content": description_tag.text,
+                })
+        return page_results
+    
+    async def scrape_query(query):
+        fetched_links = set()
+        search_results = []
+        start = 0
+        try:
+            while len(search_results) < max_results:
+                # Every page, not just the first, draws from the shared scraping budget
+                html = await limiter.call(lambda start=start: fetch_results_page(query, start))
+                page_results = await loop.run_in_executor(executor, parse_results_page, html)
+                new_results = 0
+                
+                for result in page_results:
+                    if result["url"] in fetched_links:
+                        continue
+                    
+                    fetched_links.add(result["url"])
+                    # Store result in the same format as the API results
+                    search_results.append({
+                        "title": result["title"],
+                        "url": result["url"],
+                        "content": result["content"],
+                        "score": None,
+                        "raw_content": result["content"]
+                    })
+                    new_results += 1
+                    
+                    if len(search_results) >= max_results:
+                        break
+                
+                if new_results == 0:
+                    break
+                    
+                start += 10
+        except Exception as e:
+            if is_rate_limit_error(e):
+                raise
+            print(f"Error in Google search for '{query}': {str(e)}")
+        return search_results
+    
+    def extract_text(html):
+        return BeautifulSoup(html, HTML_PARSER).get_text()
     
     async def search_single_query(query):
-        async with semaphore:
-            try:
-                results = []
+        try:
+            results = []
+            
+            # API-based search
+            if use_api:
+                # The API returns up to 10 results per request
+                for start_index in range(1, max_results + 1, 10):
+                    # Calculate how many results to request in this batch
+                    num = min(10, max_results - (start_index - 1))
+                    
+                    # Make request to Google Custom Search API
+                    params = {
+                        'q': query,
+                        'key': api_key,
+                        'cx': cx,
+                        'start': start_index,
+                        'num': num
+                    }
+                    print(f"Requesting {num} results for '{query}' from Google API...")
+
+                    data = await limiter.call(lambda params=params: fetch_api_page(params))
+                    if data is None:
+                        break
+                            
+                    # Process search results
+                    for item in data.get('items', []):
+                        result = {
+                            "title": item.get('title', ''),
+                            "url": item.get('link', ''),
+                            "content": item.get('snippet', ''),
+                            "score": None,
+                            "raw_content": item.get('snippet', '')
+                        }
+                        results.append(result)
+                    
+                    # If we didn't get a full page of results, no need to request more
+                    if not data.get('items') or len(data.get('items', [])) < num:
+                        break
+            
+            # Web scraping based search
+            else:
+                print(f"Scraping Google for '{query}'...")
+                results = await scrape_query(query)
+            
+            # If requested, fetch full page content asynchronously (for both API and web scraping)
+            if include_raw_content and results:
+                content_semaphore = asyncio.Semaphore(3)
                 
-                # API-based search
-                if use_api:
-                    # The API returns up to 10 results per request
-                    for start_index in range(1, max_results + 1, 10):
-                        # Calculate how many results to request in this batch
-                        num = min(10, max_results - (start_index - 1))
-                        
-                        # Make request to Google Custom Search API
-                        params = {
-                            'q': query,
-                            'key': api_key,
-                            'cx': cx,
-                            'start': start_index,
-                            'num': num
+                async def fetch_full_content(result):
+                    async with content_semaphore, scrape_host_limiter.slot(result['url']):
+                        url = result['url']
+                        headers = {
+                            'User-Agent': get_useragent(),
+                            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
                         }
-                        print(f"Requesting {num} results for '{query}' from Google API...")
-
-                        async with aiohttp.ClientSession() as session:
-                            async with session.get('https://www.googleapis.com/customsearch/v1', params=params) as response:
-                                if response.status != 200:
-                                    error_text = await response.text()
-                                    print(f"API error: {response.status}, {error_text}")
-                                    break
-                                    
-                                data = await response.json()
-                                
-                                # Process search results
-                                for item in data.get('items', []):
-                                    result = {
-                                        "title": item.get('title', ''),
-                                        "url": item.get('link', ''),
-                                        "content": item.get('snippet', ''),
-                                        "score": None,
-                                        "raw_content": item.get('snippet', '')
-                                    }
-                                    results.append(result)
-                        
-                        # Respect API quota with a small delay
-                        await asyncio.sleep(0.2)
                         
-                        # If we didn't get a full page of results, no need to request more
-                        if not data.get('items') or len(data.get('items', [])) < num:
-                            break
-                
-                # Web scraping based search
-                else:
-                    # Add delay between requests
-                    await asyncio.sleep(0.5 + random.random() * 1.5)
-                    print(f"Scraping Google for '{query}'...")
-
-                    # Define scraping function
-                    def google_search(query, max_results):
                         try:
-                            lang = "en"
-                            safe = "active"
-                            start = 0
-                            fetched_results = 0
-                            fetched_links = set()
-                            search_results = []
-                            
-                            while fetched_results < max_results:
-                                # Send request to Google
-                                resp = requests.get(
-                                    url="https://www.google.com/search",
-                                    headers={
-                                        "User-Agent": get_useragent(),
-                                        "Accept": "*/*"
-                                    },
-                                    params={
-                                        "q": query,
-                                        "num": max_results + 2,
-                                        "hl": lang,
-                                        "start": start,
-                                        "safe": safe,
-                                    },
-                                    cookies = {
-                                        'CONSENT': 'PENDING+987',  # Bypasses the consent page
-                                        'SOCS': 'CAESHAgBEhIaAB',
-                                    }
-                                )
-                                resp.raise_for_status()
-                                
-                                # Parse results
-                                soup = BeautifulSoup(resp.text, "html.parser")
-                                result_block = soup.find_all("div", class_="ezO2md")
-                                new_results = 0
-                                
-                                for result in result_block:
-                                    link_tag = result.find("a", href=True)
-                                    title_tag = link_tag.find("span", class_="CVA68e") if link_tag else None
-                                    description_tag = result.find("span", class_="FrIlee")
+                            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                                if response.status == 200:
+                                    # Check content type to handle binary files
+                                    content_type = response.headers.get('Content-Type', '').lower()
                                     
-                                    if link_tag and title_tag and description_tag:
-                                        link = unquote(link_tag["href"].split("&")[0].replace("/url?q=", ""))
-                                        
-                                        if link in fetched_links:
-                                            continue
-                                        
-                                        fetched_links.add(link)
-                                        title = title_tag.text
-                                        description = description_tag.text
-                                        
-                                        # Store result in the same format as the API results
-                                        search_results.append({
-                                            "title": title,
-                                            "url": link,
-                                            "content": description,
-                                            "score": None,
-                                            "raw_content": description
-                                        })
-                                        
-                                        fetched_results += 1
-                                        new_results += 1
-                                        
-                                        if fetched_results >= max_results:
-                                            break
-                                
-                                if new_results == 0:
-                                    break
-                                    
-                                start += 10
-                                time.sleep(1)  # Delay between pages
-                            
-                            return search_results
-                                
+                                    # Handle PDFs and other binary files
+                                    if 'application/pdf' in content_type or 'application/octet-stream' in content_type:
+                                        # For PDFs, indicate that content is binary and not parsed
+                                        result['raw_content'] = f"[Binary content: {content_type}. Content extraction not supported for this file type.]"
+                                    else:
+                                        # Decode as UTF-8 with replacements for non-UTF8 characters, reading at most SCRAPE_MAX_BYTES
+                                        html = await read_capped_text(response)
+                                        result['raw_content'] = await loop.run_in_executor(executor, extract_text, html)
                         except Exception as e:
-                            print(f"Error in Google search for '{query}': {str(e)}")
-                            return []
-                    
-                    # Execute search in thread pool
-                    loop = asyncio.get_running_loop()
-                    search_results = await loop.run_in_executor(
-                        executor, 
-                        lambda: google_search(query, max_results)
-                    )
-                    
-                    # Process the results
-                    results = search_results
+                            print(f"Warning: Failed to fetch content for {url}: {str(e)}")
+                            result['raw_content'] = f"[Error fetching content: {str(e)}]"
+                        return result
                 
-                # If requested, fetch full page content asynchronously (for both API and web scraping)
-                if include_raw_content and results:
-                    content_semaphore = asyncio.Semaphore(3)
-                    
-                    async with aiohttp.ClientSession() as session:
-                        fetch_tasks = []
-                        
-                        async def fetch_full_content(result):
-                            async with content_semaphore:
-                                url = result['url']
-                                headers = {
-                                    'User-Agent': get_useragent(),
-                                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
-                                }
-                                
-                                try:
-                                    await asyncio.sleep(0.2 + random.random() * 0.6)
-                                    async with session.get(url, headers=headers, timeout=10) as response:
-                                        if response.status == 200:
-                                            # Check content type to handle binary files
-                                            content_type = response.headers.get('Content-Type', '').lower()
-                                            
-                                            # Handle PDFs and other binary files
-                                            if 'application/pdf' in content_type or 'application/octet-stream' in content_type:
-                                                # For PDFs, indicate that content is binary and not parsed
-                                                result['raw_content'] = f"[Binary content: {content_type}. Content extraction not supported for this file type.]"
-                                            else:
-                                                try:
-                                                    # Try to decode as UTF-8 with replacements for non-UTF8 characters
-                                                    html = await response.text(errors='replace')
-                                                    soup = BeautifulSoup(html, 'html.parser')
-                                                    result['raw_content'] = soup.get_text()
-                                                except UnicodeDecodeError as ude:
-                                                    # Fallback if we still have decoding issues
-                                                    result['raw_content'] = f"[Could not decode content: {str(ude)}]"
-                                except Exception as e:
-                                    print(f"Warning: Failed to fetch content for {url}: {str(e)}")
-                                    result['raw_content'] = f"[Error fetching content: {str(e)}]"
-                                return result
-                        
-                        for result in results:
-                            fetch_tasks.append(fetch_full_content(result))
-                        
-                        updated_results = await asyncio.gather(*fetch_tasks)
-                        results = updated_results
-                        print(f"Fetched full content for {len(results)} results")
+                results = await asyncio.gather(*(fetch_full_content(result) for result in results))
+                print(f"Fetched full content for {len(results)} results")
+            
+            return {
+                "query": query,
+                "follow_up_questions": None,
+                "answer": None,
+                "images": [],
+                "results": results
+            }
+        except Exception as e:
+            print(f"Error in Google search for query '{query}': {str(e)}")
+            return {
+                "query": query,
+                "follow_up_questions": None,
+                "answer": None,
+                "images": [],
+                "results": []
+            }
+
+    # Execute all searches concurrently
+    return await asyncio.gather(*(search_single_query(query) for query in search_queries))
+
+async def fetch_page_markdown(client: httpx.AsyncClient, url: str, max_bytes: int = SCRAPE_MAX_BYTES) -> str:
+    """Fetch a page and convert it to markdown, reading at most max_bytes of the body."""
+    try:
+        async with scrape_host_limiter.slot(url):
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()
                 
-                return {
-                    "query": query,
-                    "follow_up_questions": None,
-                    "answer": None,
-                    "images": [],
-                    "results": results
-                }
-            except Exception as e:
-                print(f"Error in Google search for query '{query}': {str(e)}")
-                return {
-                    "query": query,
-                    "follow_up_questions": None,
-                    "answer": None,
-                    "images": [],
-                    "results": []
-                }
+                # Handle different content types
+                content_type = response.headers.get('Content-Type', '')
+                if 'text/html' not in content_type:
+                    # For non-HTML content, just mention the content type (and don't download the body)
+                    return f"Content type: {content_type} (not converted to markdown)"
+                
+                # Stream the body so that huge pages never sit in memory in full
+                chunks = []
+                size = 0
+                truncated = False
+                async for chunk in response.aiter_bytes():
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= max_bytes:
+                        truncated = True
+                        break
+                html = b"".join(chunks)[:max_bytes].decode(response.encoding or "utf-8", errors="replace")
+    except Exception as e:
+        # Handle any exceptions during fetch
+        return f"Error fetching URL: {str(e)}"
     
-    try:
-        # Create tasks for all search queries
-        search_tasks = [search_single_query(query) for query in search_queries]
-        
-        # Execute all searches concurrently
-        search_results = await asyncio.gather(*search_tasks)
-        
-        return search_results
-    finally:
-        # Only shut down executor if it was created
-        if executor:
-            executor.shutdown(wait=False)
-
-async def scrape_pages(titles: List[str], urls: List[str]) -> str:
+    # Convert HTML to markdown in a worker, keeping the event loop free for other fetches
+    loop = asyncio.get_running_loop()
+    markdown_content = await loop.run_in_executor(get_conversion_executor(), markdownify, html)
+    if truncated:
+        markdown_content += f"\n\n[Page truncated at {max_bytes} bytes]"
+    return markdown_content
+
+async def scrape_pages(titles: List[str], urls: List[str], max_bytes: int = SCRAPE_MAX_BYTES) -> str:
     """
     Scrapes content from a list of URLs and formats it into a readable markdown document.
     
     This function:
     1. Takes a list of page titles and URLs
-    2. Makes asynchronous HTTP requests to each URL
-    3. Converts HTML content to markdown
+    2. Fetches all URLs concurrently on a pooled HTTP client, at most a few per host at a time
+    3. Converts HTML content to markdown in a worker pool
     4. Formats all content with clear source attribution
     
     Args:
         titles (List[str]): A list of page titles corresponding to each URL
         urls (List[str]): A list of URLs to scrape content from
+        max_bytes (int): Maximum number of bytes to read from each page
         
     Returns:
         str: A formatted string containing the full content of each page in markdown format,
              with clear section dividers and source attribution
     """
+    client = get_http_client("scrape")
+    # Results of different queries often share pages, so fetch each URL once
+    unique_urls = list(dict.fromkeys(urls))
+    fetched = await asyncio.gather(*(fetch_page_markdown(client, url, max_bytes) for url in unique_urls))
+    pages_by_url = dict(zip(unique_urls, fetched))
+    pages = [pages_by_url[url] for url in urls]
     
-    # Create an async HTTP client
-    async with httpx.AsyncClient(follow_redirects=True, timeout=30.0) as client:
-        pages = []
-        
-        # Fetch each URL and convert to markdown
-        for url in urls:
-            try:
-                # Fetch the content
-                response = await client.get(url)
-                response.raise_for_status()
-                
-                # Convert HTML to markdown if successful
-                if response.status_code == 200:
-                    # Handle different content types
-                    content_type = response.headers.get('Content-Type', '')
-                    if 'text/html' in content_type:
-                        # Convert HTML to markdown
-                        markdown_content = markdownify(response.text)
-                        pages.append(markdown_content)
-                    else:
-                        # For non-HTML content, just mention the content type
-                        pages.append(f"Content type: {content_type} (not converted to markdown)")
-                else:
-                    pages.append(f"Error: Received status code {response.status_code}")
-        
-            except Exception as e:
-                # Handle any exceptions during fetch
-                pages.append(f"Error fetching URL: {str(e)}")
-        
-        # Create formatted output
-        formatted_output = f"Search results: \n\n"
-        
-        for i, (title, url, page) in enumerate(zip(titles, urls, pages)):
-            formatted_output += f"\n\n--- SOURCE {i+1}: {title} ---\n"
-            formatted_output += f"URL: {url}\n\n"
-            formatted_output += f"FULL CONTENT:\n {page}"
-            formatted_output += "\n\n" + "-" * 80 + "\n"
-        
-    return formatted_output
+    # Create formatted output
+    return format_scraped_pages(titles, urls, pages)
 
 @tool
 async def duckduckgo_search(search_queries: List[str]):
@@ -1255,99 +1352,62 @@ async def duckduckgo_search(search_queries: List[str]):
         str: A formatted string of search results
     """
     
+    limiter = get_rate_limiter("duckduckgo")
+    cache = get_search_cache("duckduckgo")
+    loop = asyncio.get_running_loop()
+    
+    def perform_search(query):
+        with ddgs_session() as ddgs:
+            return list(ddgs.text(query, max_results=5))
+    
     async def process_single_query(query):
-        # Execute synchronous search in the event loop's thread pool
-        loop = asyncio.get_event_loop()
+        ddg_results = cache.get(query)
+        if ddg_results is None:
+            try:
+                # Rate limit errors are retried with backoff, and slow down every DuckDuckGo search in the process
+                ddg_results = await limiter.call(lambda: loop.run_in_executor(get_search_executor(), perform_search, query))
+            except Exception as e:
+                print(f"DuckDuckGo search failed for query '{query}': {str(e)}")
+                # Return empty results but with query info preserved
+                return {
+                    'query': query,
+                    'follow_up_questions': None,
+                    'answer': None,
+                    'images': [],
+                    'results': [],
+                    'error': str(e)
+                }
+            cache.set(query, ddg_results)
         
-        def perform_search():
-            max_retries = 3
-            retry_count = 0
-            backoff_factor = 2.0
-            last_exception = None
-            
-            while retry_count <= max_retries:
-                try:
-                    results = []
-                    with DDGS() as ddgs:
-                        # Change query slightly and add delay between retries
-                        if retry_count > 0:
-                            # Random delay with exponential backoff
-                            delay = backoff_factor ** retry_count + random.random()
-                            print(f"Retry {retry_count}/{max_retries} for query '{query}' after {delay:.2f}s delay")
-                            time.sleep(delay)
-                            
-                            # Add a random element to the query to bypass caching/rate limits
-                            modifiers = ['about', 'info', 'guide', 'overview', 'details', 'explained']
-                            modified_query = f"{query} {random.choice(modifiers)}"
-                        else:
-                            modified_query = query
-                        
-                        # Execute search
-                        ddg_results = list(ddgs.text(modified_query, max_results=5))
-                        
-                        # Format results
-                        for i, result in enumerate(ddg_results):
-                            results.append({
-                                'title': result.get('title', ''),
-                                'url': result.get('href', ''),
-                                'content': result.get('body', ''),
-                                'score': 1.0 - (i * 0.1),  # Simple scoring mechanism
-                                'raw_content': result.get('body', '')
-                            })
-                        
-                        # Return successful results
-                        return {
-                            'query': query,
-                            'follow_up_questions': None,
-                            'answer': None,
-                            'images': [],
-                            'results': results
-                        }
-                except Exception as e:
-                    # Store the exception and retry
-                    last_exception = e
-                    retry_count += 1
-                    print(f"DuckDuckGo search error: {str(e)}. Retrying {retry_count}/{max_retries}")
-                    
-                    # If not a rate limit error, don't retry
-                    if "Ratelimit" not in str(e) and retry_count >= 1:
-                        print(f"Non-rate limit error, stopping retries: {str(e)}")
-                        break
-            
-            # If we reach here, all retries failed
-            print(f"All retries failed for query '{query}': {str(last_exception)}")
-            # Return empty results but with query info preserved
-            return {
-                'query': query,
-                'follow_up_questions': None,
-                'answer': None,
-                'images': [],
-                'results': [],
-                'error': str(last_exception)
-            }
-            
-        return await loop.run_in_executor(None, perform_search)
-
-    # Process queries with delay between them to reduce rate limiting
-    search_docs = []
+        # Format results
+        results = []
+        for i, result in enumerate(ddg_results):
+            results.append({
+                'title': result.get('title', ''),
+                'url': result.get('href', ''),
+                'content': result.get('body', ''),
+                'score': 1.0 - (i * 0.1),  # Simple scoring mechanism
+                'raw_content': result.get('body', '')
+            })
+        return {
+            'query': query,
+            'follow_up_questions': None,
+            'answer': None,
+            'images': [],
+            'results': results
+        }
+    
+    # Run the queries concurrently, within the shared DuckDuckGo limits
+    search_docs = await asyncio.gather(*(process_single_query(query) for query in search_queries))
+    
+    # Safely extract URLs and titles from results, handling empty result cases
     urls = []
     titles = []
-    for i, query in enumerate(search_queries):
-        # Add delay between queries (except first one)
-        if i > 0:
-            delay = 2.0 + random.random() * 2.0  # Random delay 2-4 seconds
-            await asyncio.sleep(delay)
-        
-        # Process the query
-        result = await process_single_query(query)
-        search_docs.append(result)
-        
-        # Safely extract URLs and titles from results, handling empty result cases
-        if result['results'] and len(result['results']) > 0:
-            for res in result['results']:
-                if 'url' in res and 'title' in res:
-                    urls.append(res['url'])
-                    titles.append(res['title'])
+    for result in search_docs:
+        for res in result['results']:
+            if 'url' in res and 'title' in res:
+                urls.append(res['url'])
+                titles.append(res['title'])
     
     # If we got any valid URLs, scrape the pages
     if urls:
@@ -1386,9 +1446,6 @@ async def tavily_search(
         include_raw_content=True
     )
 
-    # Format the search results directly using the raw_content already provided
-    formatted_output = f"Search results: \n\n"
-    
     # Deduplicate results by URL
     unique_results = {}
     for response in search_results:
@@ -1413,6 +1470,7 @@ async def tavily_search(
             model=configurable.summarization_model,
             model_provider=configurable.summarization_model_provider,
             max_retries=configurable.max_structured_output_retries,
+            cache=get_llm_cache(),
             **extra_kwargs
         )
         summarization_tasks = [
@@ -1438,19 +1496,8 @@ async def tavily_search(
             for doc in stitched_docs
         }
 
-    # Format the unique results
-    for i, (url, result) in enumerate(unique_results.items()):
-        formatted_output += f"\n\n--- SOURCE {i+1}: {result['title']} ---\n"
-        formatted_output += f"URL: {url}\n\n"
-        formatted_output += f"SUMMARY:\n{result['content']}\n\n"
-        if result.get('raw_content'):
-            formatted_output += f"FULL CONTENT:\n{result['raw_content'][:max_char_to_include]}"  # Limit content size
-        formatted_output += "\n\n" + "-" * 80 + "\n"
-    
-    if unique_results:
-        return formatted_output
-    else:
-        return "No valid search results found. Please try different search queries or use a different search API."
+    # Format the unique results, limiting the content size
+    return format_search_results(unique_results, max_content_chars=max_char_to_include)
 
 
 @tool
@@ -1472,9 +1519,6 @@ async def azureaisearch_search(queries: List[str], max_results: int = 5, topic:
         include_raw_content=True
     )
 
-    # Format the search results directly using the raw_content already provided
-    formatted_output = f"Search results: \n\n"
-    
     # Deduplicate results by URL
     unique_results = {}
     for response in search_results:
@@ -1483,19 +1527,8 @@ async def azureaisearch_search(queries: List[str], max_results: int = 5, topic:
             if url not in unique_results:
                 unique_results[url] = result
     
-    # Format the unique results
-    for i, (url, result) in enumerate(unique_results.items()):
-        formatted_output += f"\n\n--- SOURCE {i+1}: {result['title']} ---\n"
-        formatted_output += f"URL: {url}\n\n"
-        formatted_output += f"SUMMARY:\n{result['content']}\n\n"
-        if result.get('raw_content'):
-            formatted_output += f"FULL CONTENT:\n{result['raw_content'][:30000]}"  # Limit content size
-        formatted_output += "\n\n" + "-" * 80 + "\n"
-    
-    if unique_results:
-        return formatted_output
-    else:
-        return "No valid search results found. Please try different search queries or use a different search API."
+    # Format the unique results, limiting the content size
+    return format_search_results(unique_results, max_content_chars=30_000)
 
 
 async def select_and_execute_search(search_api: str, query_list: list[str], params_to_pass: dict) -> str:
@@ -1520,7 +1553,7 @@ async def select_and_execute_search(search_api: str, query_list: list[str], para
         # DuckDuckGo search tool used with both workflow and agent 
         return await duckduckgo_search.ainvoke({'search_queries': query_list})
     elif search_api == "perplexity":
-        search_results = perplexity_search(query_list, **params_to_pass)
+        search_results = await perplexity_search_async(query_list, **params_to_pass)
     elif search_api == "exa":
         search_results = await exa_search(query_list, **params_to_pass)
     elif search_api == "arxiv":
@@ -0,0 +1,189 @@
+import os
+import re
+import hashlib
+import logging
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from langchain_core.messages import ToolMessage, MessageLikeRepresentation
+from open_deep_research.configuration import Configuration, BlobStoreBackend, RawNotesMode
+
+##########################
+# Content-Addressed Blob Store
+##########################
+# Large tool outputs and research notes are written to the store once and graph state
+# only holds a reference to them, so checkpoints stay small and identical page text
+# that shows up in several state keys is stored a single time.
+BLOB_REF_PREFIX = "blob://sha256:"
+# The in-memory store lives as long as the process, so it keeps at most this many bytes (default 256 MiB),
+# evicting the least recently used payloads first
+BLOB_STORE_MEMORY_MAX_BYTES = int(os.environ.get("BLOB_STORE_MEMORY_MAX_BYTES", str(256 * 1024 * 1024)))
+DIGEST_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+def is_digest(value) -> bool:
+    """Whether value is a lowercase hex sha256 digest, the only form that is ever used as a store key or path."""
+    return isinstance(value, str) and DIGEST_PATTERN.fullmatch(value) is not None
+
+
+def is_blob_ref(value) -> bool:
+    return isinstance(value, str) and value.startswith(BLOB_REF_PREFIX) and is_digest(value[len(BLOB_REF_PREFIX):])
+
+
+class BlobNotFoundError(LookupError):
+    """A blob reference whose payload is not in the store, e.g. because the in-memory store evicted it."""
+
+
+class BlobStore(ABC):
+    """Base class for stores that map the sha256 digest of a text payload to the payload."""
+
+    def put(self, text: str) -> str:
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        if not self._contains(digest):
+            self._write(digest, data)
+        return BLOB_REF_PREFIX + digest
+
+    def get(self, ref: str) -> Optional[str]:
+        if not is_blob_ref(ref):
+            return None
+        data = self._read(ref[len(BLOB_REF_PREFIX):])
+        return data.decode("utf-8") if data is not None else None
+
+    def resolve(self, value):
+        """Return the payload for a blob reference, or the value unchanged if it is not one.
+
+        Raises BlobNotFoundError if the payload is missing, rather than passing the reference on in its place.
+        """
+        if not is_blob_ref(value):
+            return value
+        text = self.get(value)
+        if text is None:
+            raise BlobNotFoundError(f"Blob not found in {type(self).__name__}: {value}")
+        return text
+
+    @abstractmethod
+    def _contains(self, digest: str) -> bool:
+        ...
+
+    @abstractmethod
+    def _write(self, digest: str, data: bytes):
+        ...
+
+    @abstractmethod
+    def _read(self, digest: str) -> Optional[bytes]:
+        ...
+
+
+class InMemoryBlobStore(BlobStore):
+    """LRU store bounded by the total size of its payloads."""
+
+    def __init__(self, max_bytes: int = BLOB_STORE_MEMORY_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = threading.Lock()
+        self._blobs: OrderedDict[str, bytes] = OrderedDict()
+
+    def _contains(self, digest: str) -> bool:
+        with self._lock:
+            if digest not in self._blobs:
+                return False
+            self._blobs.move_to_end(digest)
+            return True
+
+    def _write(self, digest: str, data: bytes):
+        with self._lock:
+            if digest in self._blobs:
+                return
+            self._blobs[digest] = data
+            self.size += len(data)
+            # Always keep the payload just written, even if it is larger than the whole budget
+            evicted_count = 0
+            while self.size > self.max_bytes and len(self._blobs) > 1:
+                _, evicted = self._blobs.popitem(last=False)
+                self.size -= len(evicted)
+                evicted_count += 1
+        if evicted_count:
+            logging.warning(
+                f"Evicted {evicted_count} blobs from the in-memory blob store to stay under {self.max_bytes} bytes; "
+                "references to them can no longer be resolved (raise BLOB_STORE_MEMORY_MAX_BYTES or use the filesystem store)"
+            )
+
+    def _read(self, digest: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._blobs.get(digest)
+            if data is not None:
+                self._blobs.move_to_end(digest)
+            return data
+
+
+class FileSystemBlobStore(BlobStore):
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:]
+
+    def _contains(self, digest: str) -> bool:
+        return self._path(digest).exists()
+
+    def _write(self, digest: str, data: bytes):
+        path = self._path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so that concurrent writers never expose a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _read(self, digest: str) -> Optional[bytes]:
+        try:
+            return self._path(digest).read_bytes()
+        except FileNotFoundError:
+            return None
+
+
+_blob_stores: dict[tuple, BlobStore] = {}
+
+def get_blob_store(configurable: Configuration) -> Optional[BlobStore]:
+    backend = BlobStoreBackend(configurable.blob_store)
+    if backend == BlobStoreBackend.NONE:
+        return None
+    key = (backend, os.path.abspath(configurable.blob_store_path) if backend == BlobStoreBackend.FILESYSTEM else None)
+    if key not in _blob_stores:
+        _blob_stores[key] = InMemoryBlobStore() if backend == BlobStoreBackend.MEMORY else FileSystemBlobStore(key[1])
+    return _blob_stores[key]
+
+
+def get_raw_notes_store(configurable: Configuration) -> Optional[BlobStore]:
+    blob_store = get_blob_store(configurable)
+    if blob_store is None and RawNotesMode(configurable.raw_notes_mode) == RawNotesMode.REFERENCE:
+        # Reference mode always spills raw notes, falling back to the filesystem store
+        return get_blob_store(configurable.model_copy(update={"blob_store": BlobStoreBackend.FILESYSTEM}))
+    return blob_store
+
+
+def offload_text(text, blob_store: Optional[BlobStore], min_bytes: int):
+    if blob_store is None or not isinstance(text, str) or len(text.encode("utf-8")) < min_bytes:
+        return text
+    return blob_store.put(text)
+
+
+def hydrate_messages(messages: list[MessageLikeRepresentation], blob_store: Optional[BlobStore]) -> list[MessageLikeRepresentation]:
+    """Return the messages with blob references in tool message contents replaced by their payloads."""
+    if blob_store is None:
+        return list(messages)
+    return [
+        message.model_copy(update={"content": blob_store.resolve(message.content)})
+        if isinstance(message, ToolMessage) and is_blob_ref(message.content) else message
+        for message in messages
+    ]
+
+
+def hydrate_raw_notes(raw_notes: list[str], blob_store: Optional[BlobStore]) -> list[str]:
+    if blob_store is None:
+        return list(raw_notes)
+    return [blob_store.resolve(note) for note in raw_notes]
@@ -1,8 +1,8 @@
 from pydantic import BaseModel, Field
-from typing import Any, List, Optional
+from typing import List, Optional
 from langchain_core.runnables import RunnableConfig
-import os
 from enum import Enum
+from research_common.configuration import cached_configuration
 
 class SearchAPI(Enum):
     ANTHROPIC = "anthropic"
@@ -10,6 +10,16 @@ class SearchAPI(Enum):
     TAVILY = "tavily"
     NONE = "none"
 
+class BlobStoreBackend(Enum):
+    NONE = "none"
+    MEMORY = "memory"
+    FILESYSTEM = "filesystem"
+
+class RawNotesMode(Enum):
+    FULL = "full"
+    REFERENCE = "reference"
+    SKIP = "skip"
+
 class MCPConfig(BaseModel):
     url: Optional[str] = Field(
         default=None,
@@ -64,6 +74,27 @@ class Configuration(BaseModel):
             }
         }
     )
+    speculative_final_report: bool = Field(
+        default=False,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "boolean",
+                "default": False,
+                "description": "Whether to start drafting the final report in parallel with the supervisor's decision once enough research notes exist. The draft is used if the supervisor finishes research and discarded otherwise."
+            }
+        }
+    )
+    speculative_report_min_notes: int = Field(
+        default=3,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "number",
+                "default": 3,
+                "min": 1,
+                "description": "Minimum number of research notes before a speculative final report is drafted"
+            }
+        }
+    )
     # Research Configuration
     search_api: SearchAPI = Field(
         default=SearchAPI.TAVILY,
@@ -107,6 +138,146 @@ class Configuration(BaseModel):
             }
         }
     )
+    dedup_research_topics: bool = Field(
+        default=False,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "boolean",
+                "default": False,
+                "description": "Whether to compare new research topics from the Research Supervisor against topics researched in earlier iterations, reusing or attaching the earlier findings instead of researching them again"
+            }
+        }
+    )
+    topic_dedup_threshold: float = Field(
+        default=0.85,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "slider",
+                "default": 0.85,
+                "min": 0.0,
+                "max": 1.0,
+                "step": 0.05,
+                "description": "Similarity above which a research topic is answered from the findings of an earlier topic"
+            }
+        }
+    )
+    topic_overlap_threshold: float = Field(
+        default=0.4,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "slider",
+                "default": 0.4,
+                "min": 0.0,
+                "max": 1.0,
+                "step": 0.05,
+                "description": "Similarity above which the findings of an earlier topic are attached as context for the researcher"
+            }
+        }
+    )
+    max_run_seconds: Optional[int] = Field(
+        default=None,
+        optional=True,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "number",
+                "description": "Wall-clock budget for a single run in seconds. When the budget is close to exhausted, research is wrapped up and the final report is written from the notes gathered so far."
+            }
+        }
+    )
+    max_run_tokens: Optional[int] = Field(
+        default=None,
+        optional=True,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "number",
+                "description": "Budget of total input and output tokens across all model calls in a single run"
+            }
+        }
+    )
+    max_run_cost: Optional[float] = Field(
+        default=None,
+        optional=True,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "number",
+                "description": "Budget of estimated model cost in USD for a single run"
+            }
+        }
+    )
+    run_budget_wind_down: float = Field(
+        default=0.9,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "slider",
+                "default": 0.9,
+                "min": 0.5,
+                "max": 1.0,
+                "step": 0.05,
+                "description": "Fraction of any run budget after which research is wrapped up"
+            }
+        }
+    )
+    blob_store: BlobStoreBackend = Field(
+        default=BlobStoreBackend.NONE,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "select",
+                "default": "none",
+                "description": "Content-addressed store for large tool outputs and raw research notes. When enabled, graph state and checkpoints only hold references to these payloads.",
+                "options": [
+                    {"label": "None", "value": BlobStoreBackend.NONE.value},
+                    {"label": "In Memory", "value": BlobStoreBackend.MEMORY.value},
+                    {"label": "Filesystem", "value": BlobStoreBackend.FILESYSTEM.value}
+                ]
+            }
+        }
+    )
+    blob_store_path: str = Field(
+        default=".blob_store",
+        metadata={
+            "x_oap_ui_config": {
+                "type": "text",
+                "default": ".blob_store",
+                "description": "Directory for the filesystem blob store"
+            }
+        }
+    )
+    blob_min_bytes: int = Field(
+        default=2048,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "number",
+                "default": 2048,
+                "min": 0,
+                "description": "Minimum payload size in bytes for it to be moved into the blob store"
+            }
+        }
+    )
+    raw_notes_mode: RawNotesMode = Field(
+        default=RawNotesMode.FULL,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "select",
+                "default": "full",
+                "description": "How raw research notes are kept. They are not used to write the final report, so production runs can skip them or spill them to the blob store (the filesystem store if none is configured) and return only references.",
+                "options": [
+                    {"label": "Full", "value": RawNotesMode.FULL.value},
+                    {"label": "Reference", "value": RawNotesMode.REFERENCE.value},
+                    {"label": "Skip", "value": RawNotesMode.SKIP.value}
+                ]
+            }
+        }
+    )
+    prompt_caching: bool = Field(
+        default=False,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "boolean",
+                "default": False,
+                "description": "Whether to mark the system prompt, research brief and earlier transcript as cacheable prefixes (Anthropic cache_control) and keep the researcher's prefix when compressing (OpenAI automatic caching), so repeated calls reuse provider prompt caches"
+            }
+        }
+    )
     # Model Configuration
     summarization_model: str = Field(
         default="openai:gpt-4.1-nano",
@@ -148,6 +319,76 @@ class Configuration(BaseModel):
             }
         }
     )
+    clarify_model: Optional[str] = Field(
+        default=None,
+        optional=True,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "text",
+                "description": "Model for deciding whether to ask the user a clarifying question. Defaults to the Research Model."
+            }
+        }
+    )
+    research_brief_model: Optional[str] = Field(
+        default=None,
+        optional=True,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "text",
+                "description": "Model for writing the research brief. Defaults to the Research Model."
+            }
+        }
+    )
+    supervisor_model: Optional[str] = Field(
+        default=None,
+        optional=True,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "text",
+                "description": "Model for the Research Supervisor. Defaults to the Research Model."
+            }
+        }
+    )
+    researcher_model: Optional[str] = Field(
+        default=None,
+        optional=True,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "text",
+                "description": "Model for the researcher sub-agents. Defaults to the Research Model. NOTE: Make sure this model supports the selected search API."
+            }
+        }
+    )
+    model_routing: bool = Field(
+        default=False,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "boolean",
+                "default": False,
+                "description": "Whether to route short structured output calls (clarification and research brief) to the Routing Model, falling back to the node's model if the output cannot be parsed"
+            }
+        }
+    )
+    routing_model: str = Field(
+        default="openai:gpt-4.1-mini",
+        metadata={
+            "x_oap_ui_config": {
+                "type": "text",
+                "default": "openai:gpt-4.1-mini",
+                "description": "Cheaper, faster model used for routed structured output calls"
+            }
+        }
+    )
+    routing_max_prompt_tokens: int = Field(
+        default=8000,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "number",
+                "default": 8000,
+                "description": "Maximum prompt size in tokens for a call to be routed to the Routing Model"
+            }
+        }
+    )
     compression_model: str = Field(
         default="openai:gpt-4.1-mini",
         metadata={
@@ -168,6 +409,27 @@ class Configuration(BaseModel):
             }
         }
     )
+    chunked_compression: bool = Field(
+        default=False,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "boolean",
+                "default": False,
+                "description": "Whether to split long researcher transcripts into token-bounded chunks that are compressed in parallel and then merged, instead of pruning messages when the transcript overflows the compression model"
+            }
+        }
+    )
+    compression_chunk_tokens: int = Field(
+        default=50000,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "number",
+                "default": 50000,
+                "min": 1000,
+                "description": "Maximum input tokens per chunk when chunked compression is enabled"
+            }
+        }
+    )
     final_report_model: str = Field(
         default="openai:gpt-4.1",
         metadata={
@@ -216,13 +478,12 @@ class Configuration(BaseModel):
         cls, config: Optional[RunnableConfig] = None
     ) -> "Configuration":
         """Create a Configuration instance from a RunnableConfig."""
-        configurable = config.get("configurable", {}) if config else {}
-        field_names = list(cls.model_fields.keys())
-        values: dict[str, Any] = {
-            field_name: os.environ.get(field_name.upper(), configurable.get(field_name))
-            for field_name in field_names
-        }
-        return cls(**{k: v for k, v in values.items() if v is not None})
+        return cached_configuration(
+            cls,
+            config,
+            list(cls.model_fields.keys()),
+            lambda values: cls(**{k: v for k, v in values.items() if v is not None})
+        )
 
     class Config:
         arbitrary_types_allowed = True
\ No newline at end of file
@@ -1,12 +1,19 @@
 from langchain.chat_models import init_chat_model
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, ToolMessage, get_buffer_string, filter_messages
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.runnables.config import set_config_context
+from langchain_core.runnables.utils import coro_with_context
 from langgraph.graph import START, END, StateGraph
 from langgraph.types import Command
 import asyncio
-from typing import Literal
+import hashlib
+import functools
+import contextlib
+import dataclasses
+from typing import Literal, Optional
 from open_deep_research.configuration import (
     Configuration, 
+    RawNotesMode
 )
 from open_deep_research.state import (
     AgentState,
@@ -25,9 +32,20 @@ from open_deep_research.prompts import (
     research_system_prompt,
     compress_research_system_prompt,
     compress_research_simple_human_message,
+    compress_research_chunk_human_message,
+    merge_compressed_research_prompt,
     final_report_generation_prompt,
-    lead_researcher_prompt
+    lead_researcher_prompt,
+    prior_research_context_prompt
 )
+from open_deep_research.blob_store import (
+    get_blob_store,
+    get_raw_notes_store,
+    offload_text,
+    hydrate_messages
+)
+from research_common.llm_cache import install_llm_cache
+from research_common.tokens import count_tokens, count_message_tokens, truncate_to_tokens
 from open_deep_research.utils import (
     get_today_str,
     is_token_limit_exceeded,
@@ -37,27 +55,75 @@ from open_deep_research.utils import (
     anthropic_websearch_called,
     remove_up_to_last_ai_message,
     get_api_key_for_model,
-    get_notes_from_tool_calls
+    get_notes_from_tool_calls,
+    split_messages_into_chunks,
+    group_texts_by_tokens,
+    ResearchTopicIndex,
+    get_model_for_node,
+    route_structured_output_model,
+    require_structured_output,
+    attach_run_budget,
+    get_run_budget,
+    run_budget_exhausted,
+    add_cache_breakpoints
 )
 
 # Initialize a configurable model that we will use throughout the agent
+install_llm_cache()
 configurable_model = init_chat_model(
     configurable_fields=("model", "max_tokens", "api_key"),
 )
 
+def get_structured_output_model(node: str, schema, prompt: str, configurable: Configuration, config: RunnableConfig):
+    node_model = get_model_for_node(configurable, node)
+    model_config = {
+        "model": node_model,
+        "max_tokens": configurable.research_model_max_tokens,
+        "api_key": get_api_key_for_model(node_model, config),
+        "tags": ["langsmith:nostream"]
+    }
+    model = configurable_model.with_structured_output(schema).with_retry(stop_after_attempt=configurable.max_structured_output_retries).with_config(model_config)
+    routed_model = route_structured_output_model(configurable, node_model, schema, prompt)
+    if not routed_model:
+        return model
+    routed_model_config = {
+        "model": routed_model,
+        "max_tokens": configurable.research_model_max_tokens,
+        "api_key": get_api_key_for_model(routed_model, config),
+        "tags": ["langsmith:nostream"]
+    }
+    # Fall back to the node's model if the routed model's output cannot be parsed
+    return (configurable_model.with_structured_output(schema).with_config(routed_model_config) | RunnableLambda(require_structured_output)).with_fallbacks([model])
+
+
+def with_run_budget(node, start_run: bool = False):
+    """Run a top-level node under a RunBudget that resumes from the run's usage so far, and record the new usage.
+
+    Every node that calls a model is wrapped, so that max_run_seconds, max_run_tokens and max_run_cost cover the
+    whole run however the graph is invoked (server, LangGraph API, Studio or streaming). The entry node starts a
+    new budget, so that a later run on the same thread isn't charged for the earlier ones.
+    """
+    @functools.wraps(node)
+    async def budgeted_node(state: AgentState, config: RunnableConfig):
+        config = attach_run_budget(config, None if start_run else state.get("run_usage"))
+        # Model calls made without an explicit config pick it up from the context, so the budget must be there too
+        with set_config_context(config) as context:
+            result = await coro_with_context(node(state, config), context)
+        run_usage = get_run_budget(config).summary()
+        if isinstance(result, Command):
+            return dataclasses.replace(result, update={**(result.update or {}), "run_usage": run_usage})
+        return {**result, "run_usage": run_usage}
+    return budgeted_node
+
+
 async def clarify_with_user(state: AgentState, config: RunnableConfig) -> Command[Literal["write_research_brief", "__end__"]]:
     configurable = Configuration.from_runnable_config(config)
     if not configurable.allow_clarification:
         return Command(goto="write_research_brief")
     messages = state["messages"]
-    model_config = {
-        "model": configurable.research_model,
-        "max_tokens": configurable.research_model_max_tokens,
-        "api_key": get_api_key_for_model(configurable.research_model, config),
-        "tags": ["langsmith:nostream"]
-    }
-    model = configurable_model.with_structured_output(ClarifyWithUser).with_retry(stop_after_attempt=configurable.max_structured_output_retries).with_config(model_config)
-    response = await model.ainvoke([HumanMessage(content=clarify_with_user_instructions.format(messages=get_buffer_string(messages), date=get_today_str()))])
+    prompt = clarify_with_user_instructions.format(messages=get_buffer_string(messages), date=get_today_str())
+    model = get_structured_output_model("clarify", ClarifyWithUser, prompt, configurable, config)
+    response = await model.ainvoke([HumanMessage(content=prompt)])
     if response.need_clarification:
         return Command(goto=END, update={"messages": [AIMessage(content=response.question)]})
     else:
@@ -66,17 +132,12 @@ async def clarify_with_user(state: AgentState, config: RunnableConfig) -> Comman
 
 async def write_research_brief(state: AgentState, config: RunnableConfig)-> Command[Literal["research_supervisor"]]:
     configurable = Configuration.from_runnable_config(config)
-    research_model_config = {
-        "model": configurable.research_model,
-        "max_tokens": configurable.research_model_max_tokens,
-        "api_key": get_api_key_for_model(configurable.research_model, config),
-        "tags": ["langsmith:nostream"]
-    }
-    research_model = configurable_model.with_structured_output(ResearchQuestion).with_retry(stop_after_attempt=configurable.max_structured_output_retries).with_config(research_model_config)
-    response = await research_model.ainvoke([HumanMessage(content=transform_messages_into_research_topic_prompt.format(
+    prompt = transform_messages_into_research_topic_prompt.format(
         messages=get_buffer_string(state.get("messages", [])),
         date=get_today_str()
-    ))])
+    )
+    research_model = get_structured_output_model("research_brief", ResearchQuestion, prompt, configurable, config)
+    response = await research_model.ainvoke([HumanMessage(content=prompt)])
     return Command(
         goto="research_supervisor", 
         update={
@@ -97,30 +158,50 @@ async def write_research_brief(state: AgentState, config: RunnableConfig)-> Comm
 
 async def supervisor(state: SupervisorState, config: RunnableConfig) -> Command[Literal["supervisor_tools"]]:
     configurable = Configuration.from_runnable_config(config)
+    supervisor_model = get_model_for_node(configurable, "supervisor")
     research_model_config = {
-        "model": configurable.research_model,
+        "model": supervisor_model,
         "max_tokens": configurable.research_model_max_tokens,
-        "api_key": get_api_key_for_model(configurable.research_model, config),
+        "api_key": get_api_key_for_model(supervisor_model, config),
         "tags": ["langsmith:nostream"]
     }
     lead_researcher_tools = [ConductResearch, ResearchComplete]
     research_model = configurable_model.bind_tools(lead_researcher_tools).with_retry(stop_after_attempt=configurable.max_structured_output_retries).with_config(research_model_config)
-    supervisor_messages = state.get("supervisor_messages", [])
-    response = await research_model.ainvoke(supervisor_messages)
+    supervisor_messages = hydrate_messages(state.get("supervisor_messages", []), get_blob_store(configurable))
+    research_iterations = state.get("research_iterations", 0) + 1
+    notes = get_notes_from_tool_calls(supervisor_messages, configurable.dedup_research_topics)
+    # Speculatively draft the final report while the supervisor decides whether to stop
+    draft_task = None
+    if configurable.speculative_final_report and len(notes) >= configurable.speculative_report_min_notes:
+        draft_task = asyncio.create_task(draft_final_report(state.get("research_brief", ""), notes, config))
+    try:
+        if run_budget_exhausted(config):
+            # Out of budget: finish research with the notes gathered so far
+            response = AIMessage(content="", tool_calls=[{"name": "ResearchComplete", "args": {}, "id": "run_budget_exhausted"}])
+        else:
+            response = await research_model.ainvoke(add_cache_breakpoints(supervisor_messages, supervisor_model, configurable))
+    except BaseException:
+        if draft_task:
+            await cancel_draft(draft_task)
+        raise
+    update = {
+        "supervisor_messages": [response],
+        "research_iterations": research_iterations
+    }
+    if draft_task:
+        if supervisor_should_stop(response, research_iterations, configurable):
+            draft = await draft_task
+            if draft is not None:
+                update["speculative_final_report"] = {"findings_hash": hash_findings(notes), "report": draft}
+        else:
+            await cancel_draft(draft_task)
     return Command(
         goto="supervisor_tools",
-        update={
-            "supervisor_messages": [response],
-            "research_iterations": state.get("research_iterations", 0) + 1
-        }
+        update=update
     )
 
 
-async def supervisor_tools(state: SupervisorState, config: RunnableConfig) -> Command[Literal["supervisor", "__end__"]]:
-    configurable = Configuration.from_runnable_config(config)
-    supervisor_messages = state.get("supervisor_messages", [])
-    research_iterations = state.get("research_iterations", 0)
-    most_recent_message = supervisor_messages[-1]
+def supervisor_should_stop(most_recent_message: AIMessage, research_iterations: int, configurable: Configuration) -> bool:
     # Exit Criteria
     # 1. We have exceeded our max guardrail research iterations
     # 2. No tool calls were made by the supervisor
@@ -128,11 +209,20 @@ async def supervisor_tools(state: SupervisorState, config: RunnableConfig) -> Co
     exceeded_allowed_iterations = research_iterations >= configurable.max_researcher_iterations
     no_tool_calls = not most_recent_message.tool_calls
     research_complete_tool_call = any(tool_call["name"] == "ResearchComplete" for tool_call in most_recent_message.tool_calls)
-    if exceeded_allowed_iterations or no_tool_calls or research_complete_tool_call:
+    return exceeded_allowed_iterations or no_tool_calls or research_complete_tool_call
+
+
+async def supervisor_tools(state: SupervisorState, config: RunnableConfig) -> Command[Literal["supervisor", "__end__"]]:
+    configurable = Configuration.from_runnable_config(config)
+    blob_store = get_blob_store(configurable)
+    supervisor_messages = hydrate_messages(state.get("supervisor_messages", []), blob_store)
+    research_iterations = state.get("research_iterations", 0)
+    most_recent_message = supervisor_messages[-1]
+    if supervisor_should_stop(most_recent_message, research_iterations, configurable) or run_budget_exhausted(config):
         return Command(
             goto=END,
             update={
-                "notes": get_notes_from_tool_calls(supervisor_messages),
+                "notes": get_notes_from_tool_calls(supervisor_messages, configurable.dedup_research_topics),
                 "research_brief": state.get("research_brief", "")
             }
         )
@@ -142,19 +232,33 @@ async def supervisor_tools(state: SupervisorState, config: RunnableConfig) -> Co
         conduct_research_calls = all_conduct_research_calls[:configurable.max_concurrent_research_units]
         overflow_conduct_research_calls = all_conduct_research_calls[configurable.max_concurrent_research_units:]
         researcher_system_prompt = research_system_prompt.format(mcp_prompt=configurable.mcp_prompt or "", date=get_today_str())
-        coros = [
-            researcher_subgraph.ainvoke({
+        topic_index = ResearchTopicIndex.from_supervisor_messages(supervisor_messages) if configurable.dedup_research_topics else None
+
+        async def conduct_research(research_topic: str):
+            researcher_input = research_topic
+            if topic_index:
+                similarity, prior = topic_index.most_similar(research_topic)
+                if prior and similarity >= configurable.topic_dedup_threshold:
+                    # Near-duplicate topic: answer from the research that was already done
+                    return {"compressed_research": prior[1], "raw_notes": []}
+                if prior and similarity >= configurable.topic_overlap_threshold:
+                    researcher_input = prior_research_context_prompt.format(
+                        research_topic=research_topic,
+                        prior_topic=prior[0],
+                        prior_research=prior[1]
+                    )
+            return await researcher_subgraph.ainvoke({
                 "researcher_messages": [
                     SystemMessage(content=researcher_system_prompt),
-                    HumanMessage(content=tool_call["args"]["research_topic"])
+                    HumanMessage(content=researcher_input)
                 ],
-                "research_topic": tool_call["args"]["research_topic"]
-            }, config) 
-            for tool_call in conduct_research_calls
-        ]
+                "research_topic": research_topic
+            }, config)
+
+        coros = [conduct_research(tool_call["args"]["research_topic"]) for tool_call in conduct_research_calls]
         tool_results = await asyncio.gather(*coros)
         tool_messages = [ToolMessage(
-                            content=observation.get("compressed_research", "Error synthesizing research report: Maximum retries exceeded"),
+                            content=offload_text(observation.get("compressed_research", "Error synthesizing research report: Maximum retries exceeded"), blob_store, configurable.blob_min_bytes),
                             name=tool_call["name"],
                             tool_call_id=tool_call["id"]
                         ) for observation, tool_call in zip(tool_results, conduct_research_calls)]
@@ -165,12 +269,15 @@ async def supervisor_tools(state: SupervisorState, config: RunnableConfig) -> Co
                 name="ConductResearch",
                 tool_call_id=overflow_conduct_research_call["id"]
             ))
-        raw_notes_concat = "\n".join(["\n".join(observation.get("raw_notes", [])) for observation in tool_results])
+        raw_notes = [note for observation in tool_results for note in observation.get("raw_notes", [])]
+        if raw_notes and get_raw_notes_store(configurable) is None:
+            raw_notes = ["\n".join(raw_notes)]
+        # Otherwise raw notes are blob references (or skipped), so keep them as is instead of concatenating the payloads
         return Command(
             goto="supervisor",
             update={
                 "supervisor_messages": tool_messages,
-                "raw_notes": [raw_notes_concat]
+                "raw_notes": raw_notes
             }
         )
     except Exception as e:
@@ -181,7 +288,7 @@ async def supervisor_tools(state: SupervisorState, config: RunnableConfig) -> Co
         return Command(
             goto=END,
             update={
-                "notes": get_notes_from_tool_calls(supervisor_messages),
+                "notes": get_notes_from_tool_calls(supervisor_messages, configurable.dedup_research_topics),
                 "research_brief": state.get("research_brief", "")
             }
         )
@@ -194,21 +301,29 @@ supervisor_builder.add_edge(START, "supervisor")
 supervisor_subgraph = supervisor_builder.compile()
 
 
-async def researcher(state: ResearcherState, config: RunnableConfig) -> Command[Literal["researcher_tools"]]:
+async def research_supervisor(state: AgentState, config: RunnableConfig):
+    """Run the supervisor subgraph, passing the run's budget on to every supervisor and researcher node."""
+    return await supervisor_subgraph.ainvoke(state, config)
+
+
+async def researcher(state: ResearcherState, config: RunnableConfig) -> Command[Literal["researcher_tools", "compress_research"]]:
     configurable = Configuration.from_runnable_config(config)
-    researcher_messages = state.get("researcher_messages", [])
+    researcher_messages = hydrate_messages(state.get("researcher_messages", []), get_blob_store(configurable))
+    if run_budget_exhausted(config):
+        return Command(goto="compress_research")
     tools = await get_all_tools(config)
     if len(tools) == 0:
         raise ValueError("No tools found to conduct research: Please configure either your search API or add MCP tools to your configuration.")
+    researcher_model = get_model_for_node(configurable, "researcher")
     research_model_config = {
-        "model": configurable.research_model,
+        "model": researcher_model,
         "max_tokens": configurable.research_model_max_tokens,
-        "api_key": get_api_key_for_model(configurable.research_model, config),
+        "api_key": get_api_key_for_model(researcher_model, config),
         "tags": ["langsmith:nostream"]
     }
     research_model = configurable_model.bind_tools(tools).with_retry(stop_after_attempt=configurable.max_structured_output_retries).with_config(research_model_config)
     # NOTE: Need to add fault tolerance here.
-    response = await research_model.ainvoke(researcher_messages)
+    response = await research_model.ainvoke(add_cache_breakpoints(researcher_messages, researcher_model, configurable))
     return Command(
         goto="researcher_tools",
         update={
@@ -240,15 +355,16 @@ async def researcher_tools(state: ResearcherState, config: RunnableConfig) -> Co
     tool_calls = most_recent_message.tool_calls
     coros = [execute_tool_safely(tools_by_name[tool_call["name"]], tool_call["args"], config) for tool_call in tool_calls]
     observations = await asyncio.gather(*coros)
+    blob_store = get_blob_store(configurable)
     tool_outputs = [ToolMessage(
-                        content=observation,
+                        content=offload_text(observation, blob_store, configurable.blob_min_bytes),
                         name=tool_call["name"],
                         tool_call_id=tool_call["id"]
                     ) for observation, tool_call in zip(observations, tool_calls)]
     
     # Late Exit Criteria: We have exceeded our max guardrail tool call iterations or the most recent message contains a ResearchComplete tool call
     # These are late exit criteria because we need to add ToolMessages
-    if state.get("tool_call_iterations", 0) >= configurable.max_react_tool_calls or any(tool_call["name"] == "ResearchComplete" for tool_call in most_recent_message.tool_calls):
+    if state.get("tool_call_iterations", 0) >= configurable.max_react_tool_calls or any(tool_call["name"] == "ResearchComplete" for tool_call in most_recent_message.tool_calls) or run_budget_exhausted(config):
         return Command(
             goto="compress_research",
             update={
@@ -263,6 +379,9 @@ async def researcher_tools(state: ResearcherState, config: RunnableConfig) -> Co
     )
 
 
+# How far the estimated transcript may exceed the compression model's context before it is pruned up front
+PROACTIVE_PRUNE_MARGIN = 1.2
+
 async def compress_research(state: ResearcherState, config: RunnableConfig):
     configurable = Configuration.from_runnable_config(config)
     synthesis_attempts = 0
@@ -272,30 +391,114 @@ async def compress_research(state: ResearcherState, config: RunnableConfig):
         "api_key": get_api_key_for_model(configurable.compression_model, config),
         "tags": ["langsmith:nostream"]
     })
-    researcher_messages = state.get("researcher_messages", [])
-    # Update the system prompt to now focus on compression rather than research.
-    researcher_messages[0] = SystemMessage(content=compress_research_system_prompt.format(date=get_today_str()))
-    researcher_messages.append(HumanMessage(content=compress_research_simple_human_message))
+    blob_store = get_blob_store(configurable)
+    researcher_messages = hydrate_messages(state.get("researcher_messages", []), blob_store)
+    if configurable.chunked_compression:
+        compressed_research = await compress_research_in_chunks(state.get("research_topic", ""), researcher_messages, synthesizer_model, configurable)
+        return {
+            "compressed_research": compressed_research,
+            "raw_notes": get_raw_notes(researcher_messages, configurable)
+        }
+    compression_prompt = compress_research_system_prompt.format(date=get_today_str())
+    if configurable.prompt_caching:
+        # Keep the researcher's system prompt and transcript as the prefix, so that a compression model that is
+        # also the research model reads it from the cache, and give the compression instructions last instead
+        compression_instruction = HumanMessage(content=f"{compression_prompt}\n\n{compress_research_simple_human_message}")
+    else:
+        # Update the system prompt to now focus on compression rather than research.
+        researcher_messages[0] = SystemMessage(content=compression_prompt)
+        compression_instruction = HumanMessage(content=compress_research_simple_human_message)
+    # Prune up front only when the local estimate is well over the limit, since approximated tokenizers can
+    # overcount; transcripts closer to the limit are sent as is and pruned if the model rejects them.
+    compression_token_limit = get_model_token_limit(configurable.compression_model)
+    while compression_token_limit and count_message_tokens([*researcher_messages, compression_instruction], configurable.compression_model) > (compression_token_limit - configurable.compression_model_max_tokens) * PROACTIVE_PRUNE_MARGIN:
+        pruned_messages = remove_up_to_last_ai_message(researcher_messages)
+        if len(pruned_messages) == len(researcher_messages):
+            break
+        researcher_messages = pruned_messages
+    researcher_messages.append(compression_instruction)
     while synthesis_attempts < 3:
         try:
-            response = await synthesizer_model.ainvoke(researcher_messages)
+            response = await synthesizer_model.ainvoke(add_cache_breakpoints(researcher_messages, configurable.compression_model, configurable))
             return {
                 "compressed_research": str(response.content),
-                "raw_notes": ["\n".join([str(m.content) for m in filter_messages(researcher_messages, include_types=["tool", "ai"])])]
+                "raw_notes": get_raw_notes(researcher_messages, configurable)
             }
         except Exception as e:
             synthesis_attempts += 1
-            if is_token_limit_exceeded(e, configurable.research_model):
+            if is_token_limit_exceeded(e, configurable.compression_model):
                 researcher_messages = remove_up_to_last_ai_message(researcher_messages)
                 print(f"Token limit exceeded while synthesizing: {e}. Pruning the messages to try again.")
                 continue         
             print(f"Error synthesizing research report: {e}")
     return {
         "compressed_research": "Error synthesizing research report: Maximum retries exceeded",
-        "raw_notes": ["\n".join([str(m.content) for m in filter_messages(researcher_messages, include_types=["tool", "ai"])])]
+        "raw_notes": get_raw_notes(researcher_messages, configurable)
     }
 
 
+def get_raw_notes(researcher_messages, configurable: Configuration) -> list[str]:
+    raw_notes_mode = RawNotesMode(configurable.raw_notes_mode)
+    if raw_notes_mode == RawNotesMode.SKIP:
+        return []
+    contents = [str(m.content) for m in filter_messages(researcher_messages, include_types=["tool", "ai"])]
+    raw_notes_store = get_raw_notes_store(configurable)
+    if raw_notes_store is None:
+        return ["\n".join(contents)]
+    min_bytes = 0 if raw_notes_mode == RawNotesMode.REFERENCE else configurable.blob_min_bytes
+    return [offload_text(content, raw_notes_store, min_bytes) for content in contents if content]
+
+
+async def compress_research_in_chunks(research_topic: str, researcher_messages, synthesizer_model, configurable: Configuration) -> str:
+    """Compress token-bounded chunks of the transcript concurrently, then merge the compressed pieces."""
+    synthesizer_model = synthesizer_model.with_retry(stop_after_attempt=configurable.max_structured_output_retries)
+    chunks = split_messages_into_chunks(researcher_messages, configurable.compression_chunk_tokens, configurable.compression_model)
+    if not chunks:
+        return "No research findings were gathered."
+    system_message = SystemMessage(content=compress_research_system_prompt.format(date=get_today_str()))
+
+    async def compress_chunk(chunk_index: int, chunk: str) -> str:
+        try:
+            response = await synthesizer_model.ainvoke([
+                system_message,
+                HumanMessage(content=compress_research_chunk_human_message.format(
+                    research_topic=research_topic,
+                    chunk_index=chunk_index + 1,
+                    chunk_count=len(chunks),
+                    transcript=chunk
+                ))
+            ])
+            return str(response.content)
+        except Exception as e:
+            # Keep the raw chunk so that no findings are lost
+            print(f"Error compressing research chunk {chunk_index + 1}: {e}")
+            return chunk
+
+    async def merge_pieces(pieces: list[str]) -> str:
+        if len(pieces) == 1:
+            return pieces[0]
+        findings = "\n\n".join(f"<Part {i}>\n{piece}\n</Part {i}>" for i, piece in enumerate(pieces, 1))
+        try:
+            response = await synthesizer_model.ainvoke([HumanMessage(content=merge_compressed_research_prompt.format(
+                research_topic=research_topic,
+                findings=findings,
+                date=get_today_str()
+            ))])
+            return str(response.content)
+        except Exception as e:
+            print(f"Error merging compressed research: {e}")
+            return "\n\n".join(pieces)
+
+    pieces = await asyncio.gather(*[compress_chunk(i, chunk) for i, chunk in enumerate(chunks)])
+    # Merge in rounds so that every merge call stays within the chunk budget.
+    while len(pieces) > 1:
+        groups = group_texts_by_tokens(pieces, configurable.compression_chunk_tokens, configurable.compression_model)
+        if len(groups) == len(pieces):
+            groups = [pieces[i:i + 2] for i in range(0, len(pieces), 2)]
+        pieces = await asyncio.gather(*[merge_pieces(group) for group in groups])
+    return pieces[0]
+
+
 researcher_builder = StateGraph(ResearcherState, output=ResearcherOutputState, config_schema=Configuration)
 researcher_builder.add_node("researcher", researcher)
 researcher_builder.add_node("researcher_tools", researcher_tools)
@@ -305,9 +508,51 @@ researcher_builder.add_edge("compress_research", END)
 researcher_subgraph = researcher_builder.compile()
 
 
+def hash_findings(notes: list[str]) -> str:
+    return hashlib.sha256("\n".join(notes).encode()).hexdigest()
+
+
+async def draft_final_report(research_brief: str, notes: list[str], config: RunnableConfig) -> Optional[str]:
+    configurable = Configuration.from_runnable_config(config)
+    writer_model_config = {
+        "model": configurable.final_report_model,
+        "max_tokens": configurable.final_report_model_max_tokens,
+        "api_key": get_api_key_for_model(configurable.research_model, config),
+        "tags": ["langsmith:nostream"]
+    }
+    final_report_prompt = final_report_generation_prompt.format(
+        research_brief=research_brief,
+        findings="\n".join(notes),
+        date=get_today_str()
+    )
+    try:
+        final_report = await configurable_model.with_config(writer_model_config).ainvoke([HumanMessage(content=final_report_prompt)])
+        return final_report.content
+    except Exception as e:
+        print(f"Speculative final report failed, writing it after research completes instead: {e}")
+        return None
+
+
+async def cancel_draft(draft_task: asyncio.Task):
+    """Cancel a speculative draft and wait for it to finish, so its model call is not left running unobserved."""
+    draft_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await draft_task
+
+
+# Findings are never truncated below this many tokens, even when the prompt and report leave less room
+MIN_FINDINGS_TOKENS = 1000
+
 async def final_report_generation(state: AgentState, config: RunnableConfig):
     notes = state.get("notes", [])
-    cleared_state = {"notes": {"type": "override", "value": []},}
+    cleared_state = {"notes": {"type": "override", "value": []}, "speculative_final_report": None}
+    speculative_final_report = state.get("speculative_final_report")
+    if speculative_final_report and speculative_final_report.get("findings_hash") == hash_findings(notes):
+        return {
+            "final_report": speculative_final_report["report"],
+            "messages": [AIMessage(content=speculative_final_report["report"])],
+            **cleared_state
+        }
     configurable = Configuration.from_runnable_config(config)
     writer_model_config = {
         "model": configurable.final_report_model,
@@ -337,14 +582,16 @@ async def final_report_generation(state: AgentState, config: RunnableConfig):
                     model_token_limit = get_model_token_limit(configurable.final_report_model)
                     if not model_token_limit:
                         return {
-                            "final_report": f"Error generating final report: Token limit exceeded, however, we could not determine the model's maximum context length. Please update the model map in deep_researcher/utils.py with this information. {e}",
+                            "final_report": f"Error generating final report: Token limit exceeded, however, we could not determine the model's maximum context length. Please add this model to research_common/model_registry.json or a MODEL_REGISTRY_PATH override file. {e}",
                             **cleared_state
                         }
-                    findings_token_limit = model_token_limit * 4
+                    # Leave room for the rest of the prompt and the report itself
+                    prompt_tokens = count_tokens(final_report_prompt, configurable.final_report_model) - count_tokens(findings, configurable.final_report_model)
+                    findings_token_limit = max(model_token_limit - prompt_tokens - configurable.final_report_model_max_tokens, MIN_FINDINGS_TOKENS)
                 else:
                     findings_token_limit = int(findings_token_limit * 0.9)
-                print("Reducing the chars to", findings_token_limit)
-                findings = findings[:findings_token_limit]
+                print("Reducing the findings to", findings_token_limit, "tokens")
+                findings = truncate_to_tokens(findings, findings_token_limit, configurable.final_report_model)
                 current_retry += 1
             else:
                 # If not a token limit exceeded error, then we just throw an error.
@@ -359,10 +606,10 @@ async def final_report_generation(state: AgentState, config: RunnableConfig):
     }
 
 deep_researcher_builder = StateGraph(AgentState, input=AgentInputState, config_schema=Configuration)
-deep_researcher_builder.add_node("clarify_with_user", clarify_with_user)
-deep_researcher_builder.add_node("write_research_brief", write_research_brief)
-deep_researcher_builder.add_node("research_supervisor", supervisor_subgraph)
-deep_researcher_builder.add_node("final_report_generation", final_report_generation)
+deep_researcher_builder.add_node("clarify_with_user", with_run_budget(clarify_with_user, start_run=True))
+deep_researcher_builder.add_node("write_research_brief", with_run_budget(write_research_brief))
+deep_researcher_builder.add_node("research_supervisor", with_run_budget(research_supervisor))
+deep_researcher_builder.add_node("final_report_generation", with_run_budget(final_report_generation))
 deep_researcher_builder.add_edge(START, "clarify_with_user")
 deep_researcher_builder.add_edge("research_supervisor", "final_report_generation")
 deep_researcher_builder.add_edge("final_report_generation", END)
@@ -175,6 +175,16 @@ You can use any of the tools provided to you to find resources that can help ans
 """
 
 
+prior_research_context_prompt = """{research_topic}
+
+<Prior Research>
+The following findings were already gathered in an earlier research step on a related topic: "{prior_topic}"
+Do not repeat searches that these findings already answer. Focus on the parts of your topic that they do not cover.
+
+{prior_research}
+</Prior Research>"""
+
+
 compress_research_system_prompt = """You are a research assistant that has conducted research on a topic by calling several tools and web searches. Your job is now to clean up the findings, but preserve all of the relevant statements and information that the researcher has gathered. For context, today's date is {date}.
 
 <Task>
@@ -217,6 +227,52 @@ compress_research_simple_human_message = """All above messages are about researc
 
 DO NOT summarize the information. I want the raw information returned, just in a cleaner format. Make sure all relevant information is preserved - you can rewrite findings verbatim."""
 
+compress_research_chunk_human_message = """The research topic was:
+<Research Topic>
+{research_topic}
+</Research Topic>
+
+Below is part {chunk_index} of {chunk_count} of the tool calls and tool outputs the researcher gathered. Other parts are being cleaned up separately and will be merged afterwards.
+
+<Research Transcript>
+{transcript}
+</Research Transcript>
+
+Please clean up the findings in this part only.
+
+DO NOT summarize the information. I want the raw information returned, just in a cleaner format. Make sure all relevant information and every source URL is preserved - you can rewrite findings verbatim."""
+
+merge_compressed_research_prompt = """You are a research assistant merging several cleaned-up findings that were produced from different parts of the same research transcript. For context, today's date is {date}.
+
+The research topic was:
+<Research Topic>
+{research_topic}
+</Research Topic>
+
+<Partial Findings>
+{findings}
+</Partial Findings>
+
+<Task>
+Merge the partial findings above into a single set of cleaned findings.
+Remove only exact duplication between the parts. All relevant information must be kept verbatim - don't rewrite it, don't summarize it, don't paraphrase it.
+</Task>
+
+<Output Format>
+The report should be structured like this:
+**List of Queries and Tool Calls Made**
+**Fully Comprehensive Findings**
+**List of All Relevant Sources (with citations in the report)**
+</Output Format>
+
+<Citation Rules>
+- Each part numbers its own sources, so renumber them: assign each unique URL a single citation number across the merged report
+- End with ### Sources that lists each source with corresponding numbers
+- IMPORTANT: Number sources sequentially without gaps (1,2,3,4...) in the final list
+- Make sure to include ALL of the sources from every part
+</Citation Rules>
+"""
+
 final_report_generation_prompt = """Based on all the research conducted, create a comprehensive, well-structured answer to the overall research brief:
 <Research Brief>
 {research_brief}
@@ -1,10 +1,17 @@
 from typing import Annotated, Optional
 from pydantic import BaseModel, Field
+import os
 import operator
-from langgraph.graph import MessagesState
-from langchain_core.messages import MessageLikeRepresentation
+from functools import cache
+from langgraph.graph import MessagesState, add_messages
+from langchain_core.messages import AnyMessage, MessageLikeRepresentation
 from typing_extensions import TypedDict
 
+try:
+    from langgraph.channels.delta import DeltaChannel
+except ImportError:
+    DeltaChannel = None
+
 ###################
 # Structured Outputs
 ###################
@@ -47,26 +54,49 @@ def override_reducer(current_value, new_value):
         return new_value.get("value", new_value)
     else:
         return operator.add(current_value, new_value)
+
+# Delta checkpoints: append-only channels persist only the writes of each step and are rebuilt
+# from the most recent full snapshot on read, instead of storing the whole list at every step.
+DELTA_CHECKPOINTS = os.environ.get("DELTA_CHECKPOINTS", "false").lower() == "true"
+DELTA_CHECKPOINT_SNAPSHOT_FREQUENCY = int(os.environ.get("DELTA_CHECKPOINT_SNAPSHOT_FREQUENCY", "50"))
+if DELTA_CHECKPOINTS and DeltaChannel is None:
+    print("DELTA_CHECKPOINTS is set but this version of langgraph does not support delta channels. Falling back to full checkpoints.")
+
+@cache
+def append_only(reducer):
+    if not DELTA_CHECKPOINTS or DeltaChannel is None:
+        return reducer
+    def fold(current_value, new_values):
+        for new_value in new_values:
+            current_value = reducer(current_value, new_value)
+        return current_value
+    fold.__name__ = f"fold_{reducer.__name__}"
+    return DeltaChannel(fold, snapshot_frequency=DELTA_CHECKPOINT_SNAPSHOT_FREQUENCY)
     
 class AgentInputState(MessagesState):
     """InputState is only 'messages'"""
+    messages: Annotated[list[AnyMessage], append_only(add_messages)]
 
 class AgentState(MessagesState):
-    supervisor_messages: Annotated[list[MessageLikeRepresentation], override_reducer]
+    messages: Annotated[list[AnyMessage], append_only(add_messages)]
+    supervisor_messages: Annotated[list[MessageLikeRepresentation], append_only(override_reducer)]
     research_brief: Optional[str]
-    raw_notes: Annotated[list[str], override_reducer] = []
+    raw_notes: Annotated[list[str], append_only(override_reducer)] = []
     notes: Annotated[list[str], override_reducer] = []
     final_report: str
+    speculative_final_report: Optional[dict]
+    run_usage: Optional[dict]
 
 class SupervisorState(TypedDict):
-    supervisor_messages: Annotated[list[MessageLikeRepresentation], override_reducer]
+    supervisor_messages: Annotated[list[MessageLikeRepresentation], append_only(override_reducer)]
     research_brief: str
     notes: Annotated[list[str], override_reducer] = []
     research_iterations: int = 0
-    raw_notes: Annotated[list[str], override_reducer] = []
+    raw_notes: Annotated[list[str], append_only(override_reducer)] = []
+    speculative_final_report: Optional[dict]
 
 class ResearcherState(TypedDict):
-    researcher_messages: Annotated[list[MessageLikeRepresentation], operator.add]
+    researcher_messages: Annotated[list[MessageLikeRepresentation], append_only(operator.add)]
     tool_call_iterations: int = 0
     research_topic: str
     compressed_research: str
@@ -1,14 +1,23 @@
 import os
+import re
+import json
+import math
+import time
+import uuid
 import aiohttp
 import asyncio
 import logging
 import warnings
+from collections import Counter
 from datetime import datetime, timedelta, timezone
 from typing import Annotated, List, Literal, Dict, Optional, Any
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
 from langchain_core.tools import BaseTool, StructuredTool, tool, ToolException, InjectedToolArg
-from langchain_core.messages import HumanMessage, AIMessage, MessageLikeRepresentation, filter_messages
+from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, ToolMessage, MessageLikeRepresentation, filter_messages
 from langchain_core.runnables import RunnableConfig
 from langchain_core.language_models import BaseChatModel
+from pydantic import BaseModel
 from langchain.chat_models import init_chat_model
 from tavily import AsyncTavilyClient
 from langgraph.config import get_store
@@ -17,6 +26,10 @@ from langchain_mcp_adapters.client import MultiServerMCPClient
 from open_deep_research.state import Summary, ResearchComplete
 from open_deep_research.configuration import SearchAPI, Configuration
 from open_deep_research.prompts import summarize_webpage_prompt
+from research_common.model_registry import get_model_registry, get_model_capabilities
+from research_common.llm_cache import get_llm_cache
+from research_common.formatting import format_search_results
+from research_common.tokens import count_tokens, split_text_by_tokens
 
 
 ##########################
@@ -51,8 +64,7 @@ async def tavily_search(
         include_raw_content=True,
         config=config
     )
-    # Format the search results and deduplicate results by URL
-    formatted_output = f"Search results: \n\n"
+    # Deduplicate results by URL
     unique_results = {}
     for response in search_results:
         for result in response['results']:
@@ -66,7 +78,8 @@ async def tavily_search(
         model=configurable.summarization_model,
         max_tokens=configurable.summarization_model_max_tokens,
         api_key=model_api_key,
-        tags=["langsmith:nostream"]
+        tags=["langsmith:nostream"],
+        cache=get_llm_cache()
     ).with_structured_output(Summary).with_retry(stop_after_attempt=configurable.max_structured_output_retries)
     async def noop():
         return None
@@ -82,15 +95,7 @@ async def tavily_search(
         url: {'title': result['title'], 'content': result['content'] if summary is None else summary}
         for url, result, summary in zip(unique_results.keys(), unique_results.values(), summaries)
     }
-    for i, (url, result) in enumerate(summarized_results.items()):
-        formatted_output += f"\n\n--- SOURCE {i+1}: {result['title']} ---\n"
-        formatted_output += f"URL: {url}\n\n"
-        formatted_output += f"SUMMARY:\n{result['content']}\n\n"
-        formatted_output += "\n\n" + "-" * 80 + "\n"
-    if summarized_results:
-        return formatted_output
-    else:
-        return "No valid search results found. Please try different search queries or use a different search API."
+    return format_search_results(summarized_results)
 
 
 async def tavily_search_async(search_queries, max_results: int = 5, topic: Literal["general", "news", "finance"] = "general", include_raw_content: bool = True, config: RunnableConfig = None):
@@ -296,8 +301,71 @@ async def get_all_tools(config: RunnableConfig):
     tools.extend(mcp_tools)
     return tools
 
-def get_notes_from_tool_calls(messages: list[MessageLikeRepresentation]):
-    return [tool_msg.content for tool_msg in filter_messages(messages, include_types="tool")]
+def get_notes_from_tool_calls(messages: list[MessageLikeRepresentation], deduplicate: bool = False):
+    notes = [tool_msg.content for tool_msg in filter_messages(messages, include_types="tool")]
+    # Topics answered from earlier research repeat the same note, so keep only the first copy
+    return list(dict.fromkeys(notes)) if deduplicate else notes
+
+
+##########################
+# Research Topic Dedup Utils
+##########################
+TOPIC_STOPWORDS = frozenset({
+    "a", "about", "all", "an", "and", "any", "are", "as", "at", "be", "by", "for", "from", "how", "in",
+    "into", "is", "it", "its", "of", "on", "or", "research", "should", "that", "the", "their", "this",
+    "to", "what", "which", "with",
+})
+
+def tokenize_topic(text: str) -> list[str]:
+    return [token for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in TOPIC_STOPWORDS]
+
+class ResearchTopicIndex:
+    """Lexical TF-IDF index of topics researched earlier in the run and their compressed research."""
+
+    def __init__(self):
+        self.entries: list[tuple[str, str, Counter]] = []
+        self.document_frequencies: Counter = Counter()
+
+    @classmethod
+    def from_supervisor_messages(cls, messages: list[MessageLikeRepresentation]) -> "ResearchTopicIndex":
+        index = cls()
+        results_by_call_id = {msg.tool_call_id: msg.content for msg in filter_messages(messages, include_types="tool")}
+        for message in filter_messages(messages, include_types="ai"):
+            for tool_call in message.tool_calls:
+                research = results_by_call_id.get(tool_call["id"])
+                if tool_call["name"] == "ConductResearch" and research and not research.startswith("Error"):
+                    index.add(tool_call["args"]["research_topic"], research)
+        return index
+
+    def add(self, topic: str, research: str):
+        terms = Counter(tokenize_topic(topic))
+        self.entries.append((topic, research, terms))
+        self.document_frequencies.update(terms.keys())
+
+    def _weights(self, terms: Counter) -> dict[str, float]:
+        document_count = len(self.entries) + 1
+        return {
+            term: count * (math.log(document_count / (self.document_frequencies[term] + 1)) + 1)
+            for term, count in terms.items()
+        }
+
+    def most_similar(self, topic: str) -> tuple[float, Optional[tuple[str, str]]]:
+        """Return the cosine similarity and (topic, research) of the closest indexed topic."""
+        query_weights = self._weights(Counter(tokenize_topic(topic)))
+        query_norm = math.sqrt(sum(weight * weight for weight in query_weights.values()))
+        best_similarity, best_entry = 0.0, None
+        if not query_norm:
+            return best_similarity, best_entry
+        for entry_topic, research, terms in self.entries:
+            entry_weights = self._weights(terms)
+            entry_norm = math.sqrt(sum(weight * weight for weight in entry_weights.values()))
+            if not entry_norm:
+                continue
+            dot = sum(weight * entry_weights.get(term, 0.0) for term, weight in query_weights.items())
+            similarity = dot / (query_norm * entry_norm)
+            if similarity > best_similarity:
+                best_similarity, best_entry = similarity, (entry_topic, research)
+        return best_similarity, best_entry
 
 
 ##########################
@@ -395,47 +463,23 @@ def _check_gemini_token_limit(exception: Exception, error_str: str) -> bool:
     
     return False
 
-# NOTE: This may be out of date or not applicable to your models. Please update this as needed.
+# NOTE: Model capabilities live in model_registry.json and can be overridden with MODEL_REGISTRY_PATH.
 MODEL_TOKEN_LIMITS = {
-    "openai:gpt-4.1-mini": 1047576,
-    "openai:gpt-4.1-nano": 1047576,
-    "openai:gpt-4.1": 1047576,
-    "openai:gpt-4o-mini": 128000,
-    "openai:gpt-4o": 128000,
-    "openai:o4-mini": 200000,
-    "openai:o3-mini": 200000,
-    "openai:o3": 200000,
-    "openai:o3-pro": 200000,
-    "openai:o1": 200000,
-    "openai:o1-pro": 200000,
-    "anthropic:claude-opus-4": 200000,
-    "anthropic:claude-sonnet-4": 200000,
-    "anthropic:claude-3-7-sonnet": 200000,
-    "anthropic:claude-3-5-sonnet": 200000,
-    "anthropic:claude-3-5-haiku": 200000,
-    "google:gemini-1.5-pro": 2097152,
-    "google:gemini-1.5-flash": 1048576,
-    "google:gemini-pro": 32768,
-    "cohere:command-r-plus": 128000,
-    "cohere:command-r": 128000,
-    "cohere:command-light": 4096,
-    "cohere:command": 4096,
-    "mistral:mistral-large": 32768,
-    "mistral:mistral-medium": 32768,
-    "mistral:mistral-small": 32768,
-    "mistral:mistral-7b-instruct": 32768,
-    "ollama:codellama": 16384,
-    "ollama:llama2:70b": 4096,
-    "ollama:llama2:13b": 4096,
-    "ollama:llama2": 4096,
-    "ollama:mistral": 32768,
+    prefix: capabilities.context_window
+    for prefix, capabilities in get_model_registry().items()
+    if capabilities.context_window
 }
 
 def get_model_token_limit(model_string):
-    for key, token_limit in MODEL_TOKEN_LIMITS.items():
-        if key in model_string:
-            return token_limit
-    return None
+    capabilities = get_model_capabilities(model_string)
+    return capabilities.context_window if capabilities else None
+
+def get_model_token_costs(model_string):
+    """Return the estimated USD cost per million (input, output) tokens for a model."""
+    capabilities = get_model_capabilities(model_string)
+    if capabilities is None or capabilities.input_cost_per_million is None or capabilities.output_cost_per_million is None:
+        return None
+    return capabilities.input_cost_per_million, capabilities.output_cost_per_million
 
 def remove_up_to_last_ai_message(messages: list[MessageLikeRepresentation]) -> list[MessageLikeRepresentation]:
     for i in range(len(messages) - 1, -1, -1):
@@ -443,6 +487,229 @@ def remove_up_to_last_ai_message(messages: list[MessageLikeRepresentation]) -> l
             return messages[:i]  # Return everything up to (but not including) the last AI message
     return messages
 
+##########################
+# Chunked Compression Utils
+##########################
+def format_message_for_compression(message: MessageLikeRepresentation) -> str:
+    if isinstance(message, ToolMessage):
+        return f"Tool output ({message.name}):\n{message.content}"
+    parts = [str(message.content)] if message.content else []
+    for tool_call in getattr(message, "tool_calls", []):
+        parts.append(f"Tool call: {tool_call['name']}({json.dumps(tool_call['args'])})")
+    return "\n".join(parts)
+
+def group_texts_by_tokens(texts: list[str], max_tokens: int, model: Optional[str] = None) -> list[list[str]]:
+    groups = []
+    current_group, current_tokens = [], 0
+    for text in texts:
+        text_tokens = count_tokens(text, model)
+        if current_group and current_tokens + text_tokens > max_tokens:
+            groups.append(current_group)
+            current_group, current_tokens = [], 0
+        current_group.append(text)
+        current_tokens += text_tokens
+    if current_group:
+        groups.append(current_group)
+    return groups
+
+def split_messages_into_chunks(messages: list[MessageLikeRepresentation], max_tokens: int, model: Optional[str] = None) -> list[str]:
+    """Split the tool calls and tool outputs of a transcript into token-bounded text chunks without dropping content."""
+    pieces = []
+    for message in filter_messages(messages, include_types=["tool", "ai"]):
+        text = format_message_for_compression(message)
+        # A single tool output larger than a chunk is split across several chunks
+        pieces.extend(split_text_by_tokens(text, max_tokens, model) if count_tokens(text, model) > max_tokens else [text])
+    return ["\n\n".join(group) for group in group_texts_by_tokens(pieces, max_tokens, model)]
+
+
+##########################
+# Model Routing Utils
+##########################
+def get_model_for_node(configurable: Configuration, node: str) -> str:
+    return getattr(configurable, f"{node}_model", None) or configurable.research_model
+
+def is_simple_schema(schema: type[BaseModel]) -> bool:
+    fields = schema.model_fields.values()
+    return len(fields) <= 4 and all(field.annotation in (str, bool, int, float) for field in fields)
+
+def route_structured_output_model(configurable: Configuration, node_model: str, schema: type[BaseModel], prompt: str) -> Optional[str]:
+    """Return a cheaper model for a structured output call, or None if the call should go to the node's model."""
+    if not configurable.model_routing or configurable.routing_model == node_model:
+        return None
+    if count_tokens(prompt, configurable.routing_model) > configurable.routing_max_prompt_tokens or not is_simple_schema(schema):
+        return None
+    return configurable.routing_model
+
+def require_structured_output(response):
+    if response is None:
+        raise ValueError("Model did not return the requested structured output")
+    return response
+
+
+##########################
+# Prompt Caching Utils
+##########################
+def with_cache_breakpoint(message: MessageLikeRepresentation) -> MessageLikeRepresentation:
+    content = message.content
+    if isinstance(content, str) and content:
+        blocks = [{"type": "text", "text": content}]
+    elif isinstance(content, list) and content:
+        blocks = [block if isinstance(block, dict) else {"type": "text", "text": block} for block in content]
+    else:
+        return message
+    blocks[-1] = {**blocks[-1], "cache_control": {"type": "ephemeral"}}
+    return message.model_copy(update={"content": blocks})
+
+def add_cache_breakpoints(messages: list[MessageLikeRepresentation], model_string: str, configurable: Configuration) -> list[MessageLikeRepresentation]:
+    """Mark the system prompt, the research brief (first human message) and the latest transcript message as cache breakpoints.
+
+    Anthropic only caches prefixes that end in a cache_control block (at most 4 per request). OpenAI caches
+    the longest previously seen prefix automatically, so its messages are passed through unchanged: the nodes
+    only ever append to their transcripts, and with prompt_caching compression keeps the researcher's prefix
+    too, so every call starts with the prefix of the one before.
+    """
+    if not configurable.prompt_caching or not messages or not str(model_string).lower().startswith("anthropic:"):
+        return messages
+    breakpoints = set()
+    if isinstance(messages[0], SystemMessage):
+        breakpoints.add(0)
+    first_human_index = next((i for i, message in enumerate(messages) if isinstance(message, HumanMessage)), None)
+    if first_human_index is not None:
+        breakpoints.add(first_human_index)
+    # AI messages with tool calls may have empty content, so the rolling breakpoint goes on the latest other message
+    last_index = next((i for i in range(len(messages) - 1, -1, -1) if not isinstance(messages[i], AIMessage)), None)
+    if last_index is not None:
+        breakpoints.add(last_index)
+    return [with_cache_breakpoint(message) if i in breakpoints else message for i, message in enumerate(messages)]
+
+
+##########################
+# Run Budget Utils
+##########################
+class RunBudget(BaseCallbackHandler):
+    """Track wall-clock time, tokens and estimated cost across every model call in a run.
+
+    A budget can resume from the summary() of an earlier one, so that the nodes of a run, which each get
+    their own config, add up to a single budget through the run_usage state key.
+    """
+
+    run_inline = True
+
+    def __init__(self, max_seconds: Optional[float] = None, max_tokens: Optional[int] = None, max_cost: Optional[float] = None, wind_down: float = 0.9, usage: Optional[dict[str, Any]] = None):
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.wind_down = wind_down
+        usage = usage or {}
+        # Wall-clock rather than monotonic time, since the start is carried over between nodes in graph state
+        self.started_at = usage.get("started_at", time.time())
+        self.input_tokens = usage.get("input_tokens", 0)
+        self.output_tokens = usage.get("output_tokens", 0)
+        self.cache_read_tokens = usage.get("cache_read_tokens", 0)
+        self.cache_creation_tokens = usage.get("cache_creation_tokens", 0)
+        self.cost = usage.get("estimated_cost", 0.0)
+        self.llm_calls = usage.get("llm_calls", 0)
+        self.cache_hit_calls = usage.get("cache_hit_calls", 0)
+        self._models_by_run_id: dict[uuid.UUID, str] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        self._models_by_run_id[run_id] = f"{metadata.get('ls_provider', '')}:{metadata.get('ls_model_name', '')}"
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs):
+        model_name = self._models_by_run_id.pop(run_id, "")
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.record_usage(model_name, usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+                    input_token_details = usage.get("input_token_details") or {}
+                    cache_read_tokens = input_token_details.get("cache_read") or 0
+                    self.cache_read_tokens += cache_read_tokens
+                    self.cache_creation_tokens += input_token_details.get("cache_creation") or 0
+                    self.cache_hit_calls += 1 if cache_read_tokens else 0
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._models_by_run_id.pop(run_id, None)
+
+    def record_usage(self, model_name: str, input_tokens: int, output_tokens: int):
+        self.llm_calls += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        token_costs = get_model_token_costs(model_name)
+        if token_costs:
+            self.cost += (input_tokens * token_costs[0] + output_tokens * token_costs[1]) / 1_000_000
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.time() - self.started_at
+
+    def usage_fraction(self) -> float:
+        """Return the largest fraction used of any configured budget."""
+        fractions = [0.0]
+        if self.max_seconds:
+            fractions.append(self.elapsed_seconds / self.max_seconds)
+        if self.max_tokens:
+            fractions.append((self.input_tokens + self.output_tokens) / self.max_tokens)
+        if self.max_cost:
+            fractions.append(self.cost / self.max_cost)
+        return max(fractions)
+
+    def is_exhausted(self) -> bool:
+        return self.usage_fraction() >= self.wind_down
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "started_at": self.started_at,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "llm_calls": self.llm_calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cache_read_tokens": self.cache_read_tokens,
+            "cache_creation_tokens": self.cache_creation_tokens,
+            "cache_hit_calls": self.cache_hit_calls,
+            "cache_hit_rate": round(self.cache_read_tokens / self.input_tokens, 4) if self.input_tokens else 0.0,
+            "estimated_cost": round(self.cost, 6),
+            "budget_used": round(self.usage_fraction(), 4),
+        }
+
+def attach_run_budget(config: RunnableConfig, usage: Optional[dict[str, Any]] = None) -> RunnableConfig:
+    """Return a copy of the config with a RunBudget, resumed from usage if given, shared by all nodes and subgraphs run with it.
+
+    The config is returned unchanged if it already carries a RunBudget.
+    """
+    if get_run_budget(config) is not None:
+        return config
+    configurable = Configuration.from_runnable_config(config)
+    run_budget = RunBudget(
+        max_seconds=configurable.max_run_seconds,
+        max_tokens=configurable.max_run_tokens,
+        max_cost=configurable.max_run_cost,
+        wind_down=configurable.run_budget_wind_down,
+        usage=usage
+    )
+    callbacks = config.get("callbacks")
+    if callbacks is None:
+        callbacks = [run_budget]
+    elif isinstance(callbacks, list):
+        callbacks = [*callbacks, run_budget]
+    else:
+        callbacks = callbacks.copy()
+        callbacks.add_handler(run_budget)
+    return {
+        **config,
+        "callbacks": callbacks,
+        "configurable": {**config.get("configurable", {}), "run_budget": run_budget}
+    }
+
+def get_run_budget(config: RunnableConfig) -> Optional[RunBudget]:
+    return config.get("configurable", {}).get("run_budget")
+
+def run_budget_exhausted(config: RunnableConfig) -> bool:
+    run_budget = get_run_budget(config)
+    return run_budget is not None and run_budget.is_exhausted()
+
+
 ##########################
 # Misc Utils
 ##########################
@@ -0,0 +1 @@
+"""Helpers shared by the open_deep_research and legacy research graphs."""
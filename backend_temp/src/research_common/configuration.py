@@ -0,0 +1,60 @@
+from pydantic import BaseModel
+from typing import Any, Callable, List, Optional
+from collections import OrderedDict
+from langchain_core.runnables import RunnableConfig
+import os
+
+##########################
+# Configuration Cache Utils
+##########################
+# from_runnable_config runs on every node and tool call, so parsed configurations are memoized on the
+# values of their own fields in `configurable`, and the environment overlay is read once per class.
+CONFIGURATION_CACHE_SIZE = 256
+_configuration_cache: OrderedDict[tuple, Any] = OrderedDict()
+_environment_overlays: dict[type, dict[str, str]] = {}
+
+def reset_configuration_cache():
+    """Forget cached configurations and the environment snapshot, e.g. after changing os.environ."""
+    _configuration_cache.clear()
+    _environment_overlays.clear()
+
+def freeze_config_value(value):
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted((str(k), freeze_config_value(v)) for k, v in value.items())))
+    if isinstance(value, (list, tuple)):
+        return ("list", tuple(freeze_config_value(v) for v in value))
+    if isinstance(value, BaseModel):
+        return (type(value), freeze_config_value(value.model_dump()))
+    hash(value)
+    return (type(value), value)
+
+def cached_configuration(cls, config: Optional[RunnableConfig], field_names: List[str], build: Callable[[dict[str, Any]], Any]):
+    """Return the configuration built from the environment and `configurable`, memoized on the field values.
+
+    Cached instances are shared between callers and must not be mutated.
+    """
+    configurable = config.get("configurable", {}) if config else {}
+    if cls not in _environment_overlays:
+        _environment_overlays[cls] = {
+            field_name: os.environ[field_name.upper()]
+            for field_name in field_names
+            if field_name.upper() in os.environ
+        }
+    environment_overlay = _environment_overlays[cls]
+    values: dict[str, Any] = {
+        field_name: environment_overlay.get(field_name, configurable.get(field_name))
+        for field_name in field_names
+    }
+    try:
+        key = (cls, tuple((k, freeze_config_value(v)) for k, v in values.items() if v is not None))
+    except TypeError:
+        # Unhashable values cannot be cached, so just build the configuration
+        return build(values)
+    if key in _configuration_cache:
+        _configuration_cache.move_to_end(key)
+        return _configuration_cache[key]
+    configuration = build(values)
+    _configuration_cache[key] = configuration
+    if len(_configuration_cache) > CONFIGURATION_CACHE_SIZE:
+        _configuration_cache.popitem(last=False)
+    return configuration
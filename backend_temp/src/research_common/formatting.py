@@ -0,0 +1,94 @@
+from typing import Iterable, Iterator, Optional
+from research_common.tokens import truncate_to_tokens
+
+##########################
+# Source Formatting
+##########################
+# Search tools return dozens of sources of up to tens of thousands of characters each. Building that
+# output with += in a loop copies everything formatted so far at every step, so the formatters here
+# yield the pieces instead: the format_* functions join them once, and the iter_* generators can be
+# consumed directly (e.g. written to a stream) when the output is too large to hold twice.
+SECTION_RULE = "=" * 80
+SUBSECTION_RULE = "-" * 80
+SOURCE_END = "\n\n" + "-" * 80 + "\n"
+SEARCH_RESULTS_HEADER = "Search results: \n\n"
+NO_RESULTS_MESSAGE = "No valid search results found. Please try different search queries or use a different search API."
+
+
+def clip(text: str, max_chars: Optional[int]) -> str:
+    """The first max_chars characters of text, without copying text when it is already short enough."""
+    return text if max_chars is None or len(text) <= max_chars else text[:max_chars]
+
+
+def iter_search_results(results: dict[str, dict], max_content_chars: Optional[int] = None) -> Iterator[str]:
+    """Format search results keyed by URL as numbered sources with their summary and full content, if any."""
+    yield SEARCH_RESULTS_HEADER
+    for i, (url, result) in enumerate(results.items(), 1):
+        yield f"\n\n--- SOURCE {i}: {result['title']} ---\nURL: {url}\n\nSUMMARY:\n{result['content']}\n\n"
+        if result.get("raw_content"):
+            yield "FULL CONTENT:\n"
+            yield clip(result["raw_content"], max_content_chars)
+        yield SOURCE_END
+
+
+def format_search_results(results: dict[str, dict], max_content_chars: Optional[int] = None) -> str:
+    if not results:
+        return NO_RESULTS_MESSAGE
+    return "".join(iter_search_results(results, max_content_chars))
+
+
+def iter_scraped_pages(titles: Iterable[str], urls: Iterable[str], pages: Iterable[str]) -> Iterator[str]:
+    """Format scraped pages as numbered sources with their full content."""
+    yield SEARCH_RESULTS_HEADER
+    for i, (title, url, page) in enumerate(zip(titles, urls, pages), 1):
+        yield f"\n\n--- SOURCE {i}: {title} ---\nURL: {url}\n\nFULL CONTENT:\n "
+        yield page
+        yield SOURCE_END
+
+
+def format_scraped_pages(titles: Iterable[str], urls: Iterable[str], pages: Iterable[str]) -> str:
+    return "".join(iter_scraped_pages(titles, urls, pages))
+
+
+def iter_sources(sources: Iterable[dict], max_tokens_per_source: int = 5000, include_raw_content: bool = True) -> Iterator[str]:
+    """Format deduplicated sources with their most relevant content and, optionally, their truncated full content."""
+    yield "Content from sources:"
+    for i, source in enumerate(sources):
+        # Separators go between sections rather than after each one, so that there's no trailing whitespace to strip
+        yield "\n" if i == 0 else "\n\n"
+        yield f"{SECTION_RULE}\nSource: {source['title']}\n{SUBSECTION_RULE}\nURL: {source['url']}\n===\n"
+        yield f"Most relevant content from source: {source['content']}\n===\n"
+        if include_raw_content:
+            # Handle None raw_content
+            raw_content = source.get('raw_content', '')
+            if raw_content is None:
+                raw_content = ''
+                print(f"Warning: No raw_content found for source {source['url']}")
+            # Truncate using the local tokenizer rather than a characters-per-token estimate
+            truncated_content = truncate_to_tokens(raw_content, max_tokens_per_source)
+            yield f"Full source content limited to {max_tokens_per_source} tokens: "
+            yield truncated_content
+            yield "... [truncated]\n\n" if len(truncated_content) < len(raw_content) else "\n\n"
+        yield SECTION_RULE
+
+
+def format_sources(sources: Iterable[dict], max_tokens_per_source: int = 5000, include_raw_content: bool = True) -> str:
+    return "".join(iter_sources(sources, max_tokens_per_source, include_raw_content))
+
+
+def iter_sections(sections: Iterable) -> Iterator[str]:
+    """Format report sections with their description, research flag and content."""
+    rule = "=" * 60
+    for idx, section in enumerate(sections, 1):
+        yield (
+            f"\n{rule}\nSection {idx}: {section.name}\n{rule}\n"
+            f"Description:\n{section.description}\n"
+            f"Requires Research: \n{section.research}\n\n"
+            f"Content:\n"
+        )
+        yield section.content if section.content else '[Not yet written]'
+        yield "\n\n"
+
+
+def format_sections(sections: Iterable) -> str:
+    return "".join(iter_sections(sections))
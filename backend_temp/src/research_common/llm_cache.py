@@ -0,0 +1,121 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import warnings
+from enum import Enum
+from typing import Any, Optional, Sequence
+from langchain_core.caches import BaseCache
+from langchain_core.globals import set_llm_cache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+##########################
+# LLM Response Cache
+##########################
+# Opt-in SQLite cache of model responses, keyed on the model and its parameters (including bound tools
+# and structured output schemas) and on the serialized messages. Set LLM_CACHE_MODE to:
+#   - "passthrough" (default): no caching
+#   - "record": serve cached responses and call the model (then store the response) on a miss
+#   - "replay": serve cached responses only and fail on a miss, for reproducible runs and benchmarks
+# LLM_CACHE_PATH sets the SQLite file (default .llm_cache.sqlite).
+class LLMCacheMode(Enum):
+    PASSTHROUGH = "passthrough"
+    RECORD = "record"
+    REPLAY = "replay"
+
+
+class LLMCacheMiss(Exception):
+    """Raised in replay mode when a model call has no recorded response."""
+
+
+# Message fields that do not reach the model and differ between a live response and its cached copy
+VOLATILE_MESSAGE_FIELDS = ("id", "usage_metadata", "response_metadata")
+
+def normalize_prompt(prompt: str) -> str:
+    """Drop message ids and metadata from the serialized messages, since they differ from run to run."""
+    def strip_volatile_fields(value):
+        if isinstance(value, dict):
+            kwargs = value.get("kwargs")
+            if value.get("lc") and isinstance(kwargs, dict):
+                value = {**value, "kwargs": {k: v for k, v in kwargs.items() if k not in VOLATILE_MESSAGE_FIELDS}}
+            return {k: strip_volatile_fields(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [strip_volatile_fields(v) for v in value]
+        return value
+    try:
+        return json.dumps(strip_volatile_fields(json.loads(prompt)), sort_keys=True)
+    except (TypeError, ValueError):
+        return prompt
+
+
+class SQLiteLLMCache(BaseCache):
+    def __init__(self, path: str, mode: LLMCacheMode = LLMCacheMode.RECORD):
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        # Lookups from async calls run in executor threads, so one connection is shared behind a lock
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, llm_string TEXT, response TEXT)"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\n{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response FROM llm_cache WHERE key = ?", (self._key(prompt, llm_string),)
+            ).fetchone()
+        if row is not None:
+            with warnings.catch_warnings():
+                # Responses were serialized by this cache, so loads' beta and allowed_objects warnings do not apply
+                warnings.simplefilter("ignore")
+                return loads(row[0])
+        if self.mode == LLMCacheMode.REPLAY:
+            raise LLMCacheMiss(f"No recorded response in {self.path} for a call to {llm_string[:200]}")
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        if self.mode != LLMCacheMode.RECORD:
+            return
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, llm_string, response) VALUES (?, ?, ?)",
+                (self._key(prompt, llm_string), llm_string, dumps(list(return_val)))
+            )
+            self._connection.commit()
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM llm_cache")
+            self._connection.commit()
+
+
+_llm_caches: dict[tuple, SQLiteLLMCache] = {}
+
+def get_llm_cache() -> Optional[SQLiteLLMCache]:
+    """Return the response cache configured by LLM_CACHE_MODE, or None when caching is off."""
+    mode = LLMCacheMode(os.environ.get("LLM_CACHE_MODE", LLMCacheMode.PASSTHROUGH.value).lower())
+    if mode == LLMCacheMode.PASSTHROUGH:
+        return None
+    path = os.path.abspath(os.environ.get("LLM_CACHE_PATH", ".llm_cache.sqlite"))
+    if (path, mode) not in _llm_caches:
+        _llm_caches[(path, mode)] = SQLiteLLMCache(path, mode)
+    return _llm_caches[(path, mode)]
+
+
+def install_llm_cache() -> Optional[SQLiteLLMCache]:
+    """Set the configured response cache as the global default, for models that cannot take a cache argument.
+
+    The configurable model can't be given cache=... because any non-model default makes it try
+    to build a model without a name whenever one of its attributes is looked up.
+    """
+    cache = get_llm_cache()
+    if cache is not None:
+        set_llm_cache(cache)
+    return cache
@@ -0,0 +1,81 @@
+import os
+import json
+from pathlib import Path
+from typing import Optional
+from pydantic import BaseModel
+
+##########################
+# Model Capability Registry
+##########################
+# Capabilities are keyed by model prefix ("provider:model") and looked up by longest matching prefix,
+# so "openai:gpt-4.1-mini" resolves to its own entry rather than to "openai:gpt-4.1".
+# The defaults live in model_registry.json. A deployment can override or extend them with a JSON file
+# of the same shape pointed to by MODEL_REGISTRY_PATH; its fields are merged over the defaults.
+DEFAULT_MODEL_REGISTRY_PATH = Path(__file__).with_name("model_registry.json")
+
+
+class ModelCapabilities(BaseModel):
+    context_window: Optional[int] = None
+    max_output: Optional[int] = None
+    tokenizer: Optional[str] = None
+    input_cost_per_million: Optional[float] = None
+    output_cost_per_million: Optional[float] = None
+
+
+class ModelRegistry:
+    def __init__(self, entries: Optional[dict[str, dict]] = None):
+        self._entries: dict[str, ModelCapabilities] = {}
+        self._prefix_lengths: list[int] = []
+        self._lookup_cache: dict[str, Optional[ModelCapabilities]] = {}
+        for prefix, capabilities in (entries or {}).items():
+            self.register(prefix, **capabilities)
+
+    @classmethod
+    def from_files(cls, *paths) -> "ModelRegistry":
+        registry = cls()
+        for path in paths:
+            with open(path) as f:
+                for prefix, capabilities in json.load(f).items():
+                    registry.register(prefix, **capabilities)
+        return registry
+
+    def register(self, prefix: str, **capabilities):
+        """Add a model prefix, merging the given fields over any existing entry for it."""
+        prefix = prefix.lower()
+        existing = self._entries.get(prefix)
+        merged = {**(existing.model_dump(exclude_none=True) if existing else {}), **capabilities}
+        self._entries[prefix] = ModelCapabilities(**merged)
+        self._prefix_lengths = sorted({len(key) for key in self._entries}, reverse=True)
+        self._lookup_cache.clear()
+
+    def lookup(self, model_string: Optional[str]) -> Optional[ModelCapabilities]:
+        if not model_string:
+            return None
+        if model_string not in self._lookup_cache:
+            model_key = model_string.lower()
+            # Only one dict probe per distinct prefix length, longest first
+            self._lookup_cache[model_string] = next(
+                (self._entries[model_key[:length]] for length in self._prefix_lengths
+                 if length <= len(model_key) and model_key[:length] in self._entries),
+                None
+            )
+        return self._lookup_cache[model_string]
+
+    def items(self):
+        return self._entries.items()
+
+
+_model_registry: Optional[ModelRegistry] = None
+
+def get_model_registry() -> ModelRegistry:
+    global _model_registry
+    if _model_registry is None:
+        paths = [DEFAULT_MODEL_REGISTRY_PATH]
+        if os.environ.get("MODEL_REGISTRY_PATH"):
+            paths.append(os.environ["MODEL_REGISTRY_PATH"])
+        _model_registry = ModelRegistry.from_files(*paths)
+    return _model_registry
+
+
+def get_model_capabilities(model_string: Optional[str]) -> Optional[ModelCapabilities]:
+    return get_model_registry().lookup(model_string)
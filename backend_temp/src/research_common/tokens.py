@@ -0,0 +1,153 @@
+import json
+import hashlib
+import logging
+import weakref
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+from langchain_core.messages import AIMessage, MessageLikeRepresentation
+from research_common.model_registry import get_model_capabilities, get_model_registry
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+##########################
+# Token Counting
+##########################
+# Counts tokens locally with the tokenizer family recorded for each model in the model registry, or
+# DEFAULT_TOKENIZER for models without one. If tiktoken or its encoding files are unavailable (e.g. offline),
+# counts fall back to the rough estimate of 4 characters per token.
+#
+# Encodings are loaded on first use, and a failed load is remembered so it is only attempted once. tiktoken
+# downloads an encoding the first time it is loaded, so servers call preload_encodings() off the event loop
+# at startup rather than let the first count inside an async node block on the download.
+DEFAULT_TOKENIZER = "cl100k_base"
+CHARS_PER_TOKEN = 4
+# Tokens added per message by chat formatting (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Tokenizer families without a local tokenizer that are approximated by a similar encoding
+TOKENIZER_APPROXIMATIONS = {
+    "claude": "cl100k_base",
+}
+# Number of text token counts kept, keyed on a digest of the text so that the cache doesn't keep the texts alive
+TEXT_TOKEN_CACHE_SIZE = 8192
+
+
+def get_encoding(tokenizer: Optional[str]):
+    return _load_encoding(TOKENIZER_APPROXIMATIONS.get(tokenizer, tokenizer))
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(tokenizer: Optional[str]):
+    if tiktoken is None or not tokenizer:
+        return None
+    try:
+        return tiktoken.get_encoding(tokenizer)
+    except Exception as e:
+        logging.warning(f"Could not load tokenizer {tokenizer}, estimating tokens from characters instead: {e}")
+        return None
+
+
+def preload_encodings():
+    """Load the default encoding and the encodings of every tokenizer in the model registry."""
+    tokenizers = {DEFAULT_TOKENIZER} | {capabilities.tokenizer for _, capabilities in get_model_registry().items() if capabilities.tokenizer}
+    for tokenizer in sorted(tokenizers):
+        get_encoding(tokenizer)
+
+
+def get_tokenizer_for_model(model_string: Optional[str]) -> Optional[str]:
+    capabilities = get_model_capabilities(model_string)
+    return capabilities.tokenizer if capabilities and capabilities.tokenizer else DEFAULT_TOKENIZER
+
+
+_text_token_cache: OrderedDict[tuple[bytes, Optional[str]], int] = OrderedDict()
+_text_token_cache_lock = threading.Lock()
+
+def _count_text_tokens(text: str, tokenizer: Optional[str]) -> int:
+    key = (hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest(), tokenizer)
+    with _text_token_cache_lock:
+        token_count = _text_token_cache.get(key)
+        if token_count is not None:
+            _text_token_cache.move_to_end(key)
+            return token_count
+    encoding = get_encoding(tokenizer)
+    if encoding is None:
+        token_count = len(text) // CHARS_PER_TOKEN + 1
+    else:
+        token_count = len(encoding.encode(text, disallowed_special=()))
+    with _text_token_cache_lock:
+        _text_token_cache[key] = token_count
+        if len(_text_token_cache) > TEXT_TOKEN_CACHE_SIZE:
+            _text_token_cache.popitem(last=False)
+    return token_count
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    return _count_text_tokens(text, get_tokenizer_for_model(model))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """Return the longest prefix of the text that fits in max_tokens tokens."""
+    encoding = get_encoding(get_tokenizer_for_model(model))
+    if encoding is None:
+        return text[:max(max_tokens, 0) * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max(max_tokens, 0)])
+
+
+def split_text_by_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> list[str]:
+    """Split the text into consecutive pieces of at most max_tokens tokens each."""
+    max_tokens = max(max_tokens, 1)
+    encoding = get_encoding(get_tokenizer_for_model(model))
+    if encoding is None:
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+
+def get_message_text(message: MessageLikeRepresentation) -> str:
+    content = message.content if hasattr(message, "content") else message
+    if isinstance(content, list):
+        content = "\n".join(
+            block if isinstance(block, str) else str(block.get("text", "")) if isinstance(block, dict) else str(block)
+            for block in content
+        )
+    text = str(content)
+    if isinstance(message, AIMessage) and message.tool_calls:
+        text += "".join(tool_call["name"] + json.dumps(tool_call["args"]) for tool_call in message.tool_calls)
+    return text
+
+
+# Messages are treated as immutable once created, so their counts are cached per object for as long
+# as the message is alive. The content object is also compared to catch messages edited in place.
+_message_token_cache: dict[tuple[int, Optional[str]], tuple[weakref.ref, object, int]] = {}
+
+def _count_message_tokens(message: MessageLikeRepresentation, tokenizer: Optional[str]) -> int:
+    key = (id(message), tokenizer)
+    cached = _message_token_cache.get(key)
+    if cached and cached[0]() is message and cached[1] is message.content:
+        return cached[2]
+    token_count = MESSAGE_OVERHEAD_TOKENS + _count_text_tokens(get_message_text(message), tokenizer)
+    _message_token_cache[key] = (
+        weakref.ref(message, lambda _, key=key: _message_token_cache.pop(key, None)),
+        message.content,
+        token_count
+    )
+    return token_count
+
+
+def count_message_tokens(messages: list[MessageLikeRepresentation], model: Optional[str] = None) -> int:
+    tokenizer = get_tokenizer_for_model(model)
+    token_count = 0
+    for message in messages:
+        if hasattr(message, "content"):
+            token_count += _count_message_tokens(message, tokenizer)
+        else:
+            token_count += MESSAGE_OVERHEAD_TOKENS + _count_text_tokens(get_message_text(message), tokenizer)
+    return token_count
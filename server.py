@@ -24,6 +24,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend_temp', 'src'
 # Import LangGraph components
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.types import Command
+from research_common.tokens import preload_encodings
 
 # Import all available research workflow implementations
 modern_builder = None
@@ -34,6 +35,8 @@ AVAILABLE_IMPLEMENTATIONS = []
 # Try modern implementation first
 try:
     from open_deep_research.deep_researcher import deep_researcher as modern_builder
+    from open_deep_research.configuration import Configuration as ModernConfiguration, RawNotesMode
+    from open_deep_research.blob_store import get_raw_notes_store, hydrate_raw_notes, is_digest, BLOB_REF_PREFIX
     AVAILABLE_IMPLEMENTATIONS.append("modern")
     print("✅ Modern implementation loaded (open_deep_research.deep_researcher)")
 except ImportError as e:
@@ -89,6 +92,8 @@ app.add_middleware(
 # Global variables
 graphs = {}
 memory = None
+# Blob stores that modern runs have written raw notes to, so /raw_notes/{digest} reads from the same backend and path
+raw_notes_stores = []
 
 def initialize_graphs():
     """Initialize all available research workflows with memory checkpointer."""
@@ -130,6 +135,8 @@ async def startup_event():
     if not initialize_graphs():
         print("❌ Server failed to start - could not initialize graphs")
         sys.exit(1)
+    # Load the tokenizers now (downloading them on a cold cache) so the first token count in a run doesn't block
+    await asyncio.to_thread(preload_encodings)
 
 @app.get("/")
 async def root():
@@ -315,20 +322,24 @@ async def invoke_research(request: ResearchRequest):
         # Handle the workflow based on implementation
         if implementation == "modern":
             # Modern implementation (deep_researcher) - runs to completion automatically
+            # Updates are streamed for progress logging, and the full state values to read the result from
             final_state = None
-            async for event in graph.astream(graph_input, graph_config, stream_mode="updates"):
+            async for mode, event in graph.astream(graph_input, graph_config, stream_mode=["updates", "values"]):
+                if mode == "values":
+                    final_state = event
+                    continue
                 print(f"📊 Modern workflow event: {list(event.keys())}")
-                final_state = event
                 
                 # Handle any clarification requests from the modern implementation
-                if 'messages' in event and event['messages']:
-                    last_message = event['messages'][-1]
-                    if hasattr(last_message, 'content') and 'clarification' in str(last_message.content).lower():
-                        print("ℹ️ Clarification requested but skipped for web interface")
+                for update in event.values():
+                    if isinstance(update, dict) and update.get('messages'):
+                        last_message = update['messages'][-1]
+                        if hasattr(last_message, 'content') and 'clarification' in str(last_message.content).lower():
+                            print("ℹ️ Clarification requested but skipped for web interface")
             
             # Get final state if needed
             if not final_state:
-                state = graph.get_state(graph_config)
+                state = await graph.aget_state(graph_config)
                 final_state = state.values
             
             # Extract the result from AgentState structure
@@ -339,12 +350,22 @@ async def invoke_research(request: ResearchRequest):
                 # - research_brief: The original research question
                 # - notes: Compressed research findings
                 # - raw_notes: Raw research data
+                # - run_usage: Wall-clock time, tokens and cost tracked against the run budget
+                # With raw_notes_mode "reference", raw_notes are blob references that can be fetched from /raw_notes/{digest}
+                modern_config = ModernConfiguration.from_runnable_config(graph_config)
+                raw_notes_store = get_raw_notes_store(modern_config)
+                if raw_notes_store is not None and raw_notes_store not in raw_notes_stores:
+                    raw_notes_stores.append(raw_notes_store)
+                raw_notes = final_state.get("raw_notes", [])
+                if RawNotesMode(modern_config.raw_notes_mode) == RawNotesMode.FULL:
+                    raw_notes = hydrate_raw_notes(raw_notes, raw_notes_store)
                 result = {
                     "final_report": final_state.get("final_report", ""),
                     "research_brief": final_state.get("research_brief", ""),
                     "notes": final_state.get("notes", []),
-                    "raw_notes": final_state.get("raw_notes", []),
-                    "messages": final_state.get("messages", [])
+                    "raw_notes": raw_notes,
+                    "messages": final_state.get("messages", []),
+                    "usage": final_state.get("run_usage") or {}
                 }
                 
                 # Ensure we have a final report
@@ -356,6 +377,9 @@ async def invoke_research(request: ResearchRequest):
                             break
                 
                 print(f"📝 Modern implementation extracted final_report: {len(result['final_report'])} chars")
+                if result["usage"].get("llm_calls"):
+                    usage = result["usage"]
+                    print(f"💾 Prompt cache: {usage['cache_hit_calls']}/{usage['llm_calls']} calls hit, {usage['cache_hit_rate']:.0%} of input tokens read from cache")
             else:
                 result = {"content": str(final_state)}
                 
@@ -473,6 +497,28 @@ async def stream_research(request: ResearchRequest):
 
 # Additional utility endpoints
 
+@app.get("/raw_notes/{digest}")
+async def get_raw_note(digest: str):
+    """Fetch a raw research note stored by reference (raw_notes_mode "reference")."""
+    if "modern" not in AVAILABLE_IMPLEMENTATIONS:
+        raise HTTPException(status_code=404, detail="Raw notes are only stored by the modern implementation")
+    # Only a lowercase hex sha256 digest can name a note; anything else could escape the store directory
+    if not is_digest(digest):
+        raise HTTPException(status_code=400, detail=f"Invalid raw note digest: {digest}")
+    ref = BLOB_REF_PREFIX + digest
+    # Look in the stores used by runs on this server, then in the store the server's own configuration resolves
+    # to (e.g. a filesystem store shared with an earlier process)
+    default_config = ModernConfiguration.from_runnable_config()
+    default_store = get_raw_notes_store(default_config.model_copy(update={"raw_notes_mode": RawNotesMode.REFERENCE}))
+    content = None
+    for raw_notes_store in [*raw_notes_stores, default_store]:
+        content = raw_notes_store.get(ref)
+        if content is not None:
+            break
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"Raw note not found: {digest}")
+    return {"ref": ref, "content": content}
+
 @app.get("/config/models")
 async def get_available_models():
     """Get available model configurations."""
@@ -0,0 +1,275 @@
+"""Offline performance benchmark for the deep researcher, the legacy graph and the multi-agent graph.
+
+Each case runs a graph end to end against the fakes in tests/fakes.py, in a fresh process so that
+peak RSS is per case, and records wall time, per-node latency, model calls, tokens, peak RSS and
+checkpoint bytes. Results are printed as a table and written as JSON for regression tracking.
+
+    python -m tests.benchmark --output bench.json
+    python -m tests.benchmark --graphs deep_researcher --concurrency 1 5 --latency 0.2 --corpus large
+    python -m tests.benchmark --set blob_store=memory --delta-checkpoints
+
+max_concurrent_research_units, max_researcher_iterations and max_react_tool_calls only exist in the
+deep researcher, so the legacy graphs are only varied by corpus size.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import platform
+import itertools
+import statistics
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "backend_temp", "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from tests.fakes import FIXTURE_CORPUS, OfflineHarness
+
+TOPIC = "The state of battery technology for grid storage and electric vehicles"
+GRAPHS = ("deep_researcher", "legacy_graph", "multi_agent")
+# Documents in the corpus, and words per page
+CORPUS_SIZES = {
+    "small": (6, 60),
+    "medium": (24, 400),
+    "large": (96, 2000),
+}
+DEEP_RESEARCHER_KNOBS = ("max_concurrent_research_units", "max_researcher_iterations", "max_react_tool_calls")
+
+
+def build_corpus(documents: int, page_words: int) -> list[dict]:
+    corpus = []
+    for i in range(documents):
+        base = FIXTURE_CORPUS[i % len(FIXTURE_CORPUS)]
+        words = base["raw_content"].split()
+        page = " ".join(words[j % len(words)] for j in range(page_words))
+        corpus.append({
+            "title": f"{base['title']} ({i + 1})",
+            "url": f"{base['url']}/{i + 1}",
+            "content": base["content"],
+            "raw_content": page,
+        })
+    return corpus
+
+
+##########################
+# Measurements
+##########################
+class NodeTimer(BaseCallbackHandler):
+    """Time every graph node run, including nodes of subgraphs."""
+
+    run_inline = True
+
+    def __init__(self):
+        self._started: dict[Any, tuple[str, float]] = {}
+        self.durations: dict[str, list[float]] = defaultdict(list)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        # Runnables inside a node inherit its metadata; only the node's own run carries its name
+        if node and kwargs.get("name") == node:
+            self._started[run_id] = (node, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        if run_id in self._started:
+            node, started_at = self._started.pop(run_id)
+            self.durations[node].append(time.perf_counter() - started_at)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        # Nodes that hand off through an interrupt or a parent Command end with an error
+        self.on_chain_end(None, run_id=run_id)
+
+    def summary(self) -> dict:
+        return {
+            node: {"calls": len(durations), "total_s": round(sum(durations), 4), "max_s": round(max(durations), 4)}
+            for node, durations in sorted(self.durations.items(), key=lambda item: -sum(item[1]))
+        }
+
+
+def serialized_bytes(value) -> int:
+    """Total size of the serialized payloads held by a checkpointer's storage."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(serialized_bytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(serialized_bytes(v) for v in value)
+    return 0
+
+
+def peak_rss_bytes() -> int:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+##########################
+# Cases
+##########################
+async def run_graph(graph_name: str, configurable: dict, callbacks: list) -> tuple[dict, Any]:
+    from langchain_core.messages import HumanMessage
+    from langgraph.checkpoint.memory import MemorySaver
+    from langgraph.types import Command
+
+    checkpointer = MemorySaver()
+    config = {"configurable": {"thread_id": str(uuid.uuid4()), **configurable}, "callbacks": callbacks}
+    if graph_name == "deep_researcher":
+        from open_deep_research.deep_researcher import deep_researcher_builder
+        graph = deep_researcher_builder.compile(checkpointer=checkpointer)
+        result = await graph.ainvoke({"messages": [HumanMessage(content=TOPIC)]}, config)
+    elif graph_name == "legacy_graph":
+        from legacy.graph import builder
+        graph = builder.compile(checkpointer=checkpointer)
+        await graph.ainvoke({"topic": TOPIC}, config)
+        # Approve the report plan at the human feedback interrupt
+        result = await graph.ainvoke(Command(resume=True), config)
+    elif graph_name == "multi_agent":
+        from legacy.multi_agent import supervisor_builder
+        graph = supervisor_builder.compile(checkpointer=checkpointer)
+        result = await graph.ainvoke({"messages": [{"role": "user", "content": TOPIC}]}, config)
+    else:
+        raise ValueError(f"Unknown graph: {graph_name}")
+    return result, checkpointer
+
+
+def run_case(case: dict) -> dict:
+    """Run one benchmark case and return its measurements."""
+    if case["delta_checkpoints"]:
+        # Read by open_deep_research.state at import, so it must be set before the graphs are imported
+        os.environ["DELTA_CHECKPOINTS"] = "true"
+    documents, page_words = CORPUS_SIZES[case["corpus"]]
+    harness = OfflineHarness(
+        latency=case["latency"],
+        search_latency=case["search_latency"],
+        response_tokens=case["response_tokens"],
+        corpus=build_corpus(documents, page_words),
+    )
+    if case["graph"] == "deep_researcher":
+        # Keep delegating and searching until the graph's own limits stop the run
+        harness.tool_rounds = {"ConductResearch": sys.maxsize, "tavily_search": sys.maxsize}
+        harness.fan_out = {"ConductResearch": case["fan_out"]}
+    timer = NodeTimer()
+    with harness:
+        started_at = time.perf_counter()
+        result, checkpointer = asyncio.run(run_graph(case["graph"], case["configurable"], [timer]))
+        wall_time = time.perf_counter() - started_at
+    return {
+        **case,
+        "wall_time_s": round(wall_time, 4),
+        "nodes": timer.summary(),
+        "llm_calls": len(harness.model_calls),
+        "input_tokens": sum(call.input_tokens for call in harness.model_calls),
+        "output_tokens": sum(call.output_tokens for call in harness.model_calls),
+        "searches": len(harness.searches),
+        "peak_rss_bytes": peak_rss_bytes(),
+        "checkpoint_bytes": serialized_bytes([checkpointer.storage, checkpointer.writes, checkpointer.blobs]),
+        "final_report_chars": len(result.get("final_report") or ""),
+    }
+
+
+def build_cases(args) -> list[dict]:
+    cases = []
+    for graph_name in args.graphs:
+        if graph_name == "deep_researcher":
+            knob_values = list(itertools.product(args.concurrency, args.iterations, args.tool_calls))
+        else:
+            knob_values = [None]
+        for knobs, corpus, repeat in itertools.product(knob_values, args.corpus, range(args.repeat)):
+            configurable = dict(args.overrides)
+            if knobs is not None:
+                configurable.update(dict(zip(DEEP_RESEARCHER_KNOBS, knobs)))
+            cases.append({
+                "graph": graph_name,
+                "corpus": corpus,
+                "repeat": repeat,
+                "configurable": configurable,
+                "latency": args.latency,
+                "search_latency": args.search_latency,
+                "response_tokens": args.response_tokens,
+                "fan_out": args.fan_out,
+                "delta_checkpoints": args.delta_checkpoints,
+            })
+    return cases
+
+
+def parse_override(value: str) -> tuple[str, Any]:
+    key, _, raw = value.partition("=")
+    try:
+        return key, json.loads(raw)
+    except ValueError:
+        return key, raw
+
+
+def print_results(results: list[dict]):
+    header = f"{'graph':<16} {'corpus':<7} {'knobs':<10} {'wall s':>8} {'llm':>5} {'tokens':>9} {'rss MB':>8} {'ckpt KB':>9}  slowest node"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        knobs = "/".join(str(result["configurable"].get(knob, "-")) for knob in DEEP_RESEARCHER_KNOBS)
+        slowest = next(iter(result["nodes"].items()), ("-", {"total_s": 0}))
+        print(
+            f"{result['graph']:<16} {result['corpus']:<7} {knobs:<10} {result['wall_time_s']:>8.3f} "
+            f"{result['llm_calls']:>5} {result['input_tokens'] + result['output_tokens']:>9} "
+            f"{result['peak_rss_bytes'] / 2**20:>8.1f} {result['checkpoint_bytes'] / 1024:>9.1f}  "
+            f"{slowest[0]} ({slowest[1]['total_s']:.3f}s)"
+        )
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--graphs", nargs="+", choices=GRAPHS, default=list(GRAPHS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 5], help="max_concurrent_research_units values")
+    parser.add_argument("--iterations", nargs="+", type=int, default=[2, 4], help="max_researcher_iterations values")
+    parser.add_argument("--tool-calls", nargs="+", type=int, default=[2, 5], help="max_react_tool_calls values")
+    parser.add_argument("--corpus", nargs="+", choices=list(CORPUS_SIZES), default=["small", "large"])
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per fake model call")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="Seconds per fake search request")
+    parser.add_argument("--response-tokens", type=int, default=200, help="Words in each plain text model response")
+    parser.add_argument("--fan-out", type=int, default=5, help="Parallel ConductResearch calls per supervisor turn")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--set", dest="overrides", action="append", type=parse_override, default=[],
+                        metavar="KEY=VALUE", help="Extra configurable value for every case (JSON values are parsed)")
+    parser.add_argument("--delta-checkpoints", action="store_true", help="Run with DELTA_CHECKPOINTS=true")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run cases in this process (faster, but peak RSS is then cumulative)")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    cases = build_cases(args)
+    if args.in_process:
+        results = [run_case(case) for case in cases]
+    else:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn"), max_tasks_per_child=1) as executor:
+            results = list(executor.map(run_case, cases))
+
+    print_results(results)
+    if args.output:
+        wall_times = defaultdict(list)
+        for result in results:
+            wall_times[result["graph"]].append(result["wall_time_s"])
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "overrides")},
+            "overrides": dict(args.overrides),
+            "median_wall_time_s": {graph: statistics.median(times) for graph, times in wall_times.items()},
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
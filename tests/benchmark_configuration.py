@@ -0,0 +1,121 @@
+"""Microbenchmark of the memoized from_runnable_config of the three configuration classes.
+
+Times each class's from_runnable_config, called once per node and tool call with the run's config, against
+the uncached version it replaced (kept below as the reference implementations, which
+tests/test_configuration.py also checks the output against):
+
+    python -m tests.benchmark_configuration
+    python -m tests.benchmark_configuration --calls 5000 --repeat 10
+"""
+
+import os
+import sys
+import time
+import uuid
+import argparse
+import statistics
+from dataclasses import fields
+from typing import Any, Callable, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "backend_temp", "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from langchain_core.runnables import RunnableConfig
+from open_deep_research.configuration import Configuration
+from legacy.configuration import Configuration as LegacyConfiguration, MultiAgentConfiguration
+from research_common.configuration import reset_configuration_cache
+
+
+##########################
+# Reference Implementations
+##########################
+def reference_configuration(config: Optional[RunnableConfig] = None) -> Configuration:
+    configurable = config.get("configurable", {}) if config else {}
+    field_names = list(Configuration.model_fields.keys())
+    values: dict[str, Any] = {
+        field_name: os.environ.get(field_name.upper(), configurable.get(field_name))
+        for field_name in field_names
+    }
+    return Configuration(**{k: v for k, v in values.items() if v is not None})
+
+
+def reference_dataclass_configuration(cls) -> Callable:
+    def from_runnable_config(config: Optional[RunnableConfig] = None):
+        configurable = (
+            config["configurable"] if config and "configurable" in config else {}
+        )
+        values: dict[str, Any] = {
+            f.name: os.environ.get(f.name.upper(), configurable.get(f.name))
+            for f in fields(cls)
+            if f.init
+        }
+        return cls(**{k: v for k, v in values.items() if v})
+    return from_runnable_config
+
+
+##########################
+# Inputs
+##########################
+def build_node_configs(calls: int) -> list[RunnableConfig]:
+    """The configs the nodes of one run see: the same run settings, with a different checkpoint namespace per node."""
+    thread_id = str(uuid.uuid4())
+    return [
+        {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": f"researcher:{i}",
+                "search_api": "tavily",
+                "research_model": "openai:gpt-4.1",
+                "max_concurrent_research_units": 5,
+                "mcp_config": {"url": "http://localhost:8000/mcp", "tools": ["search", "fetch"], "auth_required": False},
+                "planner_model_kwargs": {"temperature": 0},
+                "mcp_server_config": {"filesystem": {"command": "npx", "args": ["-y", "server-filesystem"]}},
+            }
+        }
+        for i in range(calls)
+    ]
+
+
+def build_cases() -> dict[str, tuple[Callable, Callable]]:
+    return {
+        "deep_researcher": (reference_configuration, Configuration.from_runnable_config),
+        "legacy_graph": (reference_dataclass_configuration(LegacyConfiguration), LegacyConfiguration.from_runnable_config),
+        "multi_agent": (reference_dataclass_configuration(MultiAgentConfiguration), MultiAgentConfiguration.from_runnable_config),
+    }
+
+
+def best_time(function: Callable, configs: list[RunnableConfig], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        # Every repeat is a new run, so the cached version pays for building the configuration once
+        reset_configuration_cache()
+        started_at = time.perf_counter()
+        for config in configs:
+            function(config)
+        times.append(time.perf_counter() - started_at)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1000, help="from_runnable_config calls per run")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per implementation; the best is reported")
+    args = parser.parse_args(argv)
+
+    configs = build_node_configs(args.calls)
+    print(f"{args.calls} calls per run, best of {args.repeat}")
+    print(f"{'configuration':<16} {'uncached us':>12} {'cached us':>10} {'speedup':>8}")
+    speedups = []
+    for name, (reference, from_runnable_config) in build_cases().items():
+        assert from_runnable_config(configs[0]) == reference(configs[0]), f"{name} configuration differs from the reference"
+        reference_time = best_time(reference, configs, args.repeat)
+        cached_time = best_time(from_runnable_config, configs, args.repeat)
+        speedups.append(reference_time / cached_time)
+        print(f"{name:<16} {reference_time / args.calls * 1e6:>12.2f} {cached_time / args.calls * 1e6:>10.2f} {speedups[-1]:>7.1f}x")
+    print(f"median speedup {statistics.median(speedups):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Microbenchmark of the source formatters in research_common.formatting.
+
+Times each formatter against the += loop it replaced (kept below as the reference implementations,
+which tests/test_formatting.py also checks the output against), on dozens of large sources:
+
+    python -m tests.benchmark_formatting
+    python -m tests.benchmark_formatting --sources 100 --chars 50000 --repeat 20
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+from types import SimpleNamespace
+from typing import Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "backend_temp", "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from research_common.formatting import format_scraped_pages, format_search_results, format_sections, format_sources
+from research_common.tokens import truncate_to_tokens
+from tests.fakes import FIXTURE_CORPUS
+
+
+##########################
+# Reference Implementations
+##########################
+def reference_search_results(results: dict[str, dict], max_content_chars: int) -> str:
+    formatted_output = f"Search results: \n\n"
+    for i, (url, result) in enumerate(results.items()):
+        formatted_output += f"\n\n--- SOURCE {i+1}: {result['title']} ---\n"
+        formatted_output += f"URL: {url}\n\n"
+        formatted_output += f"SUMMARY:\n{result['content']}\n\n"
+        if result.get('raw_content'):
+            formatted_output += f"FULL CONTENT:\n{result['raw_content'][:max_content_chars]}"
+        formatted_output += "\n\n" + "-" * 80 + "\n"
+    return formatted_output
+
+
+def reference_scraped_pages(titles: list[str], urls: list[str], pages: list[str]) -> str:
+    formatted_output = f"Search results: \n\n"
+    for i, (title, url, page) in enumerate(zip(titles, urls, pages)):
+        formatted_output += f"\n\n--- SOURCE {i+1}: {title} ---\n"
+        formatted_output += f"URL: {url}\n\n"
+        formatted_output += f"FULL CONTENT:\n {page}"
+        formatted_output += "\n\n" + "-" * 80 + "\n"
+    return formatted_output
+
+
+def reference_sources(sources: list[dict], max_tokens_per_source: int, include_raw_content: bool = True) -> str:
+    formatted_text = "Content from sources:\n"
+    for source in sources:
+        formatted_text += f"{'='*80}\n"
+        formatted_text += f"Source: {source['title']}\n"
+        formatted_text += f"{'-'*80}\n"
+        formatted_text += f"URL: {source['url']}\n===\n"
+        formatted_text += f"Most relevant content from source: {source['content']}\n===\n"
+        if include_raw_content:
+            raw_content = source.get('raw_content', '')
+            if raw_content is None:
+                raw_content = ''
+            truncated_content = truncate_to_tokens(raw_content, max_tokens_per_source)
+            if len(truncated_content) < len(raw_content):
+                raw_content = truncated_content + "... [truncated]"
+            formatted_text += f"Full source content limited to {max_tokens_per_source} tokens: {raw_content}\n\n"
+        formatted_text += f"{'='*80}\n\n"
+    return formatted_text.strip()
+
+
+def reference_sections(sections: list) -> str:
+    formatted_str = ""
+    for idx, section in enumerate(sections, 1):
+        formatted_str += f"""
+{'='*60}
+Section {idx}: {section.name}
+{'='*60}
+Description:
+{section.description}
+Requires Research: 
+{section.research}
+
+Content:
+{section.content if section.content else '[Not yet written]'}
+
+"""
+    return formatted_str
+
+
+##########################
+# Inputs
+##########################
+def build_sources(count: int, chars: int) -> list[dict]:
+    sources = []
+    for i in range(count):
+        base = FIXTURE_CORPUS[i % len(FIXTURE_CORPUS)]
+        text = base["raw_content"]
+        raw_content = (text * (chars // len(text) + 1))[:chars]
+        sources.append({
+            "title": f"{base['title']} ({i + 1})",
+            "url": f"{base['url']}/{i + 1}",
+            "content": base["content"],
+            "raw_content": raw_content,
+        })
+    return sources
+
+
+def build_cases(count: int, chars: int) -> dict[str, tuple[Callable, Callable, tuple]]:
+    sources = build_sources(count, chars)
+    results = {source["url"]: source for source in sources}
+    pages = ([s["title"] for s in sources], [s["url"] for s in sources], [s["raw_content"] for s in sources])
+    sections = [
+        SimpleNamespace(name=s["title"], description=s["content"], research=True, content=s["raw_content"])
+        for s in sources
+    ]
+    # Token truncation dominates deduplicate_and_format_sources, so allow whole sources through
+    max_tokens = chars
+    return {
+        "search_results": (reference_search_results, format_search_results, (results, chars)),
+        "scraped_pages": (reference_scraped_pages, format_scraped_pages, pages),
+        "sources": (reference_sources, format_sources, (sources, max_tokens)),
+        "sections": (reference_sections, format_sections, (sections,)),
+    }
+
+
+def best_time(function: Callable, args: tuple, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - started_at)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sources", type=int, default=50, help="Number of sources")
+    parser.add_argument("--chars", type=int, default=20_000, help="Characters of content per source")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per formatter; the best is reported")
+    args = parser.parse_args(argv)
+
+    print(f"{args.sources} sources of {args.chars} characters, best of {args.repeat}")
+    print(f"{'formatter':<16} {'+= loop ms':>11} {'join ms':>9} {'speedup':>8}")
+    speedups = []
+    for name, (reference, formatter, inputs) in build_cases(args.sources, args.chars).items():
+        assert formatter(*inputs) == reference(*inputs), f"{name} output differs from the reference"
+        reference_time = best_time(reference, inputs, args.repeat)
+        formatter_time = best_time(formatter, inputs, args.repeat)
+        speedups.append(reference_time / formatter_time)
+        print(f"{name:<16} {reference_time * 1000:>11.2f} {formatter_time * 1000:>9.2f} {speedups[-1]:>7.1f}x")
+    print(f"median speedup {statistics.median(speedups):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
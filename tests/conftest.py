@@ -0,0 +1,12 @@
+"""
+Pytest configuration for the offline graph tests.
+"""
+
+import os
+import sys
+
+# The graphs live in backend_temp/src; make them and the tests package importable without an install
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "backend_temp", "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,552 @@
+"""Offline fakes for running the research graphs without model or search API access.
+
+OfflineHarness patches chat model construction, the Tavily, Exa, arXiv, PubMed, Perplexity and DuckDuckGo
+clients, arXiv PDF downloads and page scraping, so that
+the modern deep researcher and both legacy graphs run end to end, deterministically, against a
+scripted fake model and a small fixture corpus:
+
+    with OfflineHarness(latency=0.05) as harness:
+        result = await graph.ainvoke(inputs, config)
+    print(len(harness.model_calls), harness.total_tokens)
+"""
+
+import os
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import random
+import tempfile
+import arxiv
+import httpx
+import pymupdf
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+from unittest.mock import patch
+from urllib.parse import parse_qs
+from xml.sax.saxutils import escape
+from pydantic import Field
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from research_common.tokens import count_message_tokens, count_tokens, get_message_text
+
+##########################
+# Fixture Corpus
+##########################
+FIXTURE_CORPUS = [
+    {
+        "title": "Solid-state batteries: an overview",
+        "url": "https://example.com/solid-state-batteries",
+        "content": "Solid-state batteries replace the liquid electrolyte with a solid one, improving energy density and safety.",
+        "raw_content": "Solid-state batteries use a solid electrolyte such as a ceramic or a sulfide glass instead of a flammable liquid. "
+                       "They promise higher energy density because they allow lithium metal anodes, and they reduce the risk of thermal runaway. "
+                       "Manufacturing at scale remains difficult: interfaces between the electrolyte and the electrodes degrade over many cycles.",
+    },
+    {
+        "title": "Sodium-ion cells enter production",
+        "url": "https://example.com/sodium-ion-production",
+        "content": "Several manufacturers started mass production of sodium-ion cells for stationary storage and small vehicles.",
+        "raw_content": "Sodium-ion cells avoid lithium, cobalt and nickel, trading some energy density for lower cost and better cold-weather behaviour. "
+                       "Their first markets are grid storage and low-cost city cars, where weight matters less than price per kilowatt-hour.",
+    },
+    {
+        "title": "Grid-scale storage costs in 2024",
+        "url": "https://example.com/grid-storage-costs",
+        "content": "Installed costs of four-hour battery systems fell again, driven by cheaper LFP cells.",
+        "raw_content": "The installed cost of four-hour lithium iron phosphate systems fell by roughly a fifth year over year. "
+                       "Developers increasingly pair storage with solar plants to shift midday generation into the evening peak.",
+    },
+    {
+        "title": "Battery recycling and the circular supply chain",
+        "url": "https://example.com/battery-recycling",
+        "content": "Hydrometallurgical recycling recovers most of the lithium, nickel and cobalt from spent cells.",
+        "raw_content": "Recycling plants shred spent cells into black mass and leach the metals out with acids. "
+                       "Recovery rates above ninety percent are reported for nickel and cobalt, with lithium recovery improving quickly. "
+                       "Regulation in several regions now sets minimum recycled content for new batteries.",
+    },
+    {
+        "title": "Fast charging and battery degradation",
+        "url": "https://example.com/fast-charging-degradation",
+        "content": "Frequent fast charging accelerates capacity fade through lithium plating at low temperatures.",
+        "raw_content": "Charging at high currents can deposit metallic lithium on the anode, especially in cold conditions. "
+                       "Battery management systems limit charging power based on cell temperature and state of charge to slow this degradation.",
+    },
+    {
+        "title": "Silicon anodes for higher energy density",
+        "url": "https://example.com/silicon-anodes",
+        "content": "Blending silicon into graphite anodes raises capacity but silicon swells during charging.",
+        "raw_content": "Silicon stores about ten times more lithium per gram than graphite, but expands by up to three hundred percent. "
+                       "Nanostructured silicon and silicon-carbon composites limit the swelling and are already used in some consumer devices.",
+    },
+]
+
+ARXIV_PUBLISHED = datetime(2024, 1, 15, tzinfo=timezone.utc)
+VOCABULARY = (
+    "battery storage energy density cost cell lithium sodium electrolyte anode cathode capacity charging grid "
+    "recycling supply chain safety performance research analysis evidence trend market production"
+).split()
+
+# Tool calls the scripted model makes, in order, when several tools are bound: search first,
+# then delegate or plan, then write, then finish. Tools not listed here are never called.
+# By default each tool is called in one turn; tool_rounds repeats a tool over several turns
+# and fan_out issues several parallel calls of it per turn.
+SEARCH_TOOL_NAMES = ("tavily_search", "duckduckgo_search", "azureaisearch_search")
+TOOL_CALL_ORDER = SEARCH_TOOL_NAMES + (
+    "ConductResearch",
+    "Sections",
+    "Section",
+    "Introduction",
+    "Conclusion",
+    "ResearchComplete",
+    "FinishResearch",
+    "FinishReport",
+)
+FORCED_TOOL_CHOICES = ("any", "required")
+
+# Structured output fields that must take a particular value for the graphs to make progress
+DEFAULT_STRUCTURED_OVERRIDES = {
+    "ClarifyWithUser": {"need_clarification": False},
+    "Feedback": {"grade": "pass"},
+}
+
+
+def stable_digest(*parts) -> str:
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+def generate_text(seed: str, num_words: int) -> str:
+    rng = random.Random(seed)
+    words = [rng.choice(VOCABULARY) for _ in range(max(num_words, 1))]
+    return f"## {' '.join(words[:4]).title()}\n\n{' '.join(words)}."
+
+
+def generate_from_schema(schema: dict, name: str, defs: dict, index: int = 1) -> Any:
+    """Build a deterministic value that validates against a JSON schema."""
+    if "$ref" in schema:
+        return generate_from_schema(defs[schema["$ref"].split("/")[-1]], name, defs, index)
+    if "default" in schema and schema["default"] is not None:
+        return schema["default"]
+    if "enum" in schema:
+        return schema["enum"][0]
+    for union_key in ("anyOf", "oneOf"):
+        if union_key in schema:
+            options = [option for option in schema[union_key] if option.get("type") != "null"]
+            return generate_from_schema(options[0], name, defs, index) if options else None
+    schema_type = schema.get("type", "string")
+    if schema_type == "object":
+        return {
+            key: generate_from_schema(value, key, defs, index)
+            for key, value in schema.get("properties", {}).items()
+        }
+    if schema_type == "array":
+        return [generate_from_schema(schema.get("items", {}), name, defs, i) for i in (1, 2)]
+    if schema_type == "boolean":
+        # Alternate across array items so both branches of a flag (e.g. Section.research) get exercised
+        return index % 2 == 1
+    if schema_type == "integer":
+        return index
+    if schema_type == "number":
+        return float(index)
+    return f"{name} {index}"
+
+
+##########################
+# Fake Chat Model
+##########################
+@dataclass
+class ModelCall:
+    model: str
+    input_tokens: int
+    output_tokens: int
+    tool_calls: list[str]
+    started_at: float
+    duration: float
+    cache_read_tokens: int = 0
+
+
+class FakeChatModel(BaseChatModel):
+    """Scripted chat model that supports tool calling and structured output.
+
+    Structured output and single forced tools get arguments generated from the tool schema.
+    With several tools bound, the model calls the first tool in TOOL_CALL_ORDER that it has not
+    yet called tool_rounds times in the conversation, and otherwise answers in plain text.
+    Responses are derived from the prompt only, so repeated runs produce identical reports.
+    Like OpenAI's automatic prompt caching, the longest message prefix the harness has seen before
+    is reported as read from the cache.
+    """
+
+    model: str = "fake:scripted"
+    latency: float = 0.0
+    response_tokens: int = 200
+    structured_overrides: dict = Field(default_factory=lambda: dict(DEFAULT_STRUCTURED_OVERRIDES))
+    tool_rounds: dict[str, int] = Field(default_factory=dict)
+    fan_out: dict[str, int] = Field(default_factory=dict)
+    harness: Optional[Any] = Field(default=None, exclude=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-scripted"
+
+    def _get_ls_params(self, stop: Optional[list[str]] = None, **kwargs):
+        provider, _, model_name = self.model.rpartition(":")
+        return {"ls_provider": provider or "fake", "ls_model_name": model_name, "ls_model_type": "chat"}
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], tool_choice=tool_choice, **kwargs)
+
+    def _generate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        started_at = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(messages, started_at, **kwargs)
+
+    async def _agenerate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        started_at = time.perf_counter()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(messages, started_at, **kwargs)
+
+    def _respond(self, messages: list[BaseMessage], started_at: float, tools=None, tool_choice=None, **kwargs) -> ChatResult:
+        conversation = stable_digest(self.model, *(get_message_text(message) for message in messages))
+        tool, turn = self._choose_tool(messages, tools or [], tool_choice)
+        if tool is None:
+            message = AIMessage(content=generate_text(conversation, self.response_tokens))
+        else:
+            function = tool["function"]
+            parameters = function.get("parameters", {})
+            count = self.fan_out.get(function["name"], 1)
+            tool_calls = []
+            for i in range(count):
+                # Number the arguments across turns and parallel calls, so every call asks for something new
+                index = turn * count + i + 1
+                args = generate_from_schema(parameters, function["name"], parameters.get("$defs", {}), index)
+                args.update(self.structured_overrides.get(function["name"], {}))
+                tool_calls.append({
+                    "name": function["name"],
+                    "args": args,
+                    "id": f"call_{stable_digest(conversation, function['name'], index)[:24]}",
+                })
+            message = AIMessage(content="", tool_calls=tool_calls)
+        input_tokens = count_message_tokens(messages, self.model)
+        output_tokens = count_tokens(get_message_text(message), self.model)
+        cache_read_tokens = self.harness.read_prompt_cache(self.model, messages) if self.harness is not None else 0
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "input_token_details": {"cache_read": cache_read_tokens},
+        }
+        message.response_metadata = {"model_name": self.model}
+        if self.harness is not None:
+            self.harness.model_calls.append(ModelCall(
+                model=self.model,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                tool_calls=[tool_call["name"] for tool_call in message.tool_calls],
+                started_at=started_at,
+                duration=time.perf_counter() - started_at,
+                cache_read_tokens=cache_read_tokens,
+            ))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _choose_tool(self, messages: list[BaseMessage], tools: list[dict], tool_choice) -> tuple[Optional[dict], int]:
+        """Return the tool to call, if any, and how many earlier turns called it."""
+        if not tools:
+            return None, 0
+        tools_by_name = {t["function"]["name"]: t for t in tools}
+        if isinstance(tool_choice, dict):
+            tool_choice = tool_choice.get("function", {}).get("name") or tool_choice.get("name")
+        if tool_choice in tools_by_name:
+            return tools_by_name[tool_choice], 0
+        forced = tool_choice in FORCED_TOOL_CHOICES or tool_choice is True
+        if forced and len(tools) == 1:
+            # Structured output
+            return tools[0], 0
+        turns = Counter(
+            name
+            for message in messages if isinstance(message, AIMessage)
+            for name in {tool_call["name"] for tool_call in message.tool_calls}
+        )
+        scripted = [name for name in TOOL_CALL_ORDER if name in tools_by_name]
+        next_tool = next((name for name in scripted if turns[name] < self.tool_rounds.get(name, 1)), None)
+        if next_tool is None and forced and scripted:
+            next_tool = scripted[-1]
+        return tools_by_name.get(next_tool), turns[next_tool]
+
+
+##########################
+# Fake Search Clients
+##########################
+def select_documents(corpus: list[dict], query: str, max_results: int) -> list[dict]:
+    """Return max_results documents, starting at a position derived from the query."""
+    offset = int(stable_digest(query)[:8], 16) % len(corpus)
+    count = min(max_results, len(corpus))
+    return [corpus[(offset + i) % len(corpus)] for i in range(count)]
+
+
+class FakeTavilyClient:
+    def __init__(self, harness: "OfflineHarness"):
+        self.harness = harness
+
+    async def search(self, query: str, max_results: int = 5, include_raw_content: bool = False, topic: str = "general", **kwargs):
+        self.harness.searches.append(("tavily", query))
+        if self.harness.search_latency:
+            await asyncio.sleep(self.harness.search_latency)
+        documents = select_documents(self.harness.corpus, query, max_results)
+        return {
+            "query": query,
+            "follow_up_questions": None,
+            "answer": None,
+            "images": [],
+            "results": [
+                {
+                    "title": doc["title"],
+                    "url": doc["url"],
+                    "content": doc["content"],
+                    "score": 1.0 - i * 0.1,
+                    "raw_content": doc["raw_content"] if include_raw_content else None,
+                }
+                for i, doc in enumerate(documents)
+            ],
+        }
+
+
+class FakeExa:
+    def __init__(self, harness: "OfflineHarness"):
+        self.harness = harness
+
+    def search_and_contents(self, query: str, num_results: int = 5, **kwargs):
+        self.harness.searches.append(("exa", query))
+        if self.harness.search_latency:
+            time.sleep(self.harness.search_latency)
+        documents = select_documents(self.harness.corpus, query, num_results)
+        return {
+            "results": [
+                {
+                    "title": doc["title"],
+                    "url": doc["url"],
+                    "text": doc["raw_content"],
+                    "summary": doc["content"],
+                    "score": 1.0 - i * 0.1,
+                }
+                for i, doc in enumerate(documents)
+            ]
+        }
+
+
+class FakeDDGS:
+    def __init__(self, harness: "OfflineHarness"):
+        self.harness = harness
+
+    def text(self, query: str, max_results: int = 5, **kwargs) -> list[dict]:
+        self.harness.searches.append(("duckduckgo", query))
+        if self.harness.search_latency:
+            time.sleep(self.harness.search_latency)
+        documents = select_documents(self.harness.corpus, query, max_results)
+        return [{"title": doc["title"], "href": doc["url"], "body": doc["content"]} for doc in documents]
+
+
+def arxiv_id(harness: "OfflineHarness", doc: dict) -> str:
+    return f"2401.{harness.corpus.index(doc) + 1:05d}v1"
+
+
+class FakeArxivClient:
+    def __init__(self, harness: "OfflineHarness"):
+        self.harness = harness
+
+    def results(self, search: arxiv.Search) -> list[arxiv.Result]:
+        query = search.query or " ".join(search.id_list)
+        self.harness.searches.append(("arxiv", query))
+        if self.harness.search_latency:
+            time.sleep(self.harness.search_latency)
+        return [
+            arxiv.Result(
+                entry_id=f"http://arxiv.org/abs/{arxiv_id(self.harness, doc)}",
+                updated=ARXIV_PUBLISHED,
+                published=ARXIV_PUBLISHED,
+                title=doc["title"],
+                authors=[arxiv.Result.Author("A. Author"), arxiv.Result.Author("B. Author")],
+                summary=doc["content"],
+                links=[arxiv.Result.Link(f"http://arxiv.org/pdf/{arxiv_id(self.harness, doc)}", title="pdf")],
+            )
+            for doc in select_documents(self.harness.corpus, query, search.max_results)
+        ]
+
+
+def render_pdf(text: str) -> bytes:
+    document = pymupdf.open()
+    page = document.new_page()
+    page.insert_textbox(page.rect + (36, 36, -36, -36), text, fontsize=6)
+    return document.tobytes()
+
+
+async def fake_arxiv_pdf(harness: "OfflineHarness", request: httpx.Request) -> httpx.Response:
+    harness.searches.append(("arxiv_pdf", str(request.url)))
+    if harness.search_latency:
+        await asyncio.sleep(harness.search_latency)
+    for doc in harness.corpus:
+        if str(request.url).endswith(arxiv_id(harness, doc)):
+            return httpx.Response(200, content=render_pdf(doc["raw_content"]), headers={"Content-Type": "application/pdf"})
+    return httpx.Response(404, text="Not found")
+
+
+def pubmed_id(harness: "OfflineHarness", doc: dict) -> str:
+    return str(38000001 + harness.corpus.index(doc))
+
+
+async def fake_eutils(harness: "OfflineHarness", request: httpx.Request) -> httpx.Response:
+    if harness.search_latency:
+        await asyncio.sleep(harness.search_latency)
+    if request.url.path.endswith("esearch.fcgi"):
+        query = request.url.params["term"]
+        harness.searches.append(("pubmed", query))
+        documents = select_documents(harness.corpus, query, int(request.url.params["retmax"]))
+        return httpx.Response(200, json={"esearchresult": {"idlist": [pubmed_id(harness, doc) for doc in documents]}})
+    uids = parse_qs(request.content.decode())["id"][0].split(",")
+    harness.searches.append(("pubmed_efetch", ",".join(uids)))
+    documents = {pubmed_id(harness, doc): doc for doc in harness.corpus}
+    articles = "".join(
+        f"<PubmedArticle><MedlineCitation><PMID>{uid}</PMID><Article>"
+        f"<ArticleTitle>{escape(documents[uid]['title'])}</ArticleTitle>"
+        f"<Abstract><AbstractText Label=\"BACKGROUND\">{escape(documents[uid]['content'])}</AbstractText>"
+        f"<AbstractText Label=\"RESULTS\">{escape(documents[uid]['raw_content'])}</AbstractText></Abstract>"
+        f"<ArticleDate><Year>2024</Year><Month>01</Month><Day>15</Day></ArticleDate>"
+        f"</Article></MedlineCitation></PubmedArticle>"
+        for uid in uids if uid in documents
+    )
+    return httpx.Response(200, text=f"<PubmedArticleSet>{articles}</PubmedArticleSet>")
+
+
+async def fake_perplexity_completion(harness: "OfflineHarness", request: httpx.Request) -> httpx.Response:
+    query = json.loads(request.content)["messages"][-1]["content"]
+    harness.searches.append(("perplexity", query))
+    if harness.search_latency:
+        await asyncio.sleep(harness.search_latency)
+    documents = select_documents(harness.corpus, query, 3)
+    return httpx.Response(200, json={
+        "choices": [{"message": {"content": "\n\n".join(doc["raw_content"] for doc in documents)}}],
+        "citations": [doc["url"] for doc in documents],
+    })
+
+
+async def fake_page(harness: "OfflineHarness", request: httpx.Request) -> httpx.Response:
+    url = str(request.url)
+    harness.searches.append(("scrape", url))
+    if harness.search_latency:
+        await asyncio.sleep(harness.search_latency)
+    for doc in harness.corpus:
+        if doc["url"] == url:
+            html = f"<html><head><title>{doc['title']}</title></head><body><p>{doc['raw_content']}</p></body></html>"
+            return httpx.Response(200, text=html, headers={"Content-Type": "text/html; charset=utf-8"})
+    return httpx.Response(404, text="Not found")
+
+
+##########################
+# Harness
+##########################
+@dataclass
+class OfflineHarness:
+    """Context manager that routes all model and search calls to the fakes and records them."""
+
+    latency: float = 0.0
+    search_latency: float = 0.0
+    response_tokens: int = 200
+    corpus: list[dict] = field(default_factory=lambda: list(FIXTURE_CORPUS))
+    structured_overrides: dict = field(default_factory=lambda: dict(DEFAULT_STRUCTURED_OVERRIDES))
+    tool_rounds: dict[str, int] = field(default_factory=dict)
+    fan_out: dict[str, int] = field(default_factory=dict)
+    model_calls: list[ModelCall] = field(default_factory=list)
+    searches: list[tuple[str, str]] = field(default_factory=list)
+    prompt_cache: set[str] = field(default_factory=set)
+
+    def __post_init__(self):
+        self._patches = [
+            # Every init_chat_model call, configurable or not, builds its model through this helper
+            patch("langchain.chat_models.base._init_chat_model_helper", self.chat_model),
+            patch("open_deep_research.utils.AsyncTavilyClient", lambda *args, **kwargs: FakeTavilyClient(self)),
+            patch("legacy.utils.AsyncTavilyClient", lambda *args, **kwargs: FakeTavilyClient(self)),
+            patch("legacy.clients.Exa", lambda *args, **kwargs: FakeExa(self)),
+            patch("legacy.clients.DDGS", lambda *args, **kwargs: FakeDDGS(self)),
+            patch("legacy.utils.get_arxiv_client", lambda: FakeArxivClient(self)),
+            patch.dict("legacy.clients.HTTP_CLIENT_SETTINGS", {"perplexity": {
+                "base_url": "https://api.perplexity.ai",
+                "transport": httpx.MockTransport(lambda request: fake_perplexity_completion(self, request)),
+            }, "pubmed": {
+                "base_url": "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/",
+                "transport": httpx.MockTransport(lambda request: fake_eutils(self, request)),
+            }, "arxiv": {
+                "transport": httpx.MockTransport(lambda request: fake_arxiv_pdf(self, request)),
+            }, "scrape": {
+                "follow_redirects": True,
+                "transport": httpx.MockTransport(lambda request: fake_page(self, request)),
+            }}),
+        ]
+
+    def chat_model(self, model: str, *, model_provider: Optional[str] = None, **kwargs) -> FakeChatModel:
+        if model_provider and ":" not in model:
+            model = f"{model_provider}:{model}"
+        return FakeChatModel(
+            model=model,
+            latency=self.latency,
+            response_tokens=self.response_tokens,
+            structured_overrides=self.structured_overrides,
+            tool_rounds=self.tool_rounds,
+            fan_out=self.fan_out,
+            harness=self,
+            cache=kwargs.get("cache"),
+        )
+
+    def read_prompt_cache(self, model: str, messages: list[BaseMessage]) -> int:
+        """Return the tokens of the longest message prefix sent to the model before, and cache every prefix."""
+        cached_tokens = prefix_tokens = 0
+        prefix = stable_digest(model)
+        for message in messages:
+            prefix = stable_digest(prefix, message.type, get_message_text(message), getattr(message, "tool_calls", ""))
+            prefix_tokens += count_message_tokens([message], model)
+            if prefix in self.prompt_cache:
+                cached_tokens = prefix_tokens
+            self.prompt_cache.add(prefix)
+        return cached_tokens
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(call.input_tokens + call.output_tokens for call in self.model_calls)
+
+    def reset(self):
+        self.model_calls.clear()
+        self.searches.clear()
+
+    def __enter__(self) -> "OfflineHarness":
+        from legacy.clients import reset_clients
+        from legacy.rate_limit import reset_rate_limiters
+        from legacy.search_cache import reset_search_caches
+        # Parsed arXiv papers are cached on disk, so give each harness its own cache directory
+        self._cache_dir = tempfile.mkdtemp(prefix="offline-harness-")
+        self._env_patch = patch.dict(os.environ, {"ARXIV_CACHE_DIR": self._cache_dir})
+        self._env_patch.start()
+        for p in self._patches:
+            p.start()
+        # Pooled clients, rate limiters and cached results are per process, so drop any built before (or by) this harness
+        reset_clients()
+        reset_rate_limiters()
+        reset_search_caches()
+        return self
+
+    def __exit__(self, *exc_info):
+        from legacy.clients import reset_clients
+        from legacy.rate_limit import reset_rate_limiters
+        from legacy.search_cache import reset_search_caches
+        for p in reversed(self._patches):
+            p.stop()
+        self._env_patch.stop()
+        shutil.rmtree(self._cache_dir, ignore_errors=True)
+        reset_clients()
+        reset_rate_limiters()
+        reset_search_caches()
+        return False
+
@@ -0,0 +1,52 @@
+"""Check the content-addressed blob stores and the hydration of blob references."""
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+
+from open_deep_research.blob_store import (
+    BLOB_REF_PREFIX,
+    BlobNotFoundError,
+    FileSystemBlobStore,
+    InMemoryBlobStore,
+    hydrate_messages,
+    hydrate_raw_notes,
+    is_blob_ref,
+)
+
+
+def test_hydration_resolves_references():
+    store = InMemoryBlobStore()
+    ref = store.put("page text " * 100)
+    messages = [AIMessage(content="searching"), ToolMessage(content=ref, tool_call_id="1")]
+    assert store.put("page text " * 100) == ref
+    assert [m.content for m in hydrate_messages(messages, store)] == ["searching", "page text " * 100]
+    assert hydrate_raw_notes([ref, "inline note"], store) == ["page text " * 100, "inline note"]
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = InMemoryBlobStore(max_bytes=10)
+    first, second = store.put("aaaaaa"), store.put("bbbbbb")
+    assert store.get(first) is None and store.get(second) == "bbbbbb"
+    assert store.size == 6
+    # Reading a blob makes it the most recently used
+    third = store.put("cc")
+    assert store.get(second) == "bbbbbb" and store.get(third) == "cc"
+
+
+def test_hydrating_an_evicted_blob_raises():
+    store = InMemoryBlobStore(max_bytes=10)
+    evicted = store.put("aaaaaa")
+    store.put("bbbbbb")
+    with pytest.raises(BlobNotFoundError):
+        hydrate_messages([ToolMessage(content=evicted, tool_call_id="1")], store)
+    with pytest.raises(BlobNotFoundError):
+        hydrate_raw_notes([evicted], store)
+
+
+def test_only_sha256_hex_digests_are_references(tmp_path):
+    store = FileSystemBlobStore(str(tmp_path / "blobs"))
+    (tmp_path / "secret").write_text("secret")
+    escaping = BLOB_REF_PREFIX + "../secret".ljust(64, "a")
+    assert not is_blob_ref(escaping) and not is_blob_ref(BLOB_REF_PREFIX + "A" * 64)
+    assert store.get(escaping) is None
+    assert store.get(store.put("note")) == "note"
@@ -0,0 +1,51 @@
+"""Check that from_runnable_config reuses cached configurations and notices changed values."""
+
+import pytest
+
+from open_deep_research.configuration import Configuration
+from research_common.configuration import reset_configuration_cache
+from tests.benchmark_configuration import build_cases, build_node_configs
+
+
+@pytest.fixture(autouse=True)
+def fresh_configuration_cache():
+    reset_configuration_cache()
+    yield
+    reset_configuration_cache()
+
+
+@pytest.mark.parametrize("name", ["deep_researcher", "legacy_graph", "multi_agent"])
+def test_configurations_match_reference(name):
+    reference, from_runnable_config = build_cases()[name]
+    for config in [None, {}, *build_node_configs(2)]:
+        assert from_runnable_config(config) == reference(config)
+
+
+@pytest.mark.parametrize("name", ["deep_researcher", "legacy_graph", "multi_agent"])
+def test_nodes_of_a_run_share_one_instance(name):
+    _, from_runnable_config = build_cases()[name]
+    first, *rest = build_node_configs(5)
+    # Keys that aren't configuration fields, like the checkpoint namespace, don't change the configuration
+    assert all(from_runnable_config(config) is from_runnable_config(first) for config in rest)
+
+
+def test_changed_configurable_values_give_a_new_instance():
+    config = build_node_configs(1)[0]
+    configuration = Configuration.from_runnable_config(config)
+    changed = {"configurable": {**config["configurable"], "max_concurrent_research_units": 2}}
+    assert Configuration.from_runnable_config(changed) is not configuration
+    assert Configuration.from_runnable_config(changed).max_concurrent_research_units == 2
+    nested_change = {"configurable": {**config["configurable"], "mcp_config": {"url": "http://other/mcp"}}}
+    assert Configuration.from_runnable_config(nested_change).mcp_config.url == "http://other/mcp"
+    assert Configuration.from_runnable_config(config) is configuration
+
+
+def test_environment_is_a_snapshot_until_reset(monkeypatch):
+    configuration = Configuration.from_runnable_config()
+    monkeypatch.setenv("RESEARCH_MODEL", "anthropic:claude-sonnet-4")
+    # The environment is read once per class, so the change is only seen after a reset
+    assert Configuration.from_runnable_config() is configuration
+    reset_configuration_cache()
+    assert Configuration.from_runnable_config().research_model == "anthropic:claude-sonnet-4"
+    # Environment values override the configurable ones
+    assert Configuration.from_runnable_config({"configurable": {"research_model": "openai:gpt-4.1"}}).research_model == "anthropic:claude-sonnet-4"
@@ -0,0 +1,27 @@
+"""Check the join-based source formatters against the += loops they replaced."""
+
+import pytest
+
+from research_common.formatting import NO_RESULTS_MESSAGE, format_search_results, iter_search_results
+from tests.benchmark_formatting import build_cases, build_sources
+
+
+@pytest.mark.parametrize("name", ["search_results", "scraped_pages", "sources", "sections"])
+@pytest.mark.parametrize("chars", [0, 300, 5000])
+def test_formatters_match_reference(name, chars):
+    reference, formatter, inputs = build_cases(8, chars)[name]
+    assert formatter(*inputs) == reference(*inputs)
+
+
+def test_sources_are_truncated_like_the_reference():
+    reference, formatter, (sources, _) = build_cases(4, 5000)["sources"]
+    assert formatter(sources, 100) == reference(sources, 100)
+    assert "... [truncated]" in formatter(sources, 100)
+    assert formatter(sources, 100, False) == reference(sources, 100, False)
+    assert formatter([], 100) == reference([], 100)
+
+
+def test_streaming_matches_joined_output():
+    results = {source["url"]: source for source in build_sources(5, 1000)}
+    assert "".join(iter_search_results(results, 500)) == format_search_results(results, 500)
+    assert format_search_results({}) == NO_RESULTS_MESSAGE
@@ -0,0 +1,141 @@
+"""Run the three research graphs end to end against the offline fakes in tests/fakes.py."""
+
+import json
+import uuid
+import asyncio
+import pytest
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Command
+
+from open_deep_research.deep_researcher import deep_researcher_builder
+from legacy.graph import builder
+from legacy.multi_agent import supervisor_builder
+from tests.fakes import FIXTURE_CORPUS, OfflineHarness
+
+TOPIC = "The state of battery technology for grid storage and electric vehicles"
+
+
+def thread_config(**configurable) -> dict:
+    return {"configurable": {"thread_id": str(uuid.uuid4()), **configurable}}
+
+
+async def run_deep_researcher(**configurable) -> dict:
+    graph = deep_researcher_builder.compile(checkpointer=MemorySaver())
+    return await graph.ainvoke({"messages": [HumanMessage(content=TOPIC)]}, thread_config(**configurable))
+
+
+async def run_legacy_graph(**configurable) -> dict:
+    graph = builder.compile(checkpointer=MemorySaver())
+    config = thread_config(**configurable)
+    await graph.ainvoke({"topic": TOPIC}, config)
+    # Approve the report plan at the human feedback interrupt
+    return await graph.ainvoke(Command(resume=True), config)
+
+
+async def run_multi_agent(**configurable) -> dict:
+    graph = supervisor_builder.compile(checkpointer=MemorySaver())
+    return await graph.ainvoke({"messages": [{"role": "user", "content": TOPIC}]}, thread_config(**configurable))
+
+
+def test_deep_researcher_runs_offline():
+    with OfflineHarness() as harness:
+        result = asyncio.run(run_deep_researcher())
+    assert result["final_report"]
+    assert result["raw_notes"]
+    assert harness.searches and all(backend == "tavily" for backend, _ in harness.searches)
+    assert {"ConductResearch", "ResearchComplete", "tavily_search"} <= {
+        name for call in harness.model_calls for name in call.tool_calls
+    }
+
+
+@pytest.mark.parametrize("search_api", ["tavily", "exa", "arxiv", "pubmed", "perplexity", "duckduckgo"])
+def test_legacy_graph_runs_offline(search_api, monkeypatch):
+    # The fakes have no rate limits, so don't pace requests at the real services' limits
+    monkeypatch.setenv("SEARCH_RATE_LIMITS", json.dumps({
+        "arxiv": {"rate": 100, "max_concurrency": 10},
+        "pubmed": {"rate": 100, "max_concurrency": 10},
+        "duckduckgo": {"rate": 100, "max_concurrency": 10},
+    }))
+    with OfflineHarness() as harness:
+        result = asyncio.run(run_legacy_graph(search_api=search_api))
+    assert result["final_report"]
+    # DuckDuckGo only returns snippets, so it also scrapes the result pages; arXiv and PubMed fetch the papers
+    expected = {search_api} | {"duckduckgo": {"scrape"}, "arxiv": {"arxiv_pdf"}, "pubmed": {"pubmed_efetch"}}.get(search_api, set())
+    assert {backend for backend, _ in harness.searches} == expected
+
+
+def test_arxiv_papers_are_parsed_once_and_cached(monkeypatch):
+    from legacy.utils import arxiv_search_async
+    monkeypatch.setenv("SEARCH_RATE_LIMITS", '{"arxiv": {"rate": 100, "max_concurrency": 10}}')
+    queries = ["solid state batteries", "sodium ion cells"]
+    with OfflineHarness() as harness:
+        first = asyncio.run(arxiv_search_async(queries, load_max_docs=3))
+        downloads = [url for backend, url in harness.searches if backend == "arxiv_pdf"]
+        second = asyncio.run(arxiv_search_async(queries, load_max_docs=3))
+        # Papers found by both queries are downloaded once, and not at all from the disk cache
+        assert len(downloads) == len(set(downloads))
+        assert [backend for backend, _ in harness.searches].count("arxiv_pdf") == len(downloads)
+    assert first == second
+    paper = first[0]["results"][0]
+    document = next(doc for doc in FIXTURE_CORPUS if doc["title"] == paper["title"])
+    assert paper["url"].startswith("http://arxiv.org/abs/")
+    # The text comes back from the rendered PDF with different line breaks
+    assert " ".join(paper["raw_content"].split()).startswith(" ".join(document["raw_content"].split()[:10]))
+
+
+def test_multi_agent_runs_offline():
+    with OfflineHarness() as harness:
+        result = asyncio.run(run_multi_agent())
+    assert result["final_report"]
+    assert result["final_report"].startswith("# ")
+    assert harness.searches
+
+
+def test_runs_are_deterministic():
+    with OfflineHarness():
+        first = asyncio.run(run_deep_researcher())
+        second = asyncio.run(run_deep_researcher())
+    assert first["final_report"] == second["final_report"]
+    assert first["raw_notes"] == second["raw_notes"]
+
+
+def test_run_budget_covers_every_model_call():
+    with OfflineHarness() as harness:
+        result = asyncio.run(run_deep_researcher())
+    assert result["run_usage"]["llm_calls"] == len(harness.model_calls)
+    assert result["run_usage"]["input_tokens"] + result["run_usage"]["output_tokens"] == harness.total_tokens
+
+
+def test_run_budget_is_enforced_inside_the_graph():
+    with OfflineHarness() as harness:
+        result = asyncio.run(run_deep_researcher(max_run_tokens=1))
+    # The clarification and research brief calls exhaust the budget, so research wraps up without calling the
+    # supervisor model, and the final report is written from the (empty) notes
+    assert [list(call.tool_calls) for call in harness.model_calls] == [["ClarifyWithUser"], ["ResearchQuestion"], []]
+    assert result["run_usage"]["llm_calls"] == 3
+    assert result["run_usage"]["budget_used"] >= 1
+    assert result["final_report"]
+    assert not result["raw_notes"]
+
+
+def test_harness_applies_latency_and_counts_tokens():
+    with OfflineHarness(latency=0.01, response_tokens=50) as harness:
+        asyncio.run(run_multi_agent())
+    assert harness.model_calls
+    assert all(call.duration >= 0.01 for call in harness.model_calls)
+    assert harness.total_tokens > 0
+
+
+def test_pubmed_fetches_articles_in_one_batch_and_caches_them():
+    from legacy.utils import pubmed_search_async
+    queries = ["lithium iron phosphate", "sodium ion cells", "grid storage costs"]
+    with OfflineHarness() as harness:
+        first = asyncio.run(pubmed_search_async(queries, top_k_results=3))
+        second = asyncio.run(pubmed_search_async(queries, top_k_results=3))
+    efetches = [uids for backend, uids in harness.searches if backend == "pubmed_efetch"]
+    # One efetch for the union of all queries' articles, and none for the repeated search
+    assert len(efetches) == 1
+    assert len(efetches[0].split(",")) == len({r["url"] for doc in first for r in doc["results"]})
+    assert first == second
+    assert first[0]["results"][0]["raw_content"].startswith("BACKGROUND: ")
@@ -0,0 +1,62 @@
+"""Check where prompt cache breakpoints are placed and that cached prefixes are reused and reported."""
+
+import asyncio
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from open_deep_research.configuration import Configuration
+from open_deep_research.utils import add_cache_breakpoints
+from tests.fakes import OfflineHarness
+from tests.test_offline_graphs import run_deep_researcher
+
+TRANSCRIPT = [
+    SystemMessage(content="You are a research assistant."),
+    HumanMessage(content="Research brief: grid storage batteries"),
+    AIMessage(content="", tool_calls=[{"name": "tavily_search", "args": {"queries": ["lfp"]}, "id": "call_1"}]),
+    ToolMessage(content="Search results about LFP cells", tool_call_id="call_1"),
+    AIMessage(content="", tool_calls=[{"name": "think_tool", "args": {"reflection": "more"}, "id": "call_2"}]),
+    ToolMessage(content=[{"type": "text", "text": "Reflection recorded"}], tool_call_id="call_2"),
+    AIMessage(content="", tool_calls=[{"name": "ResearchComplete", "args": {}, "id": "call_3"}]),
+]
+
+
+def breakpoint_indexes(messages) -> list[int]:
+    return [
+        i for i, message in enumerate(messages)
+        if isinstance(message.content, list) and "cache_control" in message.content[-1]
+    ]
+
+
+def test_anthropic_breakpoints_on_system_prompt_brief_and_latest_message():
+    configurable = Configuration(prompt_caching=True)
+    messages = add_cache_breakpoints(TRANSCRIPT, "anthropic:claude-sonnet-4-20250514", configurable)
+    # The latest message is an AI tool call with no content, so the rolling breakpoint goes on the tool result before it
+    assert breakpoint_indexes(messages) == [0, 1, 5]
+    assert messages[0].content == [{"type": "text", "text": "You are a research assistant.", "cache_control": {"type": "ephemeral"}}]
+    assert messages[5].content == [{"type": "text", "text": "Reflection recorded", "cache_control": {"type": "ephemeral"}}]
+    # The input transcript is left as is
+    assert breakpoint_indexes(TRANSCRIPT) == []
+    assert [message.content for message in messages[2:5]] == [message.content for message in TRANSCRIPT[2:5]]
+
+
+def test_breakpoints_only_for_anthropic_with_prompt_caching():
+    assert add_cache_breakpoints(TRANSCRIPT, "openai:gpt-4.1", Configuration(prompt_caching=True)) is TRANSCRIPT
+    assert add_cache_breakpoints(TRANSCRIPT, "anthropic:claude-sonnet-4-20250514", Configuration()) is TRANSCRIPT
+
+
+def test_compression_reuses_the_cached_researcher_prefix():
+    usage = {}
+    for prompt_caching in (False, True):
+        with OfflineHarness() as harness:
+            result = asyncio.run(run_deep_researcher(
+                compression_model="openai:gpt-4.1", final_report_model="openai:gpt-4.1-mini", prompt_caching=prompt_caching
+            ))
+        compression_calls = [call for call in harness.model_calls if not call.tool_calls and call.model == "openai:gpt-4.1"]
+        usage[prompt_caching] = (result["run_usage"], compression_calls)
+    uncached_usage, uncached_compression = usage[False]
+    cached_usage, cached_compression = usage[True]
+    # Without prompt caching compression swaps the system prompt, so nothing of the researcher's transcript is cached
+    assert cached_compression and all(call.cache_read_tokens == 0 for call in uncached_compression)
+    assert all(call.cache_read_tokens > 0 for call in cached_compression)
+    assert cached_usage["cache_read_tokens"] > uncached_usage["cache_read_tokens"]
+    assert cached_usage["cache_hit_calls"] > uncached_usage["cache_hit_calls"] > 0
+    assert 0 < cached_usage["cache_hit_rate"] < 1
@@ -0,0 +1,136 @@
+"""Unit tests for the search rate limiters in legacy.rate_limit, on a fake clock."""
+
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from legacy.rate_limit import RateLimiter, TokenBucket, get_rate_limiter, reset_rate_limiters
+
+
+class FakeClock:
+    """A monotonic clock that only moves when sleep() is awaited or advance() is called."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+    async def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+class RateLimitError(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("429 Too Many Requests")
+        self.response = SimpleNamespace(status_code=429, headers={"Retry-After": retry_after} if retry_after else {})
+
+
+def failing_request(failures: int, error: Exception):
+    """A request that raises error on its first `failures` calls and then returns the number of calls."""
+    calls = []
+
+    async def request():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error
+        return len(calls)
+    return request
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiters():
+    reset_rate_limiters()
+    yield
+    reset_rate_limiters()
+
+
+def test_bucket_allows_a_burst_then_paces_at_the_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+
+    async def acquire(n: int):
+        for _ in range(n):
+            await bucket.acquire()
+
+    asyncio.run(acquire(3))
+    assert clock.sleeps == [] and clock.now == 0
+    # Past the burst, requests are spaced 1/rate apart, queued in arrival order
+    asyncio.run(acquire(2))
+    assert clock.sleeps == [0.5, 0.5] and clock.now == 1.0
+
+
+def test_bucket_refills_up_to_its_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        asyncio.run(bucket.acquire())
+    clock.advance(60)
+    # A long idle period only refills the bucket to its capacity
+    for _ in range(4):
+        asyncio.run(bucket.acquire())
+    assert clock.sleeps == [0.5]
+
+
+def test_rate_limit_errors_halve_the_rate_and_successes_restore_it():
+    clock = FakeClock()
+    limiter = RateLimiter("test", rate=8, max_concurrency=1, min_rate=1, clock=clock, sleep=clock.sleep)
+    assert asyncio.run(limiter.call(failing_request(2, RateLimitError()))) == 3
+    # Two 429s halve 8 to 2, and the success restores a tenth of the configured rate
+    assert limiter.rate == pytest.approx(2.8)
+    for _ in range(10):
+        asyncio.run(limiter.call(failing_request(0, RateLimitError())))
+    assert limiter.rate == 8
+    # The rate never drops below min_rate
+    limiter.bucket.set_rate(1)
+    limiter.record_rate_limited()
+    assert limiter.rate == 1
+
+
+def test_retry_after_is_honored():
+    clock = FakeClock()
+    limiter = RateLimiter("test", rate=100, max_concurrency=1, clock=clock, sleep=clock.sleep)
+    asyncio.run(limiter.call(failing_request(1, RateLimitError(retry_after="7"))))
+    assert 7.0 in clock.sleeps
+
+
+def test_other_errors_and_exhausted_retries_are_raised():
+    clock = FakeClock()
+    limiter = RateLimiter("test", rate=100, max_concurrency=1, clock=clock, sleep=clock.sleep)
+    with pytest.raises(ValueError):
+        asyncio.run(limiter.call(failing_request(1, ValueError("bad query"))))
+    with pytest.raises(RateLimitError):
+        asyncio.run(limiter.call(failing_request(5, RateLimitError(retry_after="1")), max_retries=2))
+    assert clock.sleeps == [1.0, 1.0]
+
+
+def test_concurrency_cap_is_shared_by_callers(monkeypatch):
+    monkeypatch.setenv("SEARCH_RATE_LIMITS", json.dumps({"test": {"rate": 1000, "max_concurrency": 2}}))
+    in_flight, peak = 0, 0
+
+    async def request():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    async def caller():
+        # Each caller looks the limiter up by name, like the search functions do
+        limiter = get_rate_limiter("test")
+        await asyncio.gather(*(limiter.call(request) for _ in range(3)))
+
+    async def main():
+        await asyncio.gather(caller(), caller())
+
+    asyncio.run(main())
+    assert get_rate_limiter("test").max_concurrency == 2
+    assert peak == 2
@@ -0,0 +1,48 @@
+"""Run the API server's modern research endpoint against the offline fakes in tests/fakes.py."""
+
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+
+import server
+from open_deep_research.blob_store import BLOB_REF_PREFIX, is_blob_ref
+from tests.fakes import OfflineHarness
+
+TOPIC = "The state of battery technology for grid storage and electric vehicles"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Tokenizers aren't needed by the fakes, so don't load them on startup
+    monkeypatch.setattr(server, "preload_encodings", lambda: None)
+    monkeypatch.setattr(server, "raw_notes_stores", [])
+    with TestClient(server.app) as client:
+        yield client
+
+
+def invoke(client, **configurable) -> dict:
+    response = client.post("/invoke", json={"input": {"topic": TOPIC}, "config": {"configurable": configurable}})
+    assert response.status_code == 200, response.text
+    return response.json()["output"]
+
+
+def test_invoke_returns_hydrated_raw_notes_and_usage(client):
+    with OfflineHarness():
+        output = invoke(client)
+    assert output["final_report"]
+    assert output["raw_notes"] and not any(is_blob_ref(note) for note in output["raw_notes"])
+    assert output["usage"]["llm_calls"] > 0 and output["usage"]["input_tokens"] > 0
+
+
+def test_raw_notes_by_reference_can_be_fetched(client):
+    with OfflineHarness():
+        output = invoke(client, raw_notes_mode="reference")
+    assert output["raw_notes"] and all(is_blob_ref(note) for note in output["raw_notes"])
+    for ref in output["raw_notes"]:
+        response = client.get(f"/raw_notes/{ref[len(BLOB_REF_PREFIX):]}")
+        assert response.status_code == 200
+        assert response.json()["ref"] == ref and response.json()["content"]
+    assert client.get("/raw_notes/..%2F..%2Fetc%2Fpasswd").status_code in (400, 404)
+    assert client.get("/raw_notes/" + "0" * 64).status_code == 404
+    assert client.get("/raw_notes/not-a-digest").status_code == 400